@@ -0,0 +1,248 @@
+"""
+Offline backtester for the trading strategy.
+
+Replays MARKET_UNIVERSE over split- and dividend-adjusted daily bars, kept in
+their own price store (BACKTEST_SOURCE, filled with --update). Raw bars would turn
+a split into a -90% day and fire the stop-loss / dip-buy rules; run_backtest
+refuses a series with split-sized moves unless told otherwise. Every
+stored day becomes one scan: candidates get that day's close and the change
+against the previous close (both computed for the whole period up front), a
+decision provider answers, and trades go through trading.plan_trade and
+state_store.apply_op, the same sizing, guards and state updates as the live
+scan. Equity is marked at each close and returned in the state["equity_history"]
+format, so it can be charted like the live curve.
+
+Decision providers have decide(day, candidates, market_context) ->
+{symbol: {"decision", "reason", "path"}}:
+- RuleProvider: rules.py only; tickers the rules leave to the AI are held.
+- RecordedProvider: decisions recorded by live scans (scan_corpus), with a fallback provider for other days.
+- ModelProvider: trading.decide_all with a Gemini model (answers go through llm_cache).
+- MockProvider: any function candidate -> decision.
+
+python3 backtest.py --start 2024-01-01
+python3 backtest.py --provider recorded --update --out equity.json
+"""
+import argparse
+import json
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from alpaca.data.enums import Adjustment
+
+import price_store
+import rules
+import scan_corpus
+import trading
+from config import MARKET_UNIVERSE
+from ledger import Trade, TradeLedger
+from state_store import apply_op
+
+BACKTEST_SOURCE = "alpaca-all"  # price_store.get_store() key: Alpaca bars adjusted for splits and dividends
+
+
+# --- Decision providers ---
+
+class RuleProvider:
+    """The rule engine alone. With world_news=True a recorded world context makes held tickers ambiguous, as live."""
+    def __init__(self, world_news=False, margin=rules.BORDERLINE_PCT):
+        self.world_news = world_news
+        self.margin = margin
+
+    def decide(self, day, candidates, market_context=None):
+        decisions, ambiguous = rules.evaluate(candidates, world_news=self.world_news and bool(market_context),
+                                              margin=self.margin)
+        for c in ambiguous:
+            decisions[c['symbol']] = {"decision": "HOLD", "reason": f"No AI in backtest ({c['rule_note']})", "path": rules.RULE}
+        return decisions
+
+
+class RecordedProvider:
+    """Replays the decisions live scans recorded for each day; other days and tickers go to `fallback`."""
+    def __init__(self, corpus=None, fallback=None):
+        self.scans = (corpus or scan_corpus.get_corpus()).load()
+        self.fallback = fallback or RuleProvider()
+
+    def decide(self, day, candidates, market_context=None):
+        recorded = self.scans.get(str(day), {}).get("tickers", {})
+        decisions = {c['symbol']: recorded[c['symbol']] for c in candidates if recorded.get(c['symbol'], {}).get("decision")}
+        missing = [c for c in candidates if c['symbol'] not in decisions]
+        if missing:
+            decisions.update(self.fallback.decide(day, missing, market_context))
+        return decisions
+
+
+class ModelProvider:
+    """The live decision path (rules, then batched Gemini calls) with the recorded headlines as its news."""
+    def __init__(self, model, log_func=None):
+        self.model = model
+        self.log_func = log_func or (lambda message: None)
+
+    def decide(self, day, candidates, market_context=None):
+        news_index = {c['symbol']: c['headlines'] for c in candidates}
+        return trading.decide_all(candidates, market_context=market_context, model=self.model,
+                                  log_func=self.log_func, news_index=news_index)
+
+
+class MockProvider:
+    """decide_func(candidate) returns "BUY"/"SELL"/"HOLD" or a decision dict."""
+    def __init__(self, decide_func):
+        self.decide_func = decide_func
+
+    def decide(self, day, candidates, market_context=None):
+        decisions = {}
+        for c in candidates:
+            result = self.decide_func(c)
+            if isinstance(result, str):
+                result = {"decision": result, "reason": "mock"}
+            decisions[c['symbol']] = dict(result, path=result.get("path", "mock"))
+        return decisions
+
+
+# --- Engine ---
+
+def adjusted_bars(symbols, start):
+    """Alpaca daily bars adjusted for splits and dividends (the price_store fetch for BACKTEST_SOURCE)."""
+    return trading.alpaca_bars(symbols, start, adjustment=Adjustment.ALL)
+
+
+def split_like_moves(days, change, valid, symbols):
+    """[(date, symbol, % change)] for day-over-day moves large enough to be unadjusted splits (price_store.split_suspect)."""
+    ratio = 1 + np.nan_to_num(change) / 100
+    low = 1 - price_store.SPLIT_SUSPECT
+    suspect = valid & ((ratio < low) | (ratio > 1 / low))
+    return [(price_store.ts_date(days[i]), symbols[j], float(change[i, j])) for i, j in zip(*np.nonzero(suspect))]
+
+
+def forward_fill(values):
+    """Carries each column's last non-NaN value down (days x symbols)."""
+    idx = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return values[idx, np.arange(values.shape[1])]
+
+
+class BacktestResult:
+    def __init__(self, state, trades):
+        self.state = state
+        self.trades = trades
+        self.equity_history = state["equity_history"]
+
+    def summary(self):
+        equity = np.array([entry["total"] for entry in self.equity_history])
+        if not len(equity):
+            return {"days": 0, "trades": 0}
+        peak = np.maximum.accumulate(equity)
+        daily = np.diff(equity) / equity[:-1]
+        return {
+            "days": len(equity),
+            "start": self.equity_history[0]["date"],
+            "end": self.equity_history[-1]["date"],
+            "final_equity": float(equity[-1]),
+            "return_pct": float((equity[-1] / equity[0] - 1) * 100),
+            "max_drawdown_pct": float(((equity - peak) / peak).min() * 100),
+            "sharpe": float(daily.mean() / daily.std() * np.sqrt(252)) if len(daily) > 1 and daily.std() > 0 else 0.0,
+            "trades": len(self.trades),
+        }
+
+
+def run_backtest(provider, start=None, end=None, symbols=None, store=None, corpus=None,
+                 starting_cash=trading.STARTING_CASH, log_func=None, allow_split_moves=False):
+    """
+    Simulates one scan per stored trading day between start and end (dates, inclusive).
+    `store` must hold adjusted bars (default: the BACKTEST_SOURCE store); a move that
+    looks like an unadjusted split raises ValueError unless allow_split_moves is set.
+    Headlines and the world context come from the recorded scans when there are any.
+    Returns a BacktestResult; result.equity_history is [{"date", "total"}, ...].
+    """
+    symbols = list(symbols or MARKET_UNIVERSE)
+    store = store or price_store.get_store(BACKTEST_SOURCE)
+    scans = (corpus or scan_corpus.get_corpus()).load()
+
+    days, closes = store.close_matrix(symbols, start, end)
+    if not len(days):
+        raise ValueError(f"No stored bars for {len(symbols)} symbols between {start} and {end} (run with --update)")
+
+    # Whole-period arrays: marks for valuation, change vs the previous available close
+    marks = forward_fill(closes)
+    prev = np.vstack([np.full((1, len(symbols)), np.nan), marks[:-1]])
+    valid = ~np.isnan(closes) & ~np.isnan(prev) & (np.nan_to_num(prev) != 0)
+    change = np.full(closes.shape, np.nan)
+    np.divide(closes - prev, prev, out=change, where=valid)
+    change *= 100
+    if not allow_split_moves:
+        moves = split_like_moves(days, change, valid, symbols)
+        if moves:
+            listed = ", ".join(f"{symbol} {pct:+.0f}% on {day}" for day, symbol, pct in moves[:5])
+            raise ValueError(f"Bars look unadjusted ({listed}); backtest over split/dividend-adjusted bars "
+                             f"(--update refetches them)")
+
+    column = {symbol: j for j, symbol in enumerate(symbols)}
+    held = np.zeros(len(symbols))
+    state = {"start_date": str(price_store.ts_date(days[0])), "cash": starting_cash,
+             "portfolio": {}, "trades": [], "equity_history": []}
+    ledger = TradeLedger()
+
+    for i, ts in enumerate(days):
+        day = price_store.ts_date(ts)
+        scan = scans.get(str(day), {})
+        recorded = scan.get("tickers", {})
+        candidates = [{
+            "symbol": symbols[j],
+            "price": float(closes[i, j]),
+            "change_pct": float(change[i, j]),
+            "portfolio": state["portfolio"].get(symbols[j], {}),
+            "headlines": recorded.get(symbols[j], {}).get("headlines") or [],
+        } for j in np.flatnonzero(valid[i])]
+
+        decisions = provider.decide(day, candidates, scan.get("market_context")) if candidates else {}
+        for c in candidates:
+            decision = decisions.get(c['symbol'], {}).get("decision", "HOLD").upper()
+            side, qty, note = trading.plan_trade(decision, c['symbol'], c['price'], state, ledger, day)
+            if not side:
+                continue
+            apply_op(state, {"op": side, "date": str(day), "symbol": c['symbol'], "qty": qty, "price": c['price']})
+            ledger.add(Trade(str(day), side, c['symbol'], qty, c['price']))
+            held[column[c['symbol']]] = qty if side == "buy" else 0
+            if log_func:
+                log_func(f"   {'✅ BOUGHT' if side == 'buy' else '🚨 SOLD'} {qty} {c['symbol']} @ ${c['price']:.2f} on {day}")
+
+        trading.set_equity(state, day, state["cash"] + float(held @ np.nan_to_num(marks[i])))
+
+    return BacktestResult(state, ledger.trades)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the trading strategy over stored daily bars.")
+    parser.add_argument("--start", type=date.fromisoformat, default=date.today() - timedelta(days=365))
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--provider", choices=("rules", "recorded", "gemini"), default="rules")
+    parser.add_argument("--update", action="store_true", help="Gap-fill the adjusted price store from Alpaca first")
+    parser.add_argument("--out", help="Write the equity history (state['equity_history'] format) to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Log every trade")
+    args = parser.parse_args()
+
+    if args.update:
+        days = (date.today() - args.start).days + 7
+        price_store.get_store(BACKTEST_SOURCE).update(MARKET_UNIVERSE, adjusted_bars, days)
+    if args.provider == "rules":
+        provider = RuleProvider()
+    elif args.provider == "recorded":
+        provider = RecordedProvider()
+    else:
+        provider = ModelProvider(trading.configure_ai())
+
+    started = time.perf_counter()
+    result = run_backtest(provider, args.start, args.end, log_func=print if args.verbose else None)
+    elapsed = time.perf_counter() - started
+    s = result.summary()
+    print(f"📈 Backtest ({args.provider}) {s['start']} .. {s['end']}: {s['days']} days, {s['trades']} trades in {elapsed:.2f}s")
+    print(f"   💰 Final equity ${s['final_equity']:.2f} ({s['return_pct']:+.2f}%) | "
+          f"max drawdown {s['max_drawdown_pct']:.2f}% | Sharpe {s['sharpe']:.2f}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result.equity_history, f, indent=2)
+        print(f"   💾 Equity history written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
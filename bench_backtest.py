@@ -0,0 +1,97 @@
+"""
+Benchmark: offline backtest of the strategy over years of synthetic daily bars.
+
+Fills a temporary price store for MARKET_UNIVERSE, then times the rule engine,
+a mock provider and a replay of recorded decisions. The replay records the rule
+run's decisions into a scan corpus first, so its equity curve must match exactly.
+
+python3 bench_backtest.py
+python3 bench_backtest.py --years 10
+"""
+import argparse
+import random
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+import backtest
+import price_store
+from config import MARKET_UNIVERSE
+from scan_corpus import ScanCorpus
+
+
+def fill_store(store, symbols, start, end):
+    days = pd.bdate_range(start, end)
+    bars = {}
+    for i, symbol in enumerate(symbols):
+        rng = np.random.default_rng(i)
+        closes = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, len(days))))
+        opens = closes * (1 + rng.normal(0, 0.005, len(days)))
+        bars[symbol] = price_store.make_bars(days, opens, np.maximum(opens, closes) * 1.01,
+                                             np.minimum(opens, closes) * 0.99, closes, np.full(len(days), 1e6))
+    for symbol, symbol_bars in bars.items():
+        store.append(symbol, symbol_bars)
+    store.compact()
+    return len(days)
+
+
+class Recorder:
+    """Wraps a provider and records its decisions like a live scan would."""
+    def __init__(self, provider, corpus):
+        self.provider = provider
+        self.corpus = corpus
+
+    def decide(self, day, candidates, market_context=None):
+        decisions = self.provider.decide(day, candidates, market_context)
+        self.corpus.record(day, candidates, decisions, market_context)
+        return decisions
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=3)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="backtest_")
+    try:
+        store = price_store.PriceStore(f"{directory}/prices")
+        end = date.today()
+        start = end - timedelta(days=365 * args.years)
+        n_days = fill_store(store, MARKET_UNIVERSE, start, end)
+        empty = ScanCorpus(f"{directory}/empty.jsonl")
+        print(f"📈 {len(MARKET_UNIVERSE)} symbols x {n_days} trading days ({args.years}y)")
+
+        recorded = ScanCorpus(f"{directory}/scans.jsonl")
+        elapsed, rule_run = timed(lambda: backtest.run_backtest(
+            Recorder(backtest.RuleProvider(), recorded), start, end, store=store, corpus=empty))
+        s = rule_run.summary()
+        print(f"   Rules:    {elapsed:.2f}s | {s['trades']} trades | ${s['final_equity']:.2f} ({s['return_pct']:+.1f}%), "
+              f"max DD {s['max_drawdown_pct']:.1f}%")
+
+        rnd = random.Random(4)
+        mock = backtest.MockProvider(lambda c: rnd.choices(("BUY", "SELL", "HOLD"), (1, 1, 8))[0])
+        elapsed, mock_run = timed(lambda: backtest.run_backtest(mock, start, end, store=store, corpus=empty))
+        s = mock_run.summary()
+        print(f"   Mock:     {elapsed:.2f}s | {s['trades']} trades | ${s['final_equity']:.2f} ({s['return_pct']:+.1f}%)")
+
+        replay = backtest.RecordedProvider(recorded, fallback=backtest.MockProvider(lambda c: "HOLD"))
+        elapsed, replay_run = timed(lambda: backtest.run_backtest(replay, start, end, store=store, corpus=recorded))
+        same = replay_run.equity_history == rule_run.equity_history and replay_run.trades == rule_run.trades
+        print(f"   Recorded: {elapsed:.2f}s | replay of the rule run identical: {same}")
+        print(f"   Equity history sample: {rule_run.equity_history[-1]}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark: chart rendering with the old per-call pyplot figures vs reusable
+templates (inline) vs templates in a process pool, then the PNG cache: a warm
+run in a fresh process must serve every chart without importing matplotlib.
+
+python3 bench_charts.py
+python3 bench_charts.py --tickers 60 --workers 4 --out /tmp/charts
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import charts
+
+
+def make_histories(n, seed=5):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(end=pd.Timestamp.now(tz="America/New_York").normalize(), periods=7, freq="B")
+    return {f"T{i:03d}": pd.Series(100 * np.cumprod(1 + rng.normal(0, 0.02, 7)), index=index) for i in range(n)}
+
+
+def legacy_stock_chart(ticker, history_series):
+    """GraphGenerator.generate_stock_chart before the templates: a new pyplot figure per call."""
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+    from io import BytesIO
+    plt.switch_backend('Agg')
+    plt.figure(figsize=(6, 3))
+    plt.plot(history_series.index, history_series.values, marker='o', linestyle='-')
+    plt.title(f"{ticker} - Last 7 Days")
+    plt.grid(True, linestyle='--', alpha=0.7)
+    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%m-%d'))
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    buf = BytesIO()
+    plt.savefig(buf, format='png')
+    plt.close()
+    return buf.getvalue()
+
+
+def job(ticker, series):
+    index = series.index.tz_localize(None)
+    return (charts.STOCK, f"{ticker} - Last 7 Days", list(index.to_pydatetime()), [float(v) for v in series.values])
+
+
+def cache_run(cache_dir, tickers):
+    charts._cache = charts.ChartCache(directory=cache_dir)
+    jobs = [job(t, s) for t, s in make_histories(tickers).items()]
+    start = time.perf_counter()
+    charts.render_batch(jobs, workers=1)
+    elapsed = time.perf_counter() - start
+    print(f"{elapsed:.2f}s, {charts.get_cache().stats()}, matplotlib imported: {'matplotlib' in sys.modules}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=36)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--out", help="Directory to write sample PNGs from each path")
+    parser.add_argument("--cache-run", metavar="DIR", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.cache_run:
+        return cache_run(args.cache_run, args.tickers)
+
+    histories = make_histories(args.tickers)
+    jobs = [job(t, s) for t, s in histories.items()]
+    print(f"📈 {len(jobs)} stock charts, {os.cpu_count()} CPU(s)")
+
+    # Warm up imports so each path is timed on rendering alone
+    legacy_stock_chart("WARM", next(iter(histories.values())))
+    charts.draw(*jobs[0])
+
+    start = time.perf_counter()
+    legacy = [legacy_stock_chart(t, s) for t, s in histories.items()]
+    legacy_time = time.perf_counter() - start
+    print(f"   pyplot per call:      {legacy_time:.2f}s ({legacy_time / len(jobs) * 1000:.0f} ms/chart)")
+
+    start = time.perf_counter()
+    inline = charts.draw_batch(jobs, workers=1)
+    inline_time = time.perf_counter() - start
+    print(f"   templates, inline:    {inline_time:.2f}s ({legacy_time / inline_time:.1f}x)")
+
+    charts.draw_batch(jobs[:args.workers * 2], workers=args.workers)  # Start the pool (spawn + imports)
+    start = time.perf_counter()
+    pooled = charts.draw_batch(jobs, workers=args.workers)
+    pool_time = time.perf_counter() - start
+    print(f"   templates, {args.workers} procs:  {pool_time:.2f}s ({legacy_time / pool_time:.1f}x, warm pool)")
+
+    print(f"   Same PNG from inline and pool: {inline == pooled}")
+
+    cache_dir = tempfile.mkdtemp(prefix="chart_cache_")
+    for label in ("cold", "warm"):
+        # Fresh interpreter per run, as in a new report process
+        out = subprocess.run([sys.executable, __file__, "--cache-run", cache_dir, "--tickers", str(args.tickers)],
+                             capture_output=True, text=True, check=True).stdout.strip().splitlines()[-1]
+        print(f"   cache {label}: {out}")
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        for name, pngs in (("legacy", legacy), ("template", inline)):
+            with open(os.path.join(args.out, f"{name}_{jobs[0][1].split()[0]}.png"), "wb") as f:
+                f.write(pngs[0])
+        print(f"   Samples written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
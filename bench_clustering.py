@@ -0,0 +1,100 @@
+"""
+Benchmark: curation prompt size with and without near-duplicate clustering.
+
+python3 bench_clustering.py --record corpus.json   # Record today's Croatian + Dalmatia feeds
+python3 bench_clustering.py --corpus corpus.json   # Replay a recorded corpus
+python3 bench_clustering.py                        # Synthetic syndicated corpus (no network)
+"""
+import argparse
+import json
+import random
+import time
+
+from clustering import collapse_near_duplicates
+
+TOPICS = [
+    "Vlada usvojila prijedlog državnog proračuna za sljedeću godinu",
+    "Potres magnitude 4,2 pogodio područje kod Sinja, nema ozlijeđenih",
+    "Hajduk na Poljudu pobijedio Rijeku u derbiju kola",
+    "Cijene goriva od utorka ponovno rastu, evo koliko ćemo plaćati",
+    "Split dobiva novu liniju gradskog prijevoza prema Žnjanu",
+    "HZZO mijenja pravila za dopunsko zdravstveno osiguranje",
+    "Požar kod Trogira pod kontrolom, na terenu kanaderi",
+    "Plenković se sastao s predstavnicima sindikata javnih službi",
+    "Turistička sezona u Dalmaciji oborila rekord noćenja",
+    "Policija uhitila osumnjičene za prijevaru s kriptovalutama",
+    "Zagreb uvodi nove mjere za smanjenje gužvi u prometu",
+    "Makarska rivijera bez vode zbog kvara na vodovodu",
+    "Inflacija u Hrvatskoj usporila na 3,1 posto",
+    "Dubrovnik ograničava broj kruzera u gradskoj luci",
+    "Otvorena nova bolnica u Kninu nakon četiri godine gradnje",
+]
+PREFIXES = ["", "VIDEO: ", "FOTO: ", "UŽIVO: ", ""]
+PORTALS = ["index.hr", "tportal.hr", "jutarnji.hr", "dalmacijanews.hr", "dalmacijadanas.hr", "dalmatinskiportal.hr"]
+
+
+def synthetic_corpus(seed=7):
+    """Each topic is carried by 1-4 portals with small title rewrites, like wire copy."""
+    rnd = random.Random(seed)
+    articles, truth = [], []
+    for t, title in enumerate(TOPICS):
+        summary = f"{title}. Prema izvješću agencije Hina, {title.lower()}, a više detalja očekuje se tijekom dana."
+        for portal in rnd.sample(PORTALS, rnd.randint(1, 4)):
+            variant = rnd.choice(PREFIXES) + title
+            if rnd.random() < 0.4:
+                variant = variant.replace(",", "") + "!"
+            articles.append({'title': variant, 'link': f"https://{portal}/{t}-{rnd.randint(1000, 9999)}", 'summary': summary})
+            truth.append(t)
+    order = list(range(len(articles)))
+    rnd.shuffle(order)
+    return [articles[i] for i in order], [truth[i] for i in order]
+
+
+def prompt_lines(articles):
+    lines = ""
+    for art in articles:
+        sources = f" [{art['sources']} sources]" if art.get('sources', 1) > 1 else ""
+        lines += f"- {art['title']} ({art['link']}){sources}: {art['summary'][:200]}\n"
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", help="JSON list of {title, link, summary}")
+    parser.add_argument("--record", help="Collect live Croatian + Dalmatia articles into this file")
+    args = parser.parse_args()
+
+    truth = None
+    if args.record:
+        from news_agent import NewsCollector
+        collector = NewsCollector()
+        articles = collector.collect_croatian_news() + collector.collect_dalmatia_news()
+        with open(args.record, "w", encoding="utf-8") as f:
+            json.dump(articles, f, ensure_ascii=False, indent=1)
+        print(f"💾 Recorded {len(articles)} articles to {args.record}")
+    elif args.corpus:
+        with open(args.corpus, "r", encoding="utf-8") as f:
+            articles = json.load(f)
+        print(f"📂 Loaded {len(articles)} recorded articles from {args.corpus}")
+    else:
+        articles, truth = synthetic_corpus()
+        print(f"🧪 Synthetic corpus: {len(articles)} articles, {len(TOPICS)} distinct stories")
+
+    start = time.perf_counter()
+    collapsed = collapse_near_duplicates(articles)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    before = len(prompt_lines(articles))
+    after = len(prompt_lines(collapsed))
+    print(f"   Articles: {len(articles)} -> {len(collapsed)} ({elapsed:.1f} ms)")
+    print(f"   Prompt article block: {before:,} -> {after:,} chars ({(1 - after / before) * 100 if before else 0:.0f}% smaller, ~{(before - after) // 4:,} tokens saved)")
+
+    if truth is not None:
+        # Representatives with different true topics = no wrong merges
+        kept_topics = [truth[articles.index({k: v for k, v in a.items() if k != 'sources'})] for a in collapsed]
+        merged_ok = len(set(kept_topics)) == len(kept_topics)
+        print(f"   Stories kept: {len(set(kept_topics))}/{len(TOPICS)} | Wrong merges: {'none ✅' if merged_ok else 'yes ❌'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark: sequential feedparser.parse() vs concurrent NewsCollector.collect_feeds().
+
+Spins up local stand-in feed servers (no internet needed) that answer with a
+small RSS document after a per-feed delay, then collects the same feed list both ways.
+A second concurrent pass shows the conditional-GET cache answering with 304s.
+
+python3 bench_feeds.py
+python3 bench_feeds.py --feeds 27 --delay 0.5
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import feedparser
+
+RSS_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0"><channel><title>{name}</title>
+{items}
+</channel></rss>"""
+
+ITEM_TEMPLATE = "<item><title>{name} story {i}</title><link>http://example.com/{name}/{i}</link><description>Summary {i} for {name}</description></item>"
+
+
+def make_handler(delays):
+    class FeedHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            name = self.path.strip("/")
+            time.sleep(delays.get(name, 0))
+            etag = f'"{name}-v1"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            items = "\n".join(ITEM_TEMPLATE.format(name=name, i=i) for i in range(10))
+            body = RSS_TEMPLATE.format(name=name, items=items).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/rss+xml; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+    return FeedHandler
+
+
+def start_server(delays):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(delays))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def same(articles, baseline):
+    """Same articles as the baseline, ignoring keys collect_feeds adds (e.g. 'published')."""
+    return [{k: a[k] for k in ('title', 'link', 'summary')} for a in articles] == baseline
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--feeds", type=int, default=27, help="Number of feeds (default: size of MARKET_UNIVERSE)")
+    parser.add_argument("--delay", type=float, default=0.4, help="Mean server delay per feed in seconds")
+    parser.add_argument("--hosts", type=int, default=3, help="Number of stand-in feed servers")
+    args = parser.parse_args()
+
+    random.seed(42)
+    delays = {f"feed{i}": random.uniform(0.5, 1.5) * args.delay for i in range(args.feeds)}
+    servers = [start_server(delays) for _ in range(args.hosts)]
+    feeds = [f"http://127.0.0.1:{servers[i % args.hosts].server_address[1]}/feed{i}" for i in range(args.feeds)]
+
+    print(f"📡 {args.feeds} feeds on {args.hosts} local hosts, slowest feed {max(delays.values()):.2f}s")
+
+    # Baseline: what collect_feeds used to do
+    start = time.perf_counter()
+    baseline = []
+    for url in feeds:
+        feed = feedparser.parse(url)
+        for entry in feed.entries[:5]:
+            baseline.append({'title': entry.title, 'link': entry.link, 'summary': entry.summary if 'summary' in entry else ''})
+    sequential = time.perf_counter() - start
+    print(f"   Sequential: {sequential:.2f}s ({len(baseline)} articles)")
+
+    # Keep the benchmark's feed cache away from the real one
+    os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="bench_feeds_")
+    from news_agent import NewsCollector
+    collector = NewsCollector()
+    start = time.perf_counter()
+    articles = collector.collect_feeds(feeds)
+    concurrent = time.perf_counter() - start
+    print(f"   Concurrent: {concurrent:.2f}s ({len(articles)} articles)")
+
+    print(f"   Same output: {'✅' if same(articles, baseline) else '❌'} | Speedup: {sequential / concurrent:.1f}x")
+
+    start = time.perf_counter()
+    cached = collector.collect_feeds(feeds)
+    warm = time.perf_counter() - start
+    print(f"   Concurrent + 304 cache: {warm:.2f}s | Same output: {'✅' if same(cached, baseline) else '❌'}")
+
+    for server in servers:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
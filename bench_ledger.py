@@ -0,0 +1,56 @@
+"""
+Benchmark: wash-trade check by substring scan of state["history"] vs TradeLedger.
+
+python3 bench_ledger.py
+python3 bench_ledger.py --entries 250000
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from config import MARKET_UNIVERSE
+from ledger import TradeLedger, migrate_history
+
+
+def make_history(n, seed=11):
+    rnd = random.Random(seed)
+    start = date(2020, 1, 1)
+    history = []
+    for i in range(n):
+        day = start + timedelta(days=i * 2000 // n)
+        verb = rnd.choice(["BOUGHT", "SOLD"])
+        history.append(f"{day}: {verb} {round(rnd.uniform(0.1, 5), 4)} {rnd.choice(MARKET_UNIVERSE)}")
+    return history
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=100_000)
+    args = parser.parse_args()
+
+    history = make_history(args.entries)
+    # Today: only CVX was sold, so "V" must not be in cooldown
+    today = str(date.today())
+    history.append(f"{today}: SOLD 1.0 CVX")
+    print(f"📜 {len(history):,} history entries")
+
+    start = time.perf_counter()
+    old = {s: any(f"{today}: SOLD" in entry and f"{s}" in entry for entry in history) for s in MARKET_UNIVERSE}
+    scan = time.perf_counter() - start
+    print(f"   Substring scan ({len(MARKET_UNIVERSE)} checks): {scan * 1000:.1f} ms -> in cooldown: {sorted(s for s, v in old.items() if v)}")
+
+    start = time.perf_counter()
+    ledger = TradeLedger(migrate_history(history))
+    migrate = time.perf_counter() - start
+    print(f"   Migration to ledger: {migrate * 1000:.1f} ms ({len(ledger):,} trades)")
+
+    start = time.perf_counter()
+    new = {s: ledger.sold_on(today, s) for s in MARKET_UNIVERSE}
+    lookup = time.perf_counter() - start
+    print(f"   Ledger lookups ({len(MARKET_UNIVERSE)} checks): {lookup * 1e6:.1f} µs -> in cooldown: {sorted(s for s, v in new.items() if v)}")
+    print(f"   Speedup per scan (excluding one-time migration): {scan / lookup:,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark: per-symbol Alpaca news requests vs one bulk prefetch.
+
+Runs a local fake Alpaca news endpoint (GET /v1beta1/news with symbols, limit
+and page_token) and points trading.news_client at it via ALPACA_DATA_URL.
+The fake server counts every HTTP round-trip.
+
+python3 bench_news_prefetch.py
+python3 bench_news_prefetch.py --latency 0.15 --articles 400
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def make_corpus(symbols, count, seed=3):
+    rnd = random.Random(seed)
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    corpus = []
+    for i in range(count):
+        # Busy names (first few) get most of the coverage, like NVDA/TSLA in reality
+        tagged = rnd.sample(symbols[:5], 1) if rnd.random() < 0.6 else rnd.sample(symbols, rnd.randint(1, 2))
+        corpus.append({
+            "id": i, "headline": f"Headline {i} about {' & '.join(tagged)}", "source": "fake", "url": None,
+            "summary": "", "created_at": now, "updated_at": now, "symbols": tagged,
+            "author": "bench", "content": "", "images": [],
+        })
+    return corpus
+
+
+def make_handler(corpus, counter, latency):
+    class NewsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            with counter["lock"]:
+                counter["requests"] += 1
+            query = parse_qs(urlparse(self.path).query)
+            wanted = set(",".join(query.get("symbols", [""])).split(","))
+            limit = int(query.get("limit", ["50"])[0])
+            offset = int(query.get("page_token", ["0"])[0] or 0)
+
+            matches = [n for n in corpus if wanted & set(n["symbols"])]
+            page = matches[offset:offset + limit]
+            next_token = str(offset + limit) if offset + limit < len(matches) else None
+
+            body = json.dumps({"news": page, "next_page_token": next_token}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+    return NewsHandler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.1, help="Fake server latency per request (s)")
+    parser.add_argument("--articles", type=int, default=200, help="Articles in the last 24h across the universe")
+    args = parser.parse_args()
+
+    from config import MARKET_UNIVERSE
+    counter = {"requests": 0, "lock": threading.Lock()}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(make_corpus(MARKET_UNIVERSE, args.articles), counter, args.latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    os.environ["ALPACA_DATA_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ.setdefault("ALPACA_API_KEY", "bench")
+    os.environ.setdefault("ALPACA_SECRET_KEY", "bench")
+    import trading
+    # The benchmark measures round-trips, not our politeness budget
+    trading.alpaca_limiter = trading.TokenBucket(1000)
+
+    start = time.perf_counter()
+    per_symbol = {symbol: trading.get_market_news(symbol) for symbol in MARKET_UNIVERSE}
+    sequential = time.perf_counter() - start
+    sequential_requests = counter["requests"]
+    print(f"📡 Per-symbol: {sequential_requests} requests, {sequential:.2f}s")
+
+    counter["requests"] = 0
+    start = time.perf_counter()
+    bulk = trading.prefetch_market_news(MARKET_UNIVERSE)
+    elapsed = time.perf_counter() - start
+    print(f"📦 Bulk prefetch: {counter['requests']} requests (server count), {elapsed:.2f}s")
+
+    same = sum(1 for s in MARKET_UNIVERSE if set(per_symbol[s]) == set(bulk[s]))
+    print(f"   Same headlines for {same}/{len(MARKET_UNIVERSE)} symbols | Round-trips saved: {sequential_requests - counter['requests']}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: local OHLCV price store (memory-mapped NumPy segments).
+
+Fills 1 year x 500 symbols from a synthetic fetcher, gap-fills one more day,
+compacts, then times range reads from a fresh store (cold mmap) and again (warm).
+
+python3 bench_price_store.py
+python3 bench_price_store.py --symbols 1000 --days 504
+"""
+import argparse
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+import price_store
+from price_store import PriceStore
+
+
+class SyntheticFeed:
+    """Deterministic daily bars up to `today` (a day's close doesn't depend on the request); counts fetch calls and rows served."""
+    def __init__(self, today):
+        self.today = today
+        self.calls = 0
+        self.rows = 0
+
+    def fetch(self, symbols, start):
+        self.calls += 1
+        days = pd.bdate_range(start, self.today)
+        out = {}
+        for i, symbol in enumerate(symbols):
+            phase = hash(symbol) % 1000
+            closes = 100 + 10 * np.sin((days - pd.Timestamp(0)).days.to_numpy() / 7 + phase)
+            out[symbol] = price_store.make_bars(days, closes, closes + 1, closes - 1, closes, np.full(len(days), 1e6))
+            self.rows += len(days)
+        return out
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--days", type=int, default=365, help="Calendar days of history")
+    args = parser.parse_args()
+
+    symbols = [f"S{i:04d}" for i in range(args.symbols)]
+    directory = tempfile.mkdtemp(prefix="prices_")
+    today = date.today()
+    try:
+        store = PriceStore(directory)
+        feed = SyntheticFeed(today - timedelta(days=1))
+        elapsed, calls = timed(lambda: store.update(symbols, feed.fetch, args.days, today=today - timedelta(days=1)))
+        print(f"🗄️ Initial fill: {args.symbols} symbols, {feed.rows:,} bars in {calls} fetch call(s), {elapsed:.2f}s")
+
+        feed = SyntheticFeed(today)
+        elapsed, calls = timed(lambda: store.update(symbols, feed.fetch, args.days, today=today))
+        print(f"   Gap-fill next day: {calls} fetch call(s), {feed.rows:,} bars fetched (from the day before the last stored one), {elapsed:.2f}s")
+
+        elapsed, n = timed(lambda: store.compact())
+        print(f"   Compaction: {n} symbols rewritten in {elapsed:.2f}s")
+
+        start, end = today - timedelta(days=args.days), today
+        month = today - timedelta(days=30)
+        for label in ("cold", "warm"):
+            if label == "cold":
+                store = PriceStore(directory)
+            t_year, frame = timed(lambda: store.close_frame(symbols, start, end))
+            t_bars, bars = timed(lambda: [store.read(s, start, end) for s in symbols])
+            t_month, recent = timed(lambda: [store.read(s, month, end) for s in symbols])
+            print(f"   Reads ({label}): 1y closes frame {frame.shape[0]}x{frame.shape[1]} {t_year * 1000:.0f} ms | "
+                  f"1y OHLCV {sum(map(len, bars)):,} bars {t_bars * 1000:.0f} ms | "
+                  f"1m window {sum(map(len, recent)):,} bars {t_month * 1000:.0f} ms")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
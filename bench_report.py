@@ -0,0 +1,116 @@
+"""
+Benchmark: report build with sections run one after another vs as a dependency graph.
+
+Network and LLM calls are replaced by fakes that sleep for typical latencies,
+so only the orchestration is measured. Both runs produce the same HTML.
+
+python3 bench_report.py
+python3 bench_report.py --closed --scale 0.5
+"""
+import argparse
+import time
+
+import news_agent
+import trading
+
+SCALE = 1.0
+
+
+def slow(seconds, result):
+    time.sleep(seconds * SCALE)
+    return result
+
+
+def articles(tag, n=5):
+    return [{"title": f"{tag} {i}", "link": f"https://example.com/{tag}/{i}", "summary": f"{tag} story {i}"} for i in range(n)]
+
+
+class FakeCollector:
+    def collect_world_news(self): return slow(1.5, articles("world"))
+    def collect_tech_news(self): return slow(1.2, articles("tech"))
+    def collect_specific_stock_news(self, tickers): return slow(2.0, articles("stock"))
+    def collect_croatian_news(self): return slow(1.5, articles("hr"))
+    def collect_dalmatia_news(self): return slow(1.0, articles("dal"))
+    def collect_nba_news(self): return slow(1.0, articles("nba"))
+    def unseen(self, arts): return arts
+
+
+class FakeSummarizer:
+    """Answers arrive in one piece; they are still written to `stream` like LLMSummarizer does."""
+    def answer(self, seconds, text, stream):
+        slow(seconds, None)
+        if stream:
+            stream(text)
+        return text
+
+    def summarize_world_news(self, arts, stream=None): return self.answer(3.0, f"Summary of {len(arts)} stories.", stream)
+    def curate_tech_news(self, arts, stream=None): return self.answer(2.5, "<ul><li>Tech</li></ul>", stream)
+    def analyze_stock_market(self, context, stream=None): return self.answer(4.0, f"<p>Analysis of {len(str(context))} chars.</p>", stream)
+    def curate_croatian_news(self, arts, stream=None): return self.answer(3.0, "<ul><li>HR</li></ul>", stream)
+    def curate_dalmatia_news(self, arts, stream=None): return self.answer(2.5, "<ul><li>DAL</li></ul>", stream)
+    def get_next_hajduk_game(self): return slow(2.0, "<p>Hajduk - Rijeka</p>")
+    def analyze_nba_trends(self, scores, stream=None): return self.answer(2.5, "<p>Trends</p>", stream)
+
+
+class FakeScores:
+    def get_last_nights_scores(self): return slow(0.8, [{"matchup": "A @ B", "score": "100-99", "status": "Final"}])
+    def get_weekly_scores(self): return slow(2.0, [])
+
+
+class FakeStockCollector:
+    def get_stock_data(self):
+        return slow(2.0, {"AAPL": {"current_price": 200.0, "change": 1.5, "history": None}})
+
+
+class FakePortfolioManager:
+    bucket_name = None
+    def calculate_total_capital(self, stock_data): return 1000.0
+    def update_history(self, total): return slow(0.3, [{"total": total}])
+    def get_real_history(self): return slow(0.3, [])
+
+
+class FakeGraphGenerator:
+    def generate_stock_chart(self, ticker, series): return slow(0.4, b"png")
+    def generate_stock_charts(self, histories): return {t: self.generate_stock_chart(t, s) for t, s in histories.items()}
+    def generate_portfolio_chart(self, history): return slow(0.4, b"png")
+
+
+def fake_simulation(return_logs=False, market_context=""):
+    return slow(6.0, ("Bought 1 AAPL", {"equity_history": [{"date": "2025-01-01", "equity": 1000}]}))
+
+
+def install_fakes():
+    news_agent.StockCollector = FakeStockCollector
+    news_agent.PortfolioManager = FakePortfolioManager
+    news_agent.GraphGenerator = FakeGraphGenerator
+    trading.run_simulation = fake_simulation
+    trading.get_market_status = lambda: slow(2.5, {"status": "Bullish", "avg_change": 0.4, "up_count": 20, "down_count": 7})
+
+
+def timed_build(market_open, workers):
+    start = time.perf_counter()
+    html, images = news_agent.build_report(market_open, FakeCollector(), FakeSummarizer(), FakeScores(), max_workers=workers)
+    return time.perf_counter() - start, html.split("</p>", 1)[1], sorted(images)
+
+
+def main():
+    global SCALE
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--closed", action="store_true", help="Evening edition (market closed)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for the fake latencies")
+    args = parser.parse_args()
+    SCALE = args.scale
+    install_fakes()
+    market_open = not args.closed
+
+    print("▶️ Sequential (1 worker)")
+    seq_time, seq_html, seq_images = timed_build(market_open, 1)
+    print(f"▶️ Concurrent ({news_agent.REPORT_WORKERS} workers)")
+    par_time, par_html, par_images = timed_build(market_open, news_agent.REPORT_WORKERS)
+
+    print(f"\n📊 {'Market open' if market_open else 'Evening edition'}: {seq_time:.2f}s -> {par_time:.2f}s ({seq_time / par_time:.1f}x)")
+    print(f"   Identical output: {seq_html == par_html and seq_images == par_images}")
+
+
+if __name__ == "__main__":
+    main()
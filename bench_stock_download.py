@@ -0,0 +1,131 @@
+"""
+Benchmark: StockCollector.get_stock_data, one yf.Ticker().history(period="1mo")
+per holding (old) vs one batched yf.download for all holdings (new).
+
+Runs offline against a fixture shaped like yf.download's output. Each simulated
+Yahoo request sleeps --latency seconds; the fake counts requests.
+
+python3 bench_stock_download.py --tickers 100
+python3 bench_stock_download.py --record fixture.pkl      # real download of MY_HOLDINGS (network)
+python3 bench_stock_download.py --fixture fixture.pkl     # replay a recorded response
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import news_agent
+import price_store
+
+
+def synthetic_fixture(tickers, days=22, seed=17):
+    """One month of daily bars for `tickers`, in yf.download's (Price, Ticker) column layout."""
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=days, name="Date")
+    closes = 100 * np.cumprod(1 + rng.normal(0, 0.02, (days, len(tickers))), axis=0)
+    closes[-1, ::17] = np.nan  # Some tickers without today's bar (halted / not yet traded)
+    frames = {field: pd.DataFrame(closes * factor, index=index, columns=tickers)
+              for field, factor in (("Close", 1.0), ("High", 1.01), ("Low", 0.99), ("Open", 1.0))}
+    frames["Volume"] = pd.DataFrame(rng.integers(1e5, 1e7, (days, len(tickers))), index=index, columns=tickers)
+    return pd.concat(frames, axis=1, names=["Price", "Ticker"])
+
+
+class FakeYahoo:
+    """Serves the fixture through the two yfinance entry points the collector has used."""
+    def __init__(self, fixture, latency):
+        self.fixture = fixture
+        self.latency = latency
+        self.requests = 0
+
+    def download(self, tickers, start=None, **kwargs):
+        self.requests += 1
+        time.sleep(self.latency)
+        frame = self.fixture.loc[self.fixture.index >= pd.Timestamp(start)] if start else self.fixture
+        return frame.loc[:, (slice(None), list(tickers))]
+
+    def history(self, ticker):
+        self.requests += 1
+        time.sleep(self.latency)
+        return self.fixture.xs(ticker, axis=1, level="Ticker").dropna(subset=["Close"])
+
+
+def legacy_get_stock_data(tickers, yahoo):
+    """StockCollector.get_stock_data before batching (one request + Python math per ticker)."""
+    data = {}
+    for ticker in tickers:
+        hist = yahoo.history(ticker)
+        if hist.empty:
+            continue
+        last_7_days = hist.tail(7)
+        current_price = hist['Close'].iloc[-1]
+        if len(hist) > 1:
+            prev_close = hist['Close'].iloc[-2]
+            change = current_price - prev_close
+            pct_change = (change / prev_close) * 100
+        else:
+            change = 0
+            pct_change = 0
+        data[ticker] = {'current_price': current_price, 'change': change, 'pct_change': pct_change, 'history': last_7_days['Close']}
+    return data
+
+
+def same(old, new):
+    if old.keys() != new.keys():
+        return False
+    for ticker in old:
+        for field in ("current_price", "change", "pct_change"):
+            if not np.isclose(old[ticker][field], new[ticker][field]):
+                return False
+        if not np.allclose(old[ticker]["history"].to_numpy(), new[ticker]["history"].to_numpy()):
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per simulated Yahoo request")
+    parser.add_argument("--record", metavar="PATH", help="Download MY_HOLDINGS for real and save the response")
+    parser.add_argument("--fixture", metavar="PATH", help="Replay a response saved with --record")
+    args = parser.parse_args()
+
+    if args.record:
+        frame = news_agent.yf.download(list(news_agent.MY_HOLDINGS), period="1mo", auto_adjust=True, group_by="column", progress=False)
+        frame.to_pickle(args.record)
+        print(f"💾 Recorded {frame.shape[0]} days x {frame['Close'].shape[1]} tickers to {args.record}")
+        return
+
+    fixture = pd.read_pickle(args.fixture) if args.fixture else synthetic_fixture([f"T{i:03d}" for i in range(args.tickers)])
+    tickers = list(fixture["Close"].columns)
+    print(f"📈 {len(tickers)} tickers, {args.latency * 1000:.0f} ms per request")
+
+    yahoo = FakeYahoo(fixture, args.latency)
+    start = time.perf_counter()
+    old = legacy_get_stock_data(tickers, yahoo)
+    old_time, old_requests = time.perf_counter() - start, yahoo.requests
+
+    yahoo = FakeYahoo(fixture, args.latency)
+    news_agent.yf.download = yahoo.download
+    price_store._stores[news_agent.PRICE_SOURCE] = price_store.PriceStore(tempfile.mkdtemp(prefix="prices_"))
+    collector = news_agent.StockCollector()
+    collector.tickers = tickers
+    start = time.perf_counter()
+    new = collector.get_stock_data()
+    new_time = time.perf_counter() - start
+
+    closes = fixture["Close"]
+    start = time.perf_counter()
+    for _ in range(100):
+        news_agent.price_summary(closes)
+    vector_us = (time.perf_counter() - start) / 100 * 1e6
+
+    print(f"   Per-ticker history: {old_requests} requests, {old_time:.2f}s")
+    print(f"   Batched download:   {yahoo.requests} request, {new_time:.2f}s ({old_time / new_time:.0f}x)")
+    print(f"   Vectorized price/change for {len(tickers)} tickers: {vector_us:.0f} µs")
+    print(f"   Same prices, changes and 7-day history: {same(old, new)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Shared blob storage for bot state and portfolio history.
+
+GCSBlobStore talks to a Google Cloud Storage bucket through one pooled client;
+LocalBlobStore keeps the same names as files under a directory, for tests and
+offline runs. (For a GCS emulator, set STORAGE_EMULATOR_HOST; the client picks it up.)
+
+Both stores are read-through caches: a blob is downloaded at most once until
+clear_cache() is called (once per report), and writes update the cached copy.
+Writes can be made conditional on the generation that was last read, so two
+runs can't silently overwrite each other.
+"""
+import os
+import threading
+
+from google.cloud import storage
+from google.api_core import exceptions as gcs_exceptions
+
+
+class ConflictError(Exception):
+    """The blob changed since we read it (generation mismatch)."""
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """One storage.Client per process: auth and connection setup happen once."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = storage.Client()
+        return _client
+
+
+class _CachingStore:
+    def __init__(self):
+        self._cache = {}        # name -> text (None = known missing)
+        self._generations = {}  # name -> generation of the cached copy (0 = missing)
+        self._lock = threading.Lock()
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+            self._generations.clear()
+
+    def read_text(self, name):
+        """Returns the blob content, or None if it doesn't exist. Served from cache after the first read."""
+        with self._lock:
+            if name in self._cache:
+                return self._cache[name]
+        text, generation = self._download(name)
+        with self._lock:
+            self._cache[name] = text
+            self._generations[name] = generation
+        return text
+
+    def generation(self, name):
+        """Generation seen by the last read/write of `name` (0 if it didn't exist), or None if unknown."""
+        with self._lock:
+            return self._generations.get(name)
+
+    def write_text(self, name, text, if_generation_match=None):
+        """
+        Uploads `text`. With if_generation_match (0 = must not exist), raises ConflictError
+        if someone else wrote the blob in the meantime.
+        """
+        generation = self._upload(name, text, if_generation_match)
+        with self._lock:
+            self._cache[name] = text
+            self._generations[name] = generation
+
+    def delete(self, name):
+        self._remove(name)
+        with self._lock:
+            self._cache[name] = None
+            self._generations[name] = 0
+
+
+class GCSBlobStore(_CachingStore):
+    def __init__(self, bucket_name):
+        super().__init__()
+        self.bucket_name = bucket_name
+        self._bucket = None
+
+    @property
+    def bucket(self):
+        if self._bucket is None:
+            self._bucket = get_client().bucket(self.bucket_name)
+        return self._bucket
+
+    def describe(self, name):
+        return f"gs://{self.bucket_name}/{name}"
+
+    def _download(self, name):
+        # One round-trip: a missing blob is a NotFound, no separate exists() call
+        blob = self.bucket.blob(name)
+        try:
+            text = blob.download_as_text()
+        except gcs_exceptions.NotFound:
+            return None, 0
+        return text, blob.generation
+
+    def _upload(self, name, text, if_generation_match):
+        blob = self.bucket.blob(name)
+        try:
+            blob.upload_from_string(text, if_generation_match=if_generation_match)
+        except gcs_exceptions.PreconditionFailed as e:
+            raise ConflictError(f"{self.describe(name)} changed since it was read") from e
+        return blob.generation
+
+    def list(self, prefix):
+        return sorted(blob.name for blob in self.bucket.list_blobs(prefix=prefix))
+
+    def _remove(self, name):
+        try:
+            self.bucket.blob(name).delete()
+        except gcs_exceptions.NotFound:
+            pass
+
+
+class LocalBlobStore(_CachingStore):
+    def __init__(self, root):
+        super().__init__()
+        self.root = root
+        self._write_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.root, *name.split("/"))
+
+    def describe(self, name):
+        return self._path(name)
+
+    def _current_generation(self, path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def _download(self, name):
+        path = self._path(name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read(), self._current_generation(path)
+        except FileNotFoundError:
+            return None, 0
+
+    def _upload(self, name, text, if_generation_match):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._write_lock:
+            if if_generation_match is not None and self._current_generation(path) != if_generation_match:
+                raise ConflictError(f"{path} changed since it was read")
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+            return self._current_generation(path)
+
+    def list(self, prefix):
+        names = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+                rel = os.path.relpath(os.path.join(dirpath, filename), self.root).replace(os.sep, "/")
+                if rel.startswith(prefix):
+                    names.append(rel)
+        return sorted(names)
+
+    def _remove(self, name):
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(bucket_name=None, local_dir=None):
+    """
+    Shared store per bucket (or local directory), so every caller in a report
+    hits the same client and read-through cache.
+    """
+    key = ("gcs", bucket_name) if bucket_name else ("local", local_dir)
+    if key[1] is None:
+        raise ValueError("BUCKET_NAME environment variable not set.")
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = GCSBlobStore(bucket_name) if bucket_name else LocalBlobStore(local_dir)
+        return _stores[key]
+
+
+def clear_caches():
+    """Called at the start of each report so it sees fresh data, then reads each blob once."""
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.clear_cache()
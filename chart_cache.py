@@ -0,0 +1,86 @@
+"""
+On-disk PNG cache for report charts.
+
+A chart is keyed by a fingerprint of its kind, title, style, dates and values,
+so an unchanged series (weekends, the evening edition) is served as the bytes
+rendered last time without touching matplotlib. Files are evicted least
+recently used first once the directory exceeds its size budget.
+"""
+import hashlib
+import json
+import os
+import threading
+
+from config import CACHE_DIR
+
+MAX_CACHE_BYTES = 20 * 1024 * 1024  # 20 MB of PNGs
+
+
+def fingerprint(kind, title, dates, values, params=None):
+    """Stable hash of everything that affects the rendered image."""
+    payload = {
+        "kind": kind,
+        "title": title,
+        "params": params or {},
+        "dates": [d.isoformat() if hasattr(d, "isoformat") else str(d) for d in dates],
+        "values": [repr(float(v)) for v in values],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ChartCache:
+    def __init__(self, directory=None, max_bytes=MAX_CACHE_BYTES):
+        self.directory = directory or os.path.join(CACHE_DIR, "charts")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".png")
+
+    def get(self, key):
+        """PNG bytes for `key`, or None. A hit refreshes the file's LRU position (its mtime)."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                png = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return png
+
+    def put(self, key, png):
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(png)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".png"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def stats(self):
+        total = self.hits + self.misses
+        ratio = (self.hits / total * 100) if total else 0
+        return f"{self.hits} hits / {self.misses} misses ({ratio:.0f}% hit rate)"
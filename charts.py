@@ -0,0 +1,156 @@
+"""
+Chart rendering for the report.
+
+Uses matplotlib's object API (Figure + Agg canvas) instead of pyplot, so there is
+no global figure state. matplotlib still isn't thread-safe (shared font and text
+caches), so charts drawn in this process are drawn one at a time; report sections
+may call in concurrently.
+A ChartTemplate builds its figure, axes, line, grid and date formatter once; each
+chart only swaps the line data and title. render_batch spreads a batch of
+charts over a process pool.
+
+Rendered PNGs are cached by series fingerprint (chart_cache.py); matplotlib is
+only imported when a chart actually has to be drawn.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+
+from chart_cache import ChartCache, fingerprint
+
+STOCK = "stock"
+PORTFOLIO = "portfolio"
+
+# kind -> figure size, line style, date format, and whether a single point gets a ±2 day window
+SPECS = {
+    STOCK: {"figsize": (6, 3), "line": {"marker": "o", "linestyle": "-"}, "date_format": "%m-%d", "pad_single": False},
+    PORTFOLIO: {"figsize": (8, 4), "line": {"color": "green", "marker": "o", "linestyle": "-"}, "date_format": "%Y-%m-%d", "pad_single": True},
+}
+
+TEMPLATE_VERSION = 1  # Bump when the templates change, so cached PNGs are redrawn
+POOL_MIN_CHARTS = 8  # Smaller batches render inline; not worth the inter-process hop
+CHART_WORKERS = int(os.environ.get("CHART_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+class ChartTemplate:
+    def __init__(self, kind):
+        # Imported here so processes that never draw don't pay for matplotlib
+        from datetime import datetime
+        from matplotlib.figure import Figure
+        import matplotlib.dates as mdates
+
+        spec = SPECS[kind]
+        self.pad_single = spec["pad_single"]
+        self.figure = Figure(figsize=spec["figsize"])
+        self.ax = self.figure.add_subplot()
+        # Plotting a datetime once registers the date converter for set_data later
+        (self.line,) = self.ax.plot([datetime(2000, 1, 1)], [0.0], **spec["line"])
+        self.ax.grid(True, linestyle='--', alpha=0.7)
+        self.ax.xaxis.set_major_formatter(mdates.DateFormatter(spec["date_format"]))
+        self.ax.tick_params(axis='x', labelrotation=45)
+
+    def render(self, title, dates, values):
+        """Returns the chart as PNG bytes."""
+        self.line.set_data(dates, values)
+        self.ax.set_title(title)
+        self.ax.autoscale(enable=True)
+        self.ax.relim()
+        self.ax.autoscale_view()
+        # Fix for single data point (Matplotlib default is too wide)
+        if self.pad_single and len(dates) == 1:
+            self.ax.set_xlim(dates[0] - timedelta(days=2), dates[0] + timedelta(days=2))
+        self.figure.tight_layout()
+
+        buf = BytesIO()
+        self.figure.savefig(buf, format='png')
+        return buf.getvalue()
+
+
+_templates = {}
+_draw_lock = threading.Lock()  # One chart at a time per process (pool workers are separate processes)
+
+
+def draw(kind, title, dates, values):
+    """Renders one chart with this process's template for `kind` (no cache)."""
+    with _draw_lock:
+        if kind not in _templates:
+            _templates[kind] = ChartTemplate(kind)
+        return _templates[kind].render(title, list(dates), list(values))
+
+
+def _render_jobs(jobs):
+    return [draw(*job) for job in jobs]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide chart cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ChartCache()
+        return _cache
+
+
+def chart_key(kind, title, dates, values):
+    params = dict(SPECS[kind], version=TEMPLATE_VERSION)
+    return fingerprint(kind, title, dates, values, params)
+
+
+def render(kind, title, dates, values):
+    """PNG bytes for one chart, from the cache when the series hasn't changed."""
+    return render_batch([(kind, title, dates, values)], workers=1)[0]
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(workers):
+    """Long-lived pool per size: workers keep their templates between reports."""
+    with _pools_lock:
+        if workers not in _pools:
+            # spawn: the report process runs threads, which don't mix with fork. Each spawned
+            # worker re-runs the launching script as __mp_main__, so the app is served through
+            # `python -m uvicorn` (skipped) rather than `python news_agent.py` (app, clients and all)
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pools[workers]
+
+
+def draw_batch(jobs, workers=None):
+    """
+    jobs: [(kind, title, dates, values)] -> [png bytes] in the same order, always drawn.
+    Uses the process pool for large batches and falls back to rendering inline.
+    """
+    workers = CHART_WORKERS if workers is None else workers
+    if workers <= 1 or len(jobs) < POOL_MIN_CHARTS:
+        return _render_jobs(jobs)
+    chunk = -(-len(jobs) // workers)
+    chunks = [jobs[i:i + chunk] for i in range(0, len(jobs), chunk)]
+    try:
+        results = get_pool(workers).map(_render_jobs, chunks)
+        return [png for part in results for png in part]
+    except Exception as e:
+        print(f"Chart pool failed, rendering inline: {e}")
+        return _render_jobs(jobs)
+
+
+def render_batch(jobs, workers=None):
+    """Like draw_batch, but charts whose series are unchanged come from the cache."""
+    cache = get_cache()
+    keys = [chart_key(*job) for job in jobs]
+    pngs = [cache.get(key) for key in keys]
+    missing = [i for i, png in enumerate(pngs) if png is None]
+    if missing:
+        for i, png in zip(missing, draw_batch([jobs[i] for i in missing], workers)):
+            pngs[i] = png
+            cache.put(keys[i], png)
+    if len(jobs) > 1:
+        print(f"Charts: {len(jobs) - len(missing)} cached, {len(missing)} rendered")
+    return pngs
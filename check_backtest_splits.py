@@ -0,0 +1,97 @@
+"""
+Backtest split check: NVDA's 10:1 split (2024-06-10) over a held position.
+
+  1. Adjusted bars: the split is invisible, STOP_LOSS never fires and the position is kept
+  2. Raw bars: run_backtest refuses them (a -90% day)
+  3. Raw bars forced through (allow_split_moves): the false STOP_LOSS the guard prevents
+
+python3 check_backtest_splits.py
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import backtest
+import price_store
+from price_store import PriceStore
+from scan_corpus import ScanCorpus
+
+SPLIT_DAY = pd.Timestamp("2024-06-10")
+SPLIT_RATIO = 10.0
+
+
+def nvda_closes(days):
+    """Raw closes: a 3% dip on day 2 (dip buy), a slow drift up, then the split."""
+    closes = 1000.0 * 1.0005 ** np.arange(len(days))
+    closes[1:] *= 0.97
+    closes[days >= SPLIT_DAY] /= SPLIT_RATIO
+    return closes
+
+
+def fill(directory, name, closes, days):
+    store = PriceStore(os.path.join(directory, name))
+    store.append("NVDA", price_store.make_bars(days, closes, closes, closes, closes, np.full(len(days), 1e6)))
+    return store
+
+
+class Recorder:
+    def __init__(self, provider):
+        self.provider = provider
+        self.reasons = []
+
+    def decide(self, day, candidates, market_context=None):
+        decisions = self.provider.decide(day, candidates, market_context)
+        self.reasons += [(day, d["reason"]) for d in decisions.values()]
+        return decisions
+
+
+def run(store, corpus, days, **kwargs):
+    recorder = Recorder(backtest.RuleProvider())
+    result = backtest.run_backtest(recorder, days[0].date(), days[-1].date(), symbols=["NVDA"],
+                                   store=store, corpus=corpus, **kwargs)
+    stops = [(day, reason) for day, reason in recorder.reasons if reason.startswith("Stop loss")]
+    return result, stops
+
+
+def main():
+    checks = []
+    directory = tempfile.mkdtemp(prefix="backtest_splits_")
+    try:
+        days = pd.bdate_range("2024-05-01", "2024-07-15")
+        raw = nvda_closes(days)
+        adjusted = np.where(days < SPLIT_DAY, raw / SPLIT_RATIO, raw)
+        corpus = ScanCorpus(os.path.join(directory, "scans.jsonl"))
+
+        result, stops = run(fill(directory, "adjusted", adjusted, days), corpus, days)
+        s = result.summary()
+        print(f"   Adjusted: {s['trades']} trade(s), final ${s['final_equity']:.2f} ({s['return_pct']:+.2f}%), stop losses {stops}")
+        checks.append(("adjusted bars: no STOP_LOSS at the split", not stops))
+        checks.append(("adjusted bars: the position bought on the dip is held through the split",
+                       s['trades'] == 1 and result.state["portfolio"].get("NVDA", {}).get("qty", 0) > 0))
+
+        raw_store = fill(directory, "raw", raw, days)
+        try:
+            run(raw_store, corpus, days)
+            refused = None
+        except ValueError as e:
+            refused = str(e)
+        print(f"   Raw: {refused}")
+        checks.append(("raw bars are refused", refused is not None and "NVDA -90% on 2024-06-10" in refused))
+
+        result, stops = run(raw_store, corpus, days, allow_split_moves=True)
+        print(f"   Raw, forced: {result.summary()['return_pct']:+.2f}%, stop losses {stops}")
+        checks.append(("raw bars forced through: the false STOP_LOSS the guard prevents", bool(stops)))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print()
+    for name, ok in checks:
+        print(f"   {'✅' if ok else '❌'} {name}")
+    return 0 if all(ok for _, ok in checks) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
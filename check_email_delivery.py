@@ -0,0 +1,67 @@
+"""
+Delivery check: sends a report through EmailService to a local aiosmtpd server
+and verifies what arrived (one SMTP connection, every subject/recipient, intact
+chart images and attachments).
+
+pip install aiosmtpd
+python3 check_email_delivery.py
+"""
+import email
+import os
+from io import BytesIO
+
+from aiosmtpd.controller import Controller
+
+PORT = 8025
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 4
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []  # (session id, recipients, parsed message)
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((id(session), list(envelope.rcpt_tos), email.message_from_bytes(envelope.content)))
+        return "250 OK"
+
+
+def main():
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=PORT)
+    controller.start()
+    os.environ.update({
+        "SMTP_SERVER": "127.0.0.1", "SMTP_PORT": str(PORT), "SMTP_STARTTLS": "0",
+        "EMAIL_USER": "bot@example.com", "EMAIL_PASSWORD": "unused",
+        "RECIPIENT_EMAIL": "reader@example.com, second@example.com",
+    })
+
+    from news_agent import EmailService
+    try:
+        service = EmailService()
+        images = {"chart_AAPL": BytesIO(PNG), "chart_portfolio": BytesIO(PNG)}
+        rendered = service.render("<html><body><h1>Report</h1></body></html>", images=images,
+                                  attachments={"transaction_history.txt": "2025-01-02: BOUGHT 1.0 AAPL"})
+        deliveries = [
+            ("AI News Report - čćžšđ", service.recipients),
+            ("Weekly digest", ["digest@example.com"]),
+        ]
+        sent = service.deliver(rendered, deliveries)
+    finally:
+        controller.stop()
+
+    sessions = {session for session, _, _ in handler.messages}
+    print(f"\n📬 {sent}/{len(deliveries)} deliveries, {len(handler.messages)} messages received over {len(sessions)} SMTP connection(s)")
+    ok = sent == len(deliveries) == len(handler.messages) and len(sessions) == 1
+    for (subject, recipients), (_, rcpt_tos, msg) in zip(deliveries, handler.messages):
+        got_subject = str(email.header.make_header(email.header.decode_header(msg["Subject"])))
+        pngs = [part.get_payload(decode=True) for part in msg.walk() if part.get_content_type() == "image/png"]
+        files = [part.get_filename() for part in msg.walk() if part.get_filename()]
+        intact = len(pngs) == 2 and all(p == PNG for p in pngs)
+        print(f"   '{got_subject}' -> {rcpt_tos}: {len(pngs)} images {'intact' if intact else 'BROKEN'}, attachments {files}")
+        ok = ok and got_subject == subject and rcpt_tos == recipients and intact and files == ["transaction_history.txt"]
+    print("✅ Delivery OK" if ok else "❌ Delivery check failed")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
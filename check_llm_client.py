@@ -0,0 +1,158 @@
+"""
+Shared LLM client check against local fake Gemini models (no API key needed):
+  1. The model list is probed lazily: one list_models call on the first request, no "Ping" generations
+  2. 503s are retried with backoff; a 404 model is dropped and the next one answers
+  3. A client error (400) is raised at once: no retries, no fallback
+  4. The circuit opens after repeated failures (requests then fail fast) and closes after a good trial call
+  5. Hedged requests cut the tail latency of a model with occasional slow answers
+  6. Streaming through llm_cache: an error before the first chunk is retried; chunks add up to the text
+
+python3 check_llm_client.py
+"""
+import random
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+from google.api_core import exceptions
+
+import llm_cache
+from llm_cache import LLMCache
+from llm_client import LLMClient, LLMUnavailable
+
+
+class FakeModel:
+    """generate_content like google-generativeai; `errors` are raised by the first calls, in order."""
+    def __init__(self, name, latency=0.0, errors=(), slow_every=None, slow_latency=0.0, text=None):
+        self.model_name = name
+        self.latency = latency
+        self.errors = list(errors)
+        self.slow_every = slow_every
+        self.slow_latency = slow_latency
+        self.text = text or f"answer from {name}"
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, stream=False, generation_config=None):
+        with self._lock:
+            self.calls += 1
+            error = self.errors.pop(0) if self.errors else None
+            slow = self.slow_every and self.calls % self.slow_every == 0
+        if error:
+            raise error
+        time.sleep(self.slow_latency if slow else self.latency)
+        if stream:
+            return (SimpleNamespace(text=self.text[i:i + 8]) for i in range(0, len(self.text), 8))
+        return SimpleNamespace(text=self.text)
+
+
+def client_for(models, listed=None, **kwargs):
+    by_name = {m.model_name: m for m in models}
+    probes = []
+
+    def list_models():
+        probes.append(1)
+        return [SimpleNamespace(name=f"models/{n}", supported_generation_methods=["generateContent"])
+                for n in (listed if listed is not None else by_name)]
+    client = LLMClient(models=list(by_name), factory=by_name.__getitem__, list_models=list_models,
+                       base_delay=0.01, **kwargs)
+    return client, probes
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    checks = []
+
+    # 1: lazy probe
+    a, b = FakeModel("model-a"), FakeModel("model-b")
+    client, probes = client_for([a, b], listed=["model-b"])
+    idle = (len(probes), a.calls + b.calls)
+    text = client.generate_content("hello").text
+    client.generate_content("hello again")
+    checks.append(("no calls until the first request, then one list_models and no Ping",
+                   idle == (0, 0) and len(probes) == 1 and b.calls == 2 and a.calls == 0 and text == "answer from model-b"))
+
+    # 2: backoff and 404 fallback
+    flaky = FakeModel("flaky", errors=[exceptions.ServiceUnavailable("overloaded")] * 2)
+    client, _ = client_for([flaky])
+    checks.append(("503 twice, then answered after backoff", client.generate_content("x").text == "answer from flaky" and flaky.calls == 3))
+    gone, backup = FakeModel("gone", errors=[exceptions.NotFound("models/gone is not found")]), FakeModel("backup")
+    client, _ = client_for([gone, backup])
+    text = client.generate_content("x").text
+    checks.append(("404 model dropped, next model answers", text == "answer from backup" and client.names == ["backup"]))
+
+    # 3: client errors are not retried
+    bad, other = FakeModel("bad", errors=[exceptions.InvalidArgument("prompt too long")]), FakeModel("other")
+    client, _ = client_for([bad, other])
+    try:
+        client.generate_content("x")
+        raised = False
+    except exceptions.InvalidArgument:
+        raised = True
+    checks.append(("400 raised at once: no retry, no fallback", raised and bad.calls == 1 and other.calls == 0))
+
+    # 4: circuit breaker
+    down = FakeModel("down", errors=[exceptions.ServiceUnavailable("down")] * 6)
+    client, _ = client_for([down], retries=1, breaker_failures=3, breaker_cooldown=0.5)
+    for _ in range(3):
+        try:
+            client.generate_content("x")
+        except exceptions.ServiceUnavailable:
+            pass
+    calls_when_open = down.calls
+    start = time.perf_counter()
+    try:
+        client.generate_content("x")
+        fast_fail = None
+    except LLMUnavailable:
+        fast_fail = time.perf_counter() - start
+    checks.append(("circuit opens after 3 failed requests; the next fails fast without a call",
+                   fast_fail is not None and fast_fail < 0.01 and down.calls == calls_when_open
+                   and client.breakers["down"].state == "open"))
+    print(f"   Circuit open: request failed in {fast_fail * 1000:.2f} ms (vs ~{calls_when_open} calls with backoff before)")
+    time.sleep(0.6)
+    down.errors = []  # Recovered
+    text = client.generate_content("x").text
+    checks.append(("after the cooldown a trial call closes the circuit", text == "answer from down" and client.breakers["down"].state == "closed"))
+
+    # 5: hedging
+    requests = 100
+    timings = {}
+    for label, hedge_after in (("no hedging", None), ("hedge after 0.15s", 0.15)):
+        primary = FakeModel("primary", latency=0.02, slow_every=10, slow_latency=1.0)
+        secondary = FakeModel("secondary", latency=0.03)
+        client, _ = client_for([primary, secondary], hedge_after=hedge_after)
+        latencies = []
+        for i in range(requests):
+            start = time.perf_counter()
+            client.generate_content(f"prompt {i}")
+            latencies.append(time.perf_counter() - start)
+        timings[label] = latencies
+        print(f"   {label:>18}: p50 {percentile(latencies, 0.5) * 1000:.0f} ms, p95 {percentile(latencies, 0.95) * 1000:.0f} ms, "
+              f"max {max(latencies) * 1000:.0f} ms, total {sum(latencies):.1f}s | {client.report().replace(chr(10), ' | ')}")
+    checks.append(("hedging cuts p95 latency", percentile(timings["hedge after 0.15s"], 0.95) < 0.5 * percentile(timings["no hedging"], 0.95)))
+
+    # 6: streaming through llm_cache
+    llm_cache._shared = LLMCache(path=tempfile.mktemp(suffix=".sqlite3"))
+    streaming = FakeModel("streaming", errors=[exceptions.ServiceUnavailable("reset")],
+                          text="<b>Markets</b> rallied as " + " ".join(f"story {i}" for i in range(20)))
+    client, _ = client_for([streaming])
+    pieces = []
+    text = llm_cache.get_cache().generate(client, "prompt", "world_summary", stream=pieces.append)
+    checks.append(("stream retried before the first chunk; chunks add up to the text",
+                   "".join(pieces) == text == streaming.text and len(pieces) > 1 and streaming.calls == 2))
+
+    print()
+    for name, ok in checks:
+        print(f"   {'✅' if ok else '❌'} {name}")
+    return 0 if all(ok for _, ok in checks) else 1
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    raise SystemExit(main())
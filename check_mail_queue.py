@@ -0,0 +1,103 @@
+"""
+Mail queue check against a local aiosmtpd server:
+  1. SMTP down: enqueue returns at once, the worker retries with backoff
+  2. SMTP back: the spooled message goes out
+  3. Several messages reuse one SMTP session
+  4. Server restarted: the dropped session is reopened
+  5. Process restart: mail left in the spool is recovered and sent
+
+pip install aiosmtpd
+python3 check_mail_queue.py
+"""
+import os
+import tempfile
+import time
+
+from aiosmtpd.controller import Controller
+
+import mail_queue
+from mail_queue import MailQueue, SMTPConnection
+
+PORT = 8026
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.sessions = []  # session id per received message
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.append(id(session))
+        return "250 OK"
+
+
+def message(subject):
+    return f"Subject: {subject}\nTo: reader@example.com\n\n<p>{subject}</p>"
+
+
+def wait_for(condition, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def new_queue(spool_dir):
+    connection = SMTPConnection("127.0.0.1", PORT, starttls=False, timeout=5)
+    return MailQueue(connection, spool_dir=spool_dir, base_delay=0.2, max_delay=1.0)
+
+
+def main():
+    mail_queue.KEEPALIVE_SECONDS = 0  # NOOP before every reuse, so restarts are noticed
+    handler = RecordingHandler()
+    spool_dir = tempfile.mkdtemp(prefix="mail_spool_")
+    checks = []
+
+    queue = new_queue(spool_dir)
+    start = time.perf_counter()
+    queue.enqueue("bot@example.com", ["reader@example.com"], message("During outage"), subject="During outage")
+    enqueue_ms = (time.perf_counter() - start) * 1000
+    wait_for(lambda: queue.retries >= 2)
+    checks.append(("enqueue doesn't block while SMTP is down", enqueue_ms < 100 and queue.sent == 0))
+    print(f"   enqueue took {enqueue_ms:.1f} ms; retries so far: {queue.retries}")
+
+    controller = Controller(handler, hostname="127.0.0.1", port=PORT)
+    controller.start()
+    checks.append(("spooled message delivered once SMTP is back", wait_for(lambda: queue.sent == 1)))
+
+    for i in range(3):
+        queue.enqueue("bot@example.com", ["reader@example.com"], message(f"Batch {i}"), subject=f"Batch {i}")
+    queue.flush(timeout=10)
+    checks.append(("batch reuses one SMTP session", len(set(handler.sessions[1:])) == 1 and queue.sent == 4))
+
+    controller.stop()
+    controller = Controller(handler, hostname="127.0.0.1", port=PORT)
+    controller.start()
+    queue.enqueue("bot@example.com", ["reader@example.com"], message("After restart"), subject="After restart")
+    checks.append(("reconnects after the server dropped the session", queue.flush(timeout=10) and queue.sent == 5))
+    print(f"   metrics: {queue.metrics()}")
+    queue.close(timeout=5)
+
+    # Spool survives a process restart
+    controller.stop()
+    queue = new_queue(spool_dir)
+    queue.enqueue("bot@example.com", ["reader@example.com"], message("Spooled"), subject="Spooled")
+    queue.close(timeout=0.5)
+    left = [f for f in os.listdir(spool_dir) if f.endswith(".json")]
+    controller = Controller(handler, hostname="127.0.0.1", port=PORT)
+    controller.start()
+    queue = new_queue(spool_dir)
+    recovered = queue.flush(timeout=10) and queue.sent == 1
+    checks.append(("spooled mail recovered after restart", len(left) == 1 and recovered))
+    queue.close(timeout=5)
+    controller.stop()
+
+    print()
+    for name, ok in checks:
+        print(f"   {'✅' if ok else '❌'} {name}")
+    return 0 if all(ok for _, ok in checks) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
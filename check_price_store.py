@@ -0,0 +1,123 @@
+"""
+Price store checks:
+  1. Concurrent writers to the same symbols (as the portfolio and simulation sections
+     do for AAPL/NVDA) lose no bars and raise nothing: two threads append 40 one-day
+     bars each, compacting as update() does, while a third keeps reading.
+  2. A 10:1 split re-bases an adjusted source: update() notices on the overlap day and
+     replaces the history, so the stored series has no -90% day.
+  3. Each source has its own store directory.
+
+python3 check_price_store.py
+"""
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+import price_store
+from price_store import PriceStore
+
+APPENDS = 40
+
+
+def one_bar(day, close):
+    return price_store.make_bars([day], [close], [close], [close], [close], [1e6])
+
+
+class SplitFeed:
+    """An adjusted source: a 10:1 split on `split_day`; history before it is divided by 10 once the split happened."""
+    def __init__(self, days, split_day):
+        self.days = days
+        self.split_day = split_day
+        self.today = days[0]
+        self.calls = []
+
+    def raw_close(self, day):
+        return (1000.0 if day < self.split_day else 100.0) + (day - self.days[0]).days * 0.1
+
+    def fetch(self, symbols, start):
+        self.calls.append(start)
+        days = [d for d in self.days if pd.Timestamp(start) <= d <= self.today]
+        factor = 10.0 if self.today >= self.split_day else 1.0
+        closes = [self.raw_close(d) / (factor if d < self.split_day else 1.0) for d in days]
+        return {s: price_store.make_bars(days, closes, closes, closes, closes, [1e6] * len(days)) for s in symbols}
+
+
+def check_split(checks, directory):
+    store = PriceStore(os.path.join(directory, "split"))
+    days = pd.bdate_range("2024-05-20", "2024-06-21")
+    feed = SplitFeed(days, split_day=pd.Timestamp("2024-06-10"))
+    for today in days:
+        feed.today = today
+        store.update(["NVDA"], feed.fetch, lookback_days=40, today=today.date())
+    closes = store.read("NVDA")["close"]
+    worst = (closes[1:] / closes[:-1] - 1).min() * 100
+    print(f"   Split: {len(closes)} stored days, worst daily move {worst:+.1f}%, {len(feed.calls)} fetch calls")
+    checks.append(("split: history replaced, no -90% day in the stored series", len(closes) == len(days) and worst > -5))
+    checks.append(("split: the raw day-over-day move is flagged as a suspect split",
+                   price_store.split_suspect(feed.raw_close(days[14]), feed.raw_close(days[15]))
+                   and not price_store.split_suspect(100.0, 93.0)))
+
+
+def main():
+    checks = []
+    directory = tempfile.mkdtemp(prefix="prices_")
+    try:
+        store = PriceStore(directory)
+        days = pd.bdate_range("2024-01-01", periods=2 * APPENDS)
+        errors, done = [], threading.Event()
+
+        def writer(offset):
+            try:
+                for i in range(offset, len(days), 2):
+                    for symbol in ("AAPL", "NVDA"):
+                        store.append(symbol, one_bar(days[i], 100 + i))
+                        store.compact_if_needed([symbol])
+            except Exception as e:
+                errors.append(e)
+
+        def reader():
+            try:
+                while not done.is_set():
+                    store.read("AAPL")
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=writer, args=(k,)) for k in (0, 1)]
+        watcher = threading.Thread(target=reader)
+        watcher.start()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        done.set()
+        watcher.join()
+
+        fresh = PriceStore(directory)
+        counts = {symbol: len(fresh.read(symbol)) for symbol in ("AAPL", "NVDA")}
+        leftovers = [n for root, _, names in os.walk(directory) for n in names if n.endswith(".tmp")]
+        print(f"   {2 * APPENDS} bars written per symbol from 2 threads: stored {counts}, errors {errors[:3]}")
+        checks.append(("no errors from concurrent writers, compaction and reads", not errors))
+        checks.append(("every appended bar survives", all(n == 2 * APPENDS for n in counts.values())))
+        checks.append(("closes match what was written",
+                       np.array_equal(fresh.read("AAPL")["close"], 100 + np.arange(2 * APPENDS))))
+        checks.append(("no temp files left behind", not leftovers))
+
+        check_split(checks, directory)
+        checks.append(("one store directory per source",
+                       price_store.get_store("alpaca-split").directory != price_store.get_store("yfinance-adjusted").directory
+                       and price_store.get_store("alpaca-split") is price_store.get_store("alpaca-split")))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print()
+    for name, ok in checks:
+        print(f"   {'✅' if ok else '❌'} {name}")
+    return 0 if all(ok for _, ok in checks) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
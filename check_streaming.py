@@ -0,0 +1,150 @@
+"""
+Streaming check against a local fake Gemini model (no API key needed):
+  1. Chunks reach the callback as they are generated; the first one at ~time to first token
+  2. The streamed chunks add up to the returned (and cached) text; a cache hit streams it once
+  3. A report section streams into its buffer: same HTML as the blocking call
+  4. A section that times out mid-stream keeps the text it had, instead of the placeholder,
+     as well-formed HTML (its open tags closed, whatever the cut-off point)
+  5. An error mid-stream leaves the partial text plus the error message
+
+python3 check_streaming.py
+"""
+import tempfile
+import time
+from html.parser import HTMLParser
+from types import SimpleNamespace
+
+import llm_cache
+import news_agent
+from llm_cache import LLMCache
+from report_pipeline import Section, run_sections, close_tags, TRUNCATED_NOTE, VOID_TAGS
+
+TEXT = "<b>Markets</b> rallied as inflation cooled; " + " ".join(f"story {i} moved prices." for i in range(40))
+
+
+class FakeStreamingModel:
+    """generate_content like google-generativeai: stream=True yields chunks with .text after a first-token delay."""
+    def __init__(self, text=TEXT, ttft=0.3, chunk_delay=0.02, chunk_chars=24, fail_after=None, name="fake-stream"):
+        self.text = text
+        self.ttft = ttft
+        self.chunk_delay = chunk_delay
+        self.chunk_chars = chunk_chars
+        self.fail_after = fail_after
+        self.model_name = name
+        self.calls = 0
+
+    def chunks(self):
+        time.sleep(self.ttft)
+        for n, i in enumerate(range(0, len(self.text), self.chunk_chars)):
+            if self.fail_after is not None and n == self.fail_after:
+                raise RuntimeError("503 stream reset")
+            yield SimpleNamespace(text=self.text[i:i + self.chunk_chars])
+            time.sleep(self.chunk_delay)
+
+    def generate_content(self, prompt, stream=False, generation_config=None):
+        self.calls += 1
+        if stream:
+            return self.chunks()
+        return SimpleNamespace(text="".join(c.text for c in self.chunks()))
+
+    def total_seconds(self):
+        return self.ttft + self.chunk_delay * -(-len(self.text) // self.chunk_chars)
+
+
+class StrictTags(HTMLParser):
+    """Every end tag must close the innermost open tag, and nothing may stay open."""
+    def __init__(self):
+        super().__init__()
+        self.stack, self.ok = [], True
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in VOID_TAGS:
+            self.stack.append(tag)
+
+    def handle_endtag(self, tag):
+        self.ok = self.ok and bool(self.stack) and self.stack.pop() == tag
+
+
+def well_formed(html):
+    parser = StrictTags()
+    parser.feed(html)
+    parser.close()
+    return parser.ok and not parser.stack and not parser.rawdata
+
+
+class FakeCollector:
+    def collect_world_news(self):
+        return [{"title": f"Story {i}", "link": f"https://example.com/{i}", "summary": "..."} for i in range(3)]
+
+    def unseen(self, articles):
+        return articles
+
+
+def summarizer(model):
+    s = news_agent.LLMSummarizer.__new__(news_agent.LLMSummarizer)  # Skips the API key setup
+    s.model = model
+    return s
+
+
+def main():
+    checks = []
+    llm_cache._shared = LLMCache(path=tempfile.mktemp(suffix=".sqlite3"))
+
+    # 1 + 2: callback timing and content
+    model = FakeStreamingModel()
+    arrivals, pieces = [], []
+    start = time.perf_counter()
+    text = llm_cache.get_cache().generate(model, "prompt A", "world_summary",
+                                          stream=lambda piece: (arrivals.append(time.perf_counter() - start), pieces.append(piece)))
+    total = time.perf_counter() - start
+    checks.append(("first chunk at ~TTFT, well before the end", arrivals[0] < model.ttft + 0.1 and arrivals[0] < total / 2))
+    checks.append(("chunks arrive incrementally", len(pieces) > 10 and arrivals[-1] - arrivals[0] > 0.5 * (total - model.ttft)))
+    checks.append(("chunks add up to the returned text", "".join(pieces) == text == TEXT))
+    replay = []
+    cached = llm_cache.get_cache().generate(model, "prompt A", "world_summary", stream=replay.append)
+    checks.append(("cache hit streams the cached text once", replay == [TEXT] and cached == TEXT and model.calls == 1))
+    print(f"   {llm_cache.get_cache().report(reset=False)}")
+
+    # 3: same HTML as the blocking call
+    blocking = summarizer(FakeStreamingModel(ttft=0, chunk_delay=0, name="blocking"))
+    world_summary = blocking.summarize_world_news(FakeCollector().collect_world_news())
+    expected = "<h1>World News</h1>"
+    expected += "<div style='background-color: #f0f8ff; padding: 15px; border-radius: 5px; margin-bottom: 20px;'>"
+    expected += "<h3>🌍 AI Summary</h3>" + f"<p>{world_summary}</p>"
+    expected += "".join(f"<h4><a href='{a['link']}'>{a['title']}</a></h4>" for a in FakeCollector().collect_world_news()) + "</div>"
+    streaming = summarizer(FakeStreamingModel(name="streaming"))
+    results = run_sections([Section("world", lambda _: news_agent.world_news_section(FakeCollector(), streaming))])
+    checks.append(("streamed section HTML equals the blocking version", results["world"]["html"] == expected))
+
+    # 4: timeout keeps the streamed part
+    slow = summarizer(FakeStreamingModel(chunk_delay=0.1, name="slow"))
+    placeholder = news_agent.unavailable_section("World News", summary="")
+    timeout = 1.0
+    results = run_sections([Section("world", lambda _: news_agent.world_news_section(FakeCollector(), slow),
+                                    timeout=timeout, placeholder=placeholder)])
+    html = results["world"]["html"]
+    kept = html[:-len(TRUNCATED_NOTE)]
+    checks.append(("timed-out section keeps its partial text", html.startswith("<h1>World News</h1><div")
+                   and "<b>Markets</b> rallied" in html and html.endswith(TRUNCATED_NOTE)
+                   and len(html) < len(expected) and html != placeholder["html"]))
+    print(f"   timeout at {timeout}s of ~{slow.model.total_seconds():.1f}s: kept {len(kept)} chars")
+    checks.append(("timed-out section is well-formed HTML", well_formed(html)))
+    cut_points = [expected[:n] for n in range(len(expected))]
+    checks.append((f"cut at any of {len(cut_points)} points, close_tags gives well-formed HTML",
+                   all(well_formed(close_tags(cut)) for cut in cut_points)))
+
+    # 5: error mid-stream
+    broken = summarizer(FakeStreamingModel(fail_after=3, name="broken"))
+    results = run_sections([Section("world", lambda _: news_agent.world_news_section(FakeCollector(), broken))])
+    html = results["world"]["html"]
+    checks.append(("error mid-stream: partial text + error message",
+                   TEXT[:72] in html and "Error generating summary: 503 stream reset" in html and html.endswith("</div>")))
+
+    print()
+    for name, ok in checks:
+        print(f"   {'✅' if ok else '❌'} {name}")
+    return 0 if all(ok for _, ok in checks) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,102 @@
+"""
+Near-duplicate story clustering (MinHash over character shingles).
+
+Wire stories (e.g. Hina) are republished by index.hr, tportal, jutarnji and the
+Dalmatia portals with slightly different titles. Before building a curation
+prompt we collapse each cluster to one representative article and remember how
+many portals carried it, so the LLM pays for the story once.
+"""
+import zlib
+
+import numpy as np
+
+from dedup import normalize_text
+
+SHINGLE_SIZE = 5        # Character n-grams; robust to small title rewrites
+NUM_PERM = 128          # MinHash signature length
+SIMILARITY = 0.5        # Estimated Jaccard above which two articles are one story
+SUMMARY_CHARS = 200     # Same window the curation prompts use
+
+_PRIME = np.uint64((1 << 61) - 1)
+_rng = np.random.default_rng(1234)  # Fixed seed: signatures are comparable across calls
+_A = _rng.integers(1, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+
+
+def article_text(article):
+    return normalize_text(f"{article.get('title', '')} {article.get('summary', '')[:SUMMARY_CHARS]}")
+
+
+def shingle_hashes(text, k=SHINGLE_SIZE):
+    if len(text) <= k:
+        grams = {text}
+    else:
+        grams = {text[i:i + k] for i in range(len(text) - k + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def minhash_signatures(texts):
+    """Returns an (n_texts, NUM_PERM) matrix; all permutations are applied in one broadcast."""
+    signatures = np.empty((len(texts), NUM_PERM), dtype=np.uint64)
+    for row, text in enumerate(texts):
+        hashes = shingle_hashes(text)
+        # (NUM_PERM, 1) * (1, n_shingles) -> min over shingles
+        signatures[row] = ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1)
+    return signatures
+
+
+def similarity_matrix(signatures, chunk=256):
+    """Estimated Jaccard similarity for every pair, computed in row chunks to bound memory."""
+    n = len(signatures)
+    sims = np.empty((n, n), dtype=np.float32)
+    for start in range(0, n, chunk):
+        block = signatures[start:start + chunk]
+        sims[start:start + chunk] = (block[:, None, :] == signatures[None, :, :]).mean(axis=2)
+    return sims
+
+
+def cluster_labels(texts, threshold=SIMILARITY):
+    """Connected components of the 'similar enough' graph. Label = index of the first member."""
+    n = len(texts)
+    labels = np.arange(n)
+    if n < 2:
+        return labels
+    sims = similarity_matrix(minhash_signatures(texts))
+    rows, cols = np.nonzero(np.triu(sims >= threshold, k=1))
+
+    parent = list(range(n))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in zip(rows.tolist(), cols.tolist()):
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            # Keep the earliest article as root so feed order decides the representative
+            parent[max(ri, rj)] = min(ri, rj)
+    return np.array([find(i) for i in range(n)])
+
+
+def collapse_near_duplicates(articles, threshold=SIMILARITY):
+    """
+    Returns one article per story, in original order.
+    Each representative is a copy with a 'sources' count of how many articles it stands for.
+    """
+    if not articles:
+        return []
+    labels = cluster_labels([article_text(a) for a in articles], threshold)
+    counts = np.bincount(labels, minlength=len(articles))
+
+    collapsed = []
+    for i, article in enumerate(articles):
+        if labels[i] == i:
+            representative = dict(article)
+            representative['sources'] = int(counts[i])
+            collapsed.append(representative)
+
+    if len(collapsed) < len(articles):
+        print(f"Clustering: {len(articles)} articles -> {len(collapsed)} stories")
+    return collapsed
@@ -1,3 +1,5 @@
+import os
+
 # Shared Configuration for News Agent and Trading Simulation
 
 # --- TRADING STRATEGY RULES ---
@@ -102,6 +104,42 @@ Tech/software (Value): Oracle (ORCL)
     
 
 """
+# Sector grouping of MARKET_UNIVERSE (as documented above), used for sector aggregates
+SECTORS = {
+    "Tech & Growth 💻": ["AAPL", "TSLA", "NVDA", "AMD", "MSFT", "AMZN", "GOOGL", "META", "INTC", "PLTR", "ORCL"],
+    "Finance 🏦": ["JPM", "V", "MA", "BAC"],
+    "Healthcare ⚕️": ["JNJ", "PFE", "MRK", "UNH"],
+    "Retail & Consumer 🛒": ["WMT", "HD", "MCD", "PG", "KO", "PEP"],
+    "Energy 🛢️": ["XOM", "CVX"],
+}
+
+# Company names as they appear in headlines, for matching news to MARKET_UNIVERSE tickers
+COMPANY_NAMES = {
+    "AAPL": "Apple", "TSLA": "Tesla", "NVDA": "Nvidia", "AMD": "AMD", "MSFT": "Microsoft",
+    "AMZN": "Amazon", "GOOGL": "Google", "META": "Meta", "INTC": "Intel", "PLTR": "Palantir",
+    "ORCL": "Oracle", "JPM": "JPMorgan", "V": "Visa", "MA": "Mastercard", "BAC": "Bank of America",
+    "JNJ": "Johnson & Johnson", "PFE": "Pfizer", "MRK": "Merck", "UNH": "UnitedHealth",
+    "WMT": "Walmart", "HD": "Home Depot", "MCD": "McDonald's", "PG": "Procter & Gamble",
+    "KO": "Coca-Cola", "PEP": "PepsiCo", "XOM": "Exxon Mobil", "CVX": "Chevron",
+}
+
+# Other names the same companies go by in the news (subsidiaries, share classes, short forms)
+TICKER_ALIASES = {
+    "GOOGL": ["Alphabet", "GOOG"],
+    "META": ["Facebook", "Instagram", "WhatsApp"],
+    "AMZN": ["AWS", "Amazon Web Services"],
+    "AAPL": ["iPhone"],
+    "JPM": ["JPMorgan Chase", "JP Morgan", "J.P. Morgan"],
+    "BAC": ["BofA"],
+    "JNJ": ["J&J"],
+    "UNH": ["UnitedHealthcare"],
+    "MCD": ["McDonalds"],
+    "PG": ["P&G"],
+    "KO": ["Coca Cola"],
+    "PEP": ["Pepsi"],
+    "XOM": ["ExxonMobil", "Exxon"],
+}
+
 # User's current share counts for portfolio calculation
 # (Also acts as the list of stocks in the user's portfolio)
 MY_HOLDINGS = {
@@ -149,3 +187,12 @@ DALMATIA_NEWS_FEEDS = [
     "https://www.dalmacijadanas.hr/feed",
     "https://dalmatinskiportal.hr/rss",
 ]
+
+
+# --- LOCAL CACHES ---
+# On-disk caches (feeds, LLM responses, charts...) live under this directory.
+CACHE_DIR = os.environ.get("CACHE_DIR", ".cache")
+
+# --- GEMINI MODELS ---
+# Tried in order by the shared LLM client (llm_client.py); later ones are fallbacks.
+GEMINI_MODELS = [m.strip() for m in os.environ.get("GEMINI_MODELS", "gemini-2.5-flash,gemini-2.0-flash").split(",") if m.strip()]
@@ -0,0 +1,119 @@
+"""
+Cross-run article deduplication.
+
+Articles are keyed twice: by canonical link (tracking params stripped, host
+normalized) and by a hash of the normalized title + summary. An article is
+emitted only if its link is new, or its link is known but the content changed,
+and the same content hasn't already been seen under another link.
+Entries expire after a TTL so the index stays bounded.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from config import CACHE_DIR
+
+TTL_SECONDS = 3 * 24 * 3600  # Remember articles for 3 days (6 reports)
+
+# Query parameters that only track the click and never change the article
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "ncid", "cmpid",
+                   "guccounter", "guce_referrer", "guce_referrer_sig", ".tsrc", "yptr", "ref", "ref_src", "src", "at_medium", "at_campaign"}
+TRACKING_PREFIXES = ("utm_",)
+
+TAG_RE = re.compile(r"<[^>]+>")
+NON_WORD_RE = re.compile(r"[^\w]+")
+
+
+def canonical_url(link):
+    """Normalizes a link so the same story shared with different tracking tags maps to one key."""
+    if not link:
+        return ""
+    parts = urlsplit(link.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)]
+    path = parts.path.rstrip("/") or "/"
+    # http/https and fragments never change the article
+    return urlunsplit(("https", host, path, urlencode(sorted(query)), ""))
+
+
+def normalize_text(text):
+    text = TAG_RE.sub(" ", text or "")
+    return NON_WORD_RE.sub(" ", text.lower()).strip()
+
+
+def content_hash(title, summary):
+    normalized = normalize_text(title) + "\n" + normalize_text(summary)
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+class DedupIndex:
+    def __init__(self, path=None, ttl=TTL_SECONDS):
+        self.path = path or os.path.join(CACHE_DIR, "seen_articles.json")
+        self.ttl = ttl
+        self.urls = {}    # canonical url -> {"hash": ..., "seen": ts}
+        self.hashes = {}  # content hash -> ts
+        self._lock = threading.Lock()  # Report sections filter concurrently
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.urls = data.get("urls", {})
+            self.hashes = data.get("hashes", {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Dedup index unreadable, starting empty: {e}")
+        self.prune()
+
+    def prune(self, now=None):
+        cutoff = (now or time.time()) - self.ttl
+        self.urls = {u: e for u, e in self.urls.items() if e["seen"] >= cutoff}
+        self.hashes = {h: ts for h, ts in self.hashes.items() if ts >= cutoff}
+
+    def is_new(self, article, now=None):
+        """Checks an article and records it. Returns False for duplicates."""
+        now = now or time.time()
+        url = canonical_url(article.get('link', ''))
+        digest = content_hash(article.get('title', ''), article.get('summary', ''))
+
+        with self._lock:
+            known = self.urls.get(url) if url else None
+            if known and known["hash"] == digest:
+                return False  # Same link, same content
+            if digest in self.hashes:
+                return False  # Same content under another link (syndicated / other feed)
+
+            if url:
+                self.urls[url] = {"hash": digest, "seen": now}
+            self.hashes[digest] = now
+            return True
+
+    def filter(self, articles):
+        """Keeps only unseen or changed articles, preserving order."""
+        fresh = [art for art in articles if self.is_new(art)]
+        skipped = len(articles) - len(fresh)
+        if skipped:
+            print(f"Dedup: skipped {skipped} already-seen articles ({len(fresh)} new)")
+        return fresh
+
+    def save(self):
+        """Persists what this run has seen. Call only after the report went out."""
+        with self._lock:
+            self.prune()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"urls": self.urls, "hashes": self.hashes}, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,117 @@
+"""
+Persistent HTTP cache for RSS feeds.
+
+Stores the body plus ETag/Last-Modified of every feed on disk so the next run
+can send a conditional GET and serve a 304 from the local copy.
+The store is bounded by size; the least recently used feeds are evicted first.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from config import CACHE_DIR
+
+MAX_CACHE_BYTES = 50 * 1024 * 1024  # 50 MB of feed bodies
+
+
+class FeedCache:
+    def __init__(self, directory=None, max_bytes=MAX_CACHE_BYTES):
+        self.directory = directory or os.path.join(CACHE_DIR, "feeds")
+        self.index_path = os.path.join(self.directory, "index.json")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self.entries = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Feed cache index unreadable, starting empty: {e}")
+            return {}
+
+    def _body_path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".xml")
+
+    def conditional_headers(self, url):
+        """Validators to send with the next request for `url`."""
+        with self._lock:
+            entry = self.entries.get(url)
+            if not entry:
+                return {}
+            headers = {}
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+            return headers
+
+    def get(self, url):
+        """Returns (body, content_type) for a 304 response, or None if the copy is gone."""
+        with self._lock:
+            entry = self.entries.get(url)
+            if not entry:
+                return None
+            try:
+                with open(self._body_path(url), "rb") as f:
+                    body = f.read()
+            except OSError:
+                del self.entries[url]
+                return None
+            entry["last_used"] = time.time()
+            self.hits += 1
+            self.bytes_saved += len(body)
+            return body, entry.get("content_type", "")
+
+    def store(self, url, body, etag=None, last_modified=None, content_type=""):
+        """Records a full (200) response."""
+        with self._lock:
+            self.misses += 1
+            if not etag and not last_modified:
+                # Nothing to revalidate with, so keeping the body is pointless
+                self.entries.pop(url, None)
+                return
+            with open(self._body_path(url), "wb") as f:
+                f.write(body)
+            self.entries[url] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "content_type": content_type,
+                "size": len(body),
+                "last_used": time.time(),
+            }
+            self._evict()
+
+    def _evict(self):
+        total = sum(e["size"] for e in self.entries.values())
+        if total <= self.max_bytes:
+            return
+        for url, entry in sorted(self.entries.items(), key=lambda item: item[1]["last_used"]):
+            try:
+                os.remove(self._body_path(url))
+            except OSError:
+                pass
+            del self.entries[url]
+            total -= entry["size"]
+            if total <= self.max_bytes:
+                break
+
+    def save(self):
+        with self._lock:
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.index_path)
+
+    def stats(self):
+        total = self.hits + self.misses
+        ratio = (self.hits / total * 100) if total else 0
+        return f"{self.hits} hits / {self.misses} misses ({ratio:.0f}% hit rate, {self.bytes_saved / 1024:.0f} KB not re-downloaded)"
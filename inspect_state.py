@@ -3,6 +3,8 @@ import os
 import json
 from google.cloud import storage
 
+from ledger import history_lines
+
 # Hardcoded from logs
 BUCKET_NAME = "my-news-agent-data"
 STATE_FILE_NAME = 'portfolio_ai_state.json'
@@ -20,7 +22,7 @@ def inspect_state():
             state = json.loads(content)
             
             print("\n--- 📜 LAST 15 HISTORY ENTRIES ---")
-            history = state.get("history", [])
+            history = history_lines(state)
             for entry in history[-15:]:
                 print(f"   {entry}")
                 
@@ -0,0 +1,94 @@
+"""
+Structured trade ledger.
+
+States used to carry state["history"], a list of display strings ("2025-01-02: SOLD 1.5 AAPL").
+Searching it with substrings is O(n) per check and matches "V" inside "CVX".
+The ledger keeps typed records in state["trades"] with per-symbol, per-date and
+(date, side, symbol) indexes, so cooldown checks are O(1). The trades are the only
+stored copy; history_lines() renders the display strings when they are needed.
+"""
+import re
+from collections import defaultdict, namedtuple
+
+Trade = namedtuple("Trade", "date side symbol qty price")
+
+HISTORY_RE = re.compile(r"^(\d{4}-\d{2}-\d{2}): (BOUGHT|SOLD) ([0-9.eE+-]+) (\S+)$")
+SIDES = {"BOUGHT": "buy", "SOLD": "sell"}
+VERBS = {side: verb for verb, side in SIDES.items()}
+
+
+def parse_history_entry(entry):
+    """'2025-01-02: SOLD 1.5 AAPL' -> Trade. The old strings carry no price, so it is None."""
+    match = HISTORY_RE.match(entry.strip())
+    if not match:
+        return None
+    day, verb, qty, symbol = match.groups()
+    return Trade(day, SIDES[verb], symbol, float(qty), None)
+
+
+def migrate_history(history):
+    """Converts the legacy string history to trade records, skipping lines that don't parse."""
+    trades = []
+    for entry in history:
+        trade = parse_history_entry(entry)
+        if trade:
+            trades.append(trade)
+    return trades
+
+
+def ensure_trades(state):
+    """
+    Adds state["trades"] (migrated from the string history) to states saved before the ledger
+    existed, and drops the string history: every trade is stored once.
+    """
+    if "trades" not in state:
+        state["trades"] = [t._asdict() for t in migrate_history(state.get("history", []))]
+    state.pop("history", None)
+    return state["trades"]
+
+
+def format_trade(trade):
+    """Trade -> '2025-01-02: SOLD 1.5 AAPL', the line the transaction history always showed."""
+    return f"{trade.date}: {VERBS[trade.side]} {trade.qty} {trade.symbol}"
+
+
+def history_lines(state):
+    """The transaction history as display strings, derived from state["trades"]."""
+    return [format_trade(Trade(**record)) for record in ensure_trades(state)]
+
+
+class TradeLedger:
+    def __init__(self, trades=()):
+        self.trades = []
+        self._by_symbol = defaultdict(list)
+        self._by_date = defaultdict(list)
+        self._keys = set()  # (date, side, symbol)
+        for trade in trades:
+            self.add(trade)
+
+    @classmethod
+    def from_state(cls, state):
+        """Builds the ledger from state["trades"], migrating state["history"] the first time."""
+        return cls(Trade(**record) for record in ensure_trades(state))
+
+    def add(self, trade):
+        self.trades.append(trade)
+        self._by_symbol[trade.symbol].append(trade)
+        self._by_date[trade.date].append(trade)
+        self._keys.add((trade.date, trade.side, trade.symbol))
+
+    def has_trade(self, day, side, symbol):
+        return (str(day), side, symbol) in self._keys
+
+    def sold_on(self, day, symbol):
+        """Wash-trade check: did we sell exactly this symbol on that day?"""
+        return self.has_trade(day, "sell", symbol)
+
+    def for_symbol(self, symbol):
+        return list(self._by_symbol.get(symbol, []))
+
+    def on_date(self, day):
+        return list(self._by_date.get(str(day), []))
+
+    def __len__(self):
+        return len(self.trades)
@@ -0,0 +1,186 @@
+"""
+Content-addressed cache for Gemini responses (SQLite on local disk).
+
+The key is a hash of model name + generation config + prompt, so a byte-identical
+request (a /test-email retry, a re-run after a crash, a ticker whose price and
+news didn't move) is answered locally. Each call type has its own TTL and the
+table is capped with LRU eviction. Hits, misses and the latency they saved are
+tracked per call site.
+
+With stream=callback, generate() asks Gemini for a streamed response and hands
+each chunk to the callback as it arrives (a cache hit arrives as one chunk);
+time to first token and total latency are logged and tracked per call site.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from config import CACHE_DIR
+
+MAX_ENTRIES = 5000
+
+# Seconds a cached answer stays valid, per call site
+TTLS = {
+    "world_summary": 12 * 3600,
+    "nba_trends": 12 * 3600,
+    "croatian_news": 12 * 3600,
+    "dalmatia_news": 12 * 3600,
+    "tech_news": 12 * 3600,
+    "market_analysis": 3 * 3600,
+    "trading_decision": 30 * 60,
+}
+DEFAULT_TTL = 3600
+
+
+def model_name_of(model):
+    return getattr(model, "model_name", None) or type(model).__name__
+
+
+def cache_key(model_name, generation_config, prompt):
+    h = hashlib.sha256()
+    for part in (model_name, repr(generation_config), prompt):
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path=None, max_entries=MAX_ENTRIES, ttls=None):
+        self.path = path or os.path.join(CACHE_DIR, "llm_cache.sqlite3")
+        self.max_entries = max_entries
+        self.ttls = dict(TTLS, **(ttls or {}))
+        self.stats = {}  # call_type -> {"hits", "misses", "saved_s", "streamed", "ttft_s", "stream_s"}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                call_type TEXT NOT NULL,
+                text TEXT NOT NULL,
+                latency REAL NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON responses(last_used)")
+        self._db.commit()
+
+    def _count(self, call_type, field, amount=1):
+        entry = self.stats.setdefault(call_type, {"hits": 0, "misses": 0, "saved_s": 0.0,
+                                                  "streamed": 0, "ttft_s": 0.0, "stream_s": 0.0})
+        entry[field] += amount
+
+    def get(self, call_type, key):
+        now = time.time()
+        ttl = self.ttls.get(call_type, DEFAULT_TTL)
+        with self._lock:
+            row = self._db.execute("SELECT text, latency, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[2] > ttl:
+                if row is not None:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                self._count(call_type, "misses")
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self._count(call_type, "hits")
+            self._count(call_type, "saved_s", row[1])
+            return row[0]
+
+    def put(self, call_type, key, text, latency):
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                             (key, call_type, text, latency, now, now))
+            # LRU eviction once over the cap
+            self._db.execute("""
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )""", (self.max_entries,))
+            self._db.commit()
+
+    def generate(self, model, prompt, call_type, generation_config=None, validate=None, stream=None):
+        """
+        Drop-in for model.generate_content(prompt).text.
+        `validate(text)` may raise to keep a bad answer (e.g. invalid JSON) out of the cache.
+        `stream(chunk)` receives the text as it is generated; the chunks add up to the return value.
+        """
+        key = cache_key(model_name_of(model), generation_config, prompt)
+        try:
+            cached = self.get(call_type, key)
+        except sqlite3.Error as e:
+            print(f"LLM cache read failed: {e}")
+            with self._lock:
+                self._count(call_type, "misses")  # Still a call to the model; keeps report()'s ratio defined
+            cached = None
+        if cached is not None:
+            if stream:
+                stream(cached)
+            return cached
+
+        kwargs = {"generation_config": generation_config} if generation_config is not None else {}
+        start = time.perf_counter()
+        if stream:
+            text = self._stream(model, prompt, call_type, stream, start, **kwargs)
+        else:
+            text = model.generate_content(prompt, **kwargs).text
+        latency = time.perf_counter() - start
+
+        if validate:
+            validate(text)
+        try:
+            self.put(call_type, key, text, latency)
+        except sqlite3.Error as e:
+            print(f"LLM cache write failed: {e}")
+        return text
+
+    def _stream(self, model, prompt, call_type, callback, start, **kwargs):
+        parts, first = [], None
+        for chunk in model.generate_content(prompt, stream=True, **kwargs):
+            try:
+                piece = chunk.text
+            except ValueError:
+                continue  # A chunk with no text part (e.g. only the finish reason)
+            if not piece:
+                continue
+            if first is None:
+                first = time.perf_counter() - start
+            parts.append(piece)
+            callback(piece)
+        total = time.perf_counter() - start
+        first = total if first is None else first
+        with self._lock:
+            self._count(call_type, "streamed")
+            self._count(call_type, "ttft_s", first)
+            self._count(call_type, "stream_s", total)
+        print(f"LLM stream [{call_type}]: first token {first:.2f}s, total {total:.2f}s ({len(parts)} chunks)")
+        return "".join(parts)
+
+    def report(self, reset=True):
+        """One line per call site: hit ratio and the Gemini time it saved."""
+        with self._lock:
+            stats, lines = self.stats, []
+            if reset:
+                self.stats = {}
+        for call_type, s in sorted(stats.items()):
+            total = s["hits"] + s["misses"]
+            line = f"LLM cache [{call_type}]: {s['hits']}/{total} hits ({s['hits'] / total * 100:.0f}%), saved {s['saved_s']:.1f}s"
+            if s.get("streamed"):
+                line += f", streamed: first token {s['ttft_s'] / s['streamed']:.2f}s / total {s['stream_s'] / s['streamed']:.2f}s avg"
+            lines.append(line)
+        return "\n".join(lines) if lines else "LLM cache: no calls"
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide cache shared by news_agent and trading."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = LLMCache()
+        return _shared
@@ -0,0 +1,350 @@
+"""
+One Gemini client shared by news_agent, trading and reader_agent.
+
+It answers generate_content() like a google-generativeai model, so llm_cache
+(streaming included) and the trading prompts use it unchanged, and adds:
+  - a model list (config.GEMINI_MODELS), probed lazily with one list_models call
+    on the first request instead of a throwaway "Ping" generation at start-up.
+    Models the API doesn't serve (or answers 404 for) are dropped; the next one is used.
+  - exponential backoff on 429 / 5xx / timeouts (rate_limit.call_with_retry), under
+    the token bucket every Gemini caller in the process shares.
+  - a circuit breaker per model: after BREAKER_FAILURES failed requests in a row the
+    model is skipped for BREAKER_COOLDOWN seconds, then a single trial call decides.
+    With every circuit open, requests fail at once (LLMUnavailable) instead of
+    waiting out the backoff.
+  - optional hedged requests (GEMINI_HEDGE_AFTER): if the answer takes longer than
+    that many seconds ("auto": the primary model's p95), the same request goes to
+    the next model as well and the first answer wins. Streams are not hedged.
+  - a latency histogram per model (report()).
+"""
+import bisect
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import google.generativeai as genai
+
+from config import GEMINI_MODELS
+from rate_limit import TokenBucket, call_with_retry, is_transient, status_of
+
+GEMINI_RPS = float(os.environ.get("GEMINI_RPS", "2"))
+GEMINI_HEDGE_AFTER = os.environ.get("GEMINI_HEDGE_AFTER")  # Seconds, "auto" or unset (no hedging)
+RETRIES = 4
+BREAKER_FAILURES = 5
+BREAKER_COOLDOWN = 60.0
+HEDGE_MIN_SAMPLES = 20  # "auto" hedging starts once the primary model has this many latencies
+HEDGE_WORKERS = 16
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)  # Upper bounds in seconds; slower calls go in a last bucket
+
+# Requests/second for every Gemini call in the process (news sections and trading batches alike)
+gemini_limiter = TokenBucket(GEMINI_RPS)
+
+
+class LLMUnavailable(Exception):
+    """No configured model can take the request (all missing or circuits open)."""
+
+
+class LatencyHistogram:
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+            self.total += 1
+            self.sum += seconds
+
+    def error(self):
+        with self._lock:
+            self.errors += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (inf past the last one); None without data."""
+        with self._lock:
+            if not self.total:
+                return None
+            seen = 0
+            for i, count in enumerate(self.counts):
+                seen += count
+                if seen >= q * self.total:
+                    return self.bounds[i] if i < len(self.bounds) else float("inf")
+
+    def buckets(self):
+        """[(upper bound in seconds, count)], the last bound being inf."""
+        with self._lock:
+            return list(zip(self.bounds + (float("inf"),), self.counts))
+
+    def summary(self):
+        def bound(q):
+            value = self.quantile(q)
+            return f">{self.bounds[-1]}s" if value == float("inf") else f"≤{value}s"
+        avg = self.sum / self.total if self.total else 0.0
+        return (f"{self.total} ok, {self.errors} failed, avg {avg:.2f}s, "
+                f"p50 {bound(0.5)}, p95 {bound(0.95)}, p99 {bound(0.99)}")
+
+
+class CircuitBreaker:
+    """Closed -> open after `failures` failed requests in a row -> half-open (one trial call) after `cooldown`."""
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.consecutive = 0
+        self.opened_at = None
+        self.trial = False
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        with self._lock:
+            return self.opened_at is not None and (self.trial or time.monotonic() - self.opened_at < self.cooldown)
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.trial or time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive = 0
+            self.opened_at = None
+            self.trial = False
+
+    def record_failure(self):
+        """Returns True when this failure opens the circuit."""
+        with self._lock:
+            self.consecutive += 1
+            opens = self.trial or (self.opened_at is None and self.consecutive >= self.failures)
+            if opens:
+                self.opened_at = time.monotonic()
+            self.trial = False
+            return opens
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "open" if self.is_open() else "half-open"
+
+
+def open_stream(model, prompt, **kwargs):
+    """Starts a streamed response and waits for its first chunk, so errors before any output can be retried."""
+    chunks = iter(model.generate_content(prompt, stream=True, **kwargs))
+    return next(chunks, None), chunks
+
+
+class LLMClient:
+    def __init__(self, models=GEMINI_MODELS, limiter=None, retries=RETRIES, base_delay=1.0, hedge_after=None,
+                 factory=None, list_models=None, breaker_failures=BREAKER_FAILURES, breaker_cooldown=BREAKER_COOLDOWN):
+        """
+        `factory(name)` builds a model (genai.GenerativeModel by default); `list_models()` is called
+        once, on the first request, to drop models the API doesn't serve (None: no probe).
+        `hedge_after` is seconds, "auto" or None.
+        """
+        self.names = list(models)
+        self.limiter = limiter
+        self.retries = retries
+        self.base_delay = base_delay
+        self.hedge_after = hedge_after
+        self.factory = factory or genai.GenerativeModel
+        self.list_models = list_models
+        self.models = {}
+        self.breakers = {name: CircuitBreaker(breaker_failures, breaker_cooldown) for name in self.names}
+        self.histograms = {name: LatencyHistogram() for name in self.names}
+        self.hedges = {"sent": 0, "won": 0}
+        self._probed = list_models is None
+        self._lock = threading.Lock()
+        self._pool = None
+
+    @property
+    def model_name(self):
+        """The model requests go to first (llm_cache keys on it): the first one with a closed circuit."""
+        for name in self.names:
+            if not self.breakers[name].is_open():
+                return name
+        return self.names[0] if self.names else "none"
+
+    # --- Model list ---
+
+    def _probe(self):
+        with self._lock:
+            if self._probed:
+                return
+            self._probed = True
+            try:
+                served = {m.name.split("/")[-1] for m in self.list_models()
+                          if "generateContent" in getattr(m, "supported_generation_methods", ["generateContent"])}
+            except Exception as e:
+                print(f"   ⚠️ Could not list Gemini models ({e.__class__.__name__}); using {', '.join(self.names)} as configured")
+                return
+            available = [name for name in self.names if name in served]
+            if not available:
+                print(f"   ⚠️ None of {', '.join(self.names)} is listed by the API; trying them anyway")
+                return
+            if len(available) < len(self.names):
+                print(f"   🔌 Gemini models not served, skipped: {', '.join(n for n in self.names if n not in served)}")
+            self.names = available
+
+    def _drop(self, name, error):
+        with self._lock:
+            if name in self.names:
+                self.names.remove(name)
+                print(f"   🔌 Gemini model '{name}' not available ({status_of(error)}), dropped")
+
+    def _model(self, name):
+        with self._lock:
+            if name not in self.models:
+                self.models[name] = self.factory(name)
+            return self.models[name]
+
+    def _order(self, start_at=0):
+        names = list(self.names)
+        if not names:
+            return names
+        start_at %= len(names)
+        return names[start_at:] + names[:start_at]
+
+    def _failed(self, name, error):
+        """Bookkeeping for a failed request; returns True if the next model should be tried."""
+        if status_of(error) == 404:
+            self._drop(name, error)
+            return True
+        if not is_transient(error):
+            self.breakers[name].record_success()  # The model answered; the request itself was bad
+            return False
+        self.histograms[name].error()
+        if self.breakers[name].record_failure():
+            print(f"   🚨 Circuit open for '{name}' for {self.breakers[name].cooldown:g}s after repeated errors")
+        return True
+
+    # --- Requests ---
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self._probe()
+        if stream:
+            return self._stream(prompt, kwargs)
+        delay = self._hedge_delay()
+        if delay is None:
+            return self._generate(prompt, kwargs)
+        return self._hedged(prompt, kwargs, delay)
+
+    def _generate(self, prompt, kwargs, start_at=0):
+        last_error = None
+        for name in self._order(start_at):
+            if not self.breakers[name].allow():
+                continue
+            start = time.perf_counter()
+            try:
+                response = call_with_retry(self._model(name).generate_content, prompt, limiter=self.limiter,
+                                           retries=self.retries, base_delay=self.base_delay, retry_on=is_transient, **kwargs)
+            except Exception as e:
+                if not self._failed(name, e):
+                    raise
+                last_error = e
+                continue
+            self.histograms[name].observe(time.perf_counter() - start)
+            self.breakers[name].record_success()
+            return response
+        raise last_error or LLMUnavailable(f"No Gemini model available ({', '.join(self.names) or 'none left'})")
+
+    def _stream(self, prompt, kwargs):
+        """Yields chunks from the first model that starts answering; an error after the first chunk is raised."""
+        last_error = None
+        for name in self._order():
+            if not self.breakers[name].allow():
+                continue
+            start = time.perf_counter()
+            try:
+                first, chunks = call_with_retry(open_stream, self._model(name), prompt, limiter=self.limiter,
+                                                retries=self.retries, base_delay=self.base_delay, retry_on=is_transient, **kwargs)
+            except Exception as e:
+                if not self._failed(name, e):
+                    raise
+                last_error = e
+                continue
+            try:
+                if first is not None:
+                    yield first
+                for chunk in chunks:
+                    yield chunk
+            except Exception as e:
+                self._failed(name, e)
+                raise
+            self.histograms[name].observe(time.perf_counter() - start)
+            self.breakers[name].record_success()
+            return
+        raise last_error or LLMUnavailable(f"No Gemini model available ({', '.join(self.names) or 'none left'})")
+
+    # --- Hedging ---
+
+    def _hedge_delay(self):
+        if self.hedge_after == "auto":
+            histogram = self.histograms.get(self.model_name)
+            if histogram is None or histogram.total < HEDGE_MIN_SAMPLES:
+                return None
+            p95 = histogram.quantile(0.95)
+            return None if p95 == float("inf") else p95
+        return self.hedge_after
+
+    def _hedged(self, prompt, kwargs, delay):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="llm-hedge")
+        first = self._pool.submit(self._generate, prompt, kwargs)
+        if wait([first], timeout=delay).done:
+            return first.result()
+        # Slow answer: the same request to the next model (or again, with only one); the first answer wins
+        second = self._pool.submit(self._generate, prompt, kwargs, 1)
+        with self._lock:
+            self.hedges["sent"] += 1
+        pending, error = {first, second}, None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        with self._lock:
+                            self.hedges["won"] += 1
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def report(self):
+        """One line per model used: latency histogram summary and circuit state, plus hedging counts."""
+        lines = [f"LLM [{name}]: {h.summary()}, circuit {self.breakers[name].state}"
+                 for name, h in self.histograms.items() if h.total or h.errors]
+        if self.hedges["sent"]:
+            lines.append(f"LLM hedged requests: {self.hedges['sent']} sent, {self.hedges['won']} answered first")
+        return "\n".join(lines) if lines else "LLM: no calls"
+
+
+def parse_hedge_after(value):
+    if not value:
+        return None
+    return "auto" if value.strip().lower() == "auto" else float(value)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide client shared by news_agent, trading and reader_agent; None without GEMINI_API_KEY."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            api_key = os.environ.get("GEMINI_API_KEY")
+            if not api_key:
+                return None
+            genai.configure(api_key=api_key)
+            _shared = LLMClient(limiter=gemini_limiter, hedge_after=parse_hedge_after(GEMINI_HEDGE_AFTER),
+                                list_models=genai.list_models)
+        return _shared
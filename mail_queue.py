@@ -0,0 +1,258 @@
+"""
+Background delivery queue for report emails.
+
+SMTPConnection keeps one authenticated SMTP session open between sends. A session
+that has been idle is checked with NOOP first, and a dropped one is reopened.
+
+MailQueue writes every message to a spool directory before queueing it, so a report
+survives an SMTP outage or a restart. A worker thread sends spooled messages in order
+and retries failures with exponential backoff. Messages that keep failing are moved
+to <spool>/failed/ (move them back to the spool directory to resend).
+"""
+import json
+import os
+import random
+import smtplib
+import threading
+import time
+import uuid
+from collections import deque
+
+from config import CACHE_DIR
+
+KEEPALIVE_SECONDS = 60  # NOOP before reusing a session idle for longer than this
+MAX_ATTEMPTS = 6
+BASE_DELAY = 5.0        # Seconds before the first retry, doubled each time
+MAX_DELAY = 600.0
+
+
+class SMTPConnection:
+    def __init__(self, host, port, starttls=True, user=None, password=None, timeout=30):
+        self.host = host
+        self.port = port
+        self.starttls = starttls
+        self.user = user
+        self.password = password
+        self.timeout = timeout
+        self.connects = 0
+        self._smtp = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            smtp.ehlo()
+            if self.password and smtp.has_extn("auth"):
+                smtp.login(self.user, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self._smtp = smtp
+        self._last_used = time.monotonic()
+        self.connects += 1
+
+    def _alive(self):
+        if self._smtp is None:
+            return False
+        if time.monotonic() - self._last_used < KEEPALIVE_SECONDS:
+            return True
+        try:
+            return self._smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def sendmail(self, sender, recipients, message):
+        """Sends over the open session, reconnecting once if the server dropped it."""
+        with self._lock:
+            for attempt in (1, 2):
+                if not self._alive():
+                    self._close()
+                    self._open()
+                try:
+                    self._smtp.sendmail(sender, recipients, message)
+                    self._last_used = time.monotonic()
+                    return
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    self._close()
+                    if attempt == 2:
+                        raise
+
+    def _close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                self._smtp.close()
+            self._smtp = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+def is_permanent(exc):
+    """5xx answers (bad recipient, auth rejected) won't succeed on retry."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(exc, smtplib.SMTPResponseException) and exc.smtp_code >= 500
+
+
+class MailQueue:
+    def __init__(self, connection, spool_dir=None, max_attempts=MAX_ATTEMPTS, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+        self.connection = connection
+        self.spool_dir = spool_dir or os.path.join(CACHE_DIR, "mail_spool")
+        self.failed_dir = os.path.join(self.spool_dir, "failed")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.latencies = deque(maxlen=200)  # Seconds per successful send
+        self._jobs = []  # Spooled jobs waiting to be sent, oldest first
+        self._busy = False
+        self._stopping = False
+        self._cond = threading.Condition()
+        os.makedirs(self.failed_dir, exist_ok=True)
+        self._recover()
+        self._worker = threading.Thread(target=self._run, name="mail-queue", daemon=True)
+        self._worker.start()
+
+    # --- Spool ---
+    def _path(self, job, directory=None):
+        return os.path.join(directory or self.spool_dir, f"{job['id']}.json")
+
+    def _write(self, job):
+        path = self._path(job)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+
+    def _recover(self):
+        """Requeues whatever a previous process left in the spool."""
+        for filename in sorted(os.listdir(self.spool_dir)):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.spool_dir, filename), "r", encoding="utf-8") as f:
+                    job = json.load(f)
+            except Exception as e:
+                print(f"Skipping unreadable spooled mail {filename}: {e}")
+                continue
+            job["next_try"] = 0
+            self._jobs.append(job)
+        if self._jobs:
+            print(f"📬 Mail queue: recovered {len(self._jobs)} spooled message(s)")
+
+    # --- API ---
+    def enqueue(self, sender, recipients, message, subject=""):
+        """Spools the message and returns immediately; the worker sends it."""
+        job = {
+            "id": f"{time.time_ns()}-{uuid.uuid4().hex[:8]}",
+            "sender": sender, "recipients": list(recipients), "subject": subject,
+            "message": message, "attempts": 0, "next_try": 0, "enqueued": time.time(),
+        }
+        self._write(job)
+        with self._cond:
+            self._jobs.append(job)
+            self._cond.notify_all()
+        return job["id"]
+
+    def flush(self, timeout=None):
+        """Waits until everything queued has been sent or given up on. Returns True if drained."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._jobs or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=30):
+        """Tries to drain the queue, then stops the worker. Unsent mail stays spooled for next start."""
+        drained = self.flush(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._worker.join(timeout=5)
+        self.connection.close()
+        return drained
+
+    def metrics(self):
+        with self._cond:
+            depth = len(self._jobs) + (1 if self._busy else 0)
+            oldest = min((job["enqueued"] for job in self._jobs), default=None)
+        last = self.latencies[-1] if self.latencies else 0.0
+        latencies = sorted(self.latencies)
+        return {
+            "queue_depth": depth,
+            "oldest_queued_s": round(time.time() - oldest, 1) if oldest else 0.0,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "smtp_connects": self.connection.connects,
+            "send_latency_last_s": round(last, 3),
+            "send_latency_avg_s": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "send_latency_p95_s": round(latencies[int(0.95 * (len(latencies) - 1))], 3) if latencies else 0.0,
+        }
+
+    # --- Worker ---
+    def _next_job(self):
+        """Blocks until a job is due. Returns None when the queue is stopping."""
+        with self._cond:
+            while not self._stopping:
+                now = time.time()
+                for job in self._jobs:
+                    if job["next_try"] <= now:
+                        self._jobs.remove(job)
+                        self._busy = True
+                        return job
+                next_try = min((job["next_try"] for job in self._jobs), default=None)
+                self._cond.wait(None if next_try is None else next_try - now)
+            return None
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                self._attempt(job)
+            except Exception as e:
+                # Never let the worker die; the job is still spooled for the next start
+                print(f"Mail queue error: {e}")
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _attempt(self, job):
+        started = time.monotonic()
+        try:
+            self.connection.sendmail(job["sender"], job["recipients"], job["message"])
+        except Exception as e:
+            job["attempts"] += 1
+            if job["attempts"] >= self.max_attempts or is_permanent(e):
+                os.replace(self._path(job), self._path(job, self.failed_dir))
+                self.failed += 1
+                print(f"❌ Email '{job['subject']}' failed after {job['attempts']} attempt(s): {e}")
+                return
+            delay = min(self.max_delay, self.base_delay * (2 ** (job["attempts"] - 1))) * random.uniform(0.8, 1.2)
+            job["next_try"] = time.time() + delay
+            self._write(job)
+            self.retries += 1
+            print(f"⏳ Email '{job['subject']}' not sent ({e}), retry {job['attempts']}/{self.max_attempts - 1} in {delay:.1f}s")
+            with self._cond:
+                self._jobs.append(job)
+            return
+
+        latency = time.monotonic() - started
+        self.latencies.append(latency)
+        self.sent += 1
+        os.remove(self._path(job))
+        print(f"Email '{job['subject']}' sent to {', '.join(job['recipients'])} ({latency:.2f}s)")
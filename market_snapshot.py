@@ -0,0 +1,97 @@
+"""
+One Alpaca snapshot of the market universe, as NumPy arrays.
+
+The report header (market status) and the trading simulation read the same
+MarketSnapshot: prices and previous closes are pulled out of the snapshot once,
+and change %, up/down counts, breadth and per-sector aggregates are vector ops.
+"""
+import time
+
+import numpy as np
+
+from config import MARKET_UNIVERSE, SECTORS
+
+OTHER_SECTOR = "Other"
+SECTOR_OF = {symbol: sector for sector, symbols in SECTORS.items() for symbol in symbols}
+
+
+def status_label(avg_change):
+    if avg_change >= 0.5:
+        return "Bullish 🟢"
+    if avg_change <= -0.5:
+        return "Bearish 🔴"
+    return "Mixed 🟡"
+
+
+class MarketSnapshot:
+    def __init__(self, snap, symbols=MARKET_UNIVERSE):
+        self.raw = snap  # {symbol: alpaca Snapshot}, e.g. for the price store
+        self.fetched_at = time.monotonic()
+        self.symbols = list(symbols)
+        n = len(self.symbols)
+
+        self.price = np.full(n, np.nan)
+        self.prev_close = np.full(n, np.nan)
+        for i, symbol in enumerate(self.symbols):
+            data = snap.get(symbol)
+            if not data:
+                continue
+            if data.latest_trade:
+                self.price[i] = data.latest_trade.price
+            if data.previous_daily_bar:
+                self.prev_close[i] = data.previous_daily_bar.close
+
+        has_price = ~np.isnan(self.price)
+        self.valid = has_price & (np.nan_to_num(self.prev_close) != 0)
+        self.change_pct = np.full(n, np.nan)
+        np.divide(self.price - self.prev_close, self.prev_close, out=self.change_pct, where=self.valid)
+        self.change_pct *= 100
+
+        self.sector_names = list(SECTORS)
+        if any(symbol not in SECTOR_OF for symbol in self.symbols):
+            self.sector_names.append(OTHER_SECTOR)
+        position = {name: i for i, name in enumerate(self.sector_names)}
+        self.sector_idx = np.array([position[SECTOR_OF.get(s, OTHER_SECTOR)] for s in self.symbols], dtype=int)
+
+    def age(self):
+        return time.monotonic() - self.fetched_at
+
+    def latest_prices(self):
+        """{symbol: last trade price} for every symbol that traded."""
+        return {s: float(p) for s, p in zip(self.symbols, self.price) if not np.isnan(p)}
+
+    def quotes(self):
+        """[(symbol, price, change_pct)] in universe order, for symbols with a previous close."""
+        idx = np.flatnonzero(self.valid)
+        return [(self.symbols[i], float(self.price[i]), float(self.change_pct[i])) for i in idx]
+
+    def sector_stats(self):
+        """Per sector (config order): avg change %, up/down counts. Sectors without quotes are left out."""
+        idx = self.sector_idx[self.valid]
+        changes = self.change_pct[self.valid]
+        k = len(self.sector_names)
+        counts = np.bincount(idx, minlength=k)
+        sums = np.bincount(idx, weights=changes, minlength=k)
+        ups = np.bincount(idx, weights=(changes >= 0), minlength=k).astype(int)
+        return [
+            {"sector": name, "avg_change": float(sums[i] / counts[i]), "up_count": int(ups[i]),
+             "down_count": int(counts[i] - ups[i]), "count": int(counts[i])}
+            for i, name in enumerate(self.sector_names) if counts[i]
+        ]
+
+    def market_status(self):
+        """Overall status, up/down counts, average change, breadth and sectors. None without quotes."""
+        changes = self.change_pct[self.valid]
+        if not len(changes):
+            return None
+        up = int((changes >= 0).sum())
+        down = len(changes) - up
+        avg_change = float(changes.mean())
+        return {
+            "status": status_label(avg_change),
+            "up_count": up,
+            "down_count": down,
+            "avg_change": avg_change,
+            "breadth": (up - down) / len(changes),  # -1 (all down) .. +1 (all up)
+            "sectors": self.sector_stats(),
+        }
@@ -10,14 +10,26 @@ import nltk
 # --- NBA Score Collector ---
 import requests
 from datetime import datetime, timedelta
-import google.generativeai as genai
 import os
+import threading
 import yfinance as yf
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from google.cloud import storage
+import numpy as np
+import pandas as pd
+import price_store
+import charts
+import blob_store
 import json
+import calendar
 from io import BytesIO
+from feed_fetcher import FeedFetcher
+from feed_cache import FeedCache
+from dedup import DedupIndex
+from clustering import collapse_near_duplicates
+from news_context import NewsContext, as_context, estimate_tokens
+from ticker_index import get_matcher
+from ledger import history_lines
+import llm_cache
+import llm_client
 
 # --- Trading Simulation ---
 import trading
@@ -27,41 +39,81 @@ from config import (
 )
 
 # --- Stock Portfolio Tracker ---
+HISTORY_DAYS = 7 # Rows shown in the per-ticker chart
+DOWNLOAD_LOOKBACK_DAYS = 14 # Calendar days: 7 sessions + the previous close, across weekends/holidays
+PRICE_SOURCE = "yfinance-adjusted"  # price_store.get_store() key: yfinance auto_adjust=True bars only
+
+def price_summary(closes):
+    """
+    closes: DataFrame of daily closes (dates x tickers, NaN where a ticker has no bar).
+    Returns a DataFrame indexed by ticker with current_price, change and pct_change,
+    computed for all tickers at once from each column's last two valid closes.
+    """
+    values = closes.to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    # Number of valid closes at or after each row: 1 marks the last close, 2 the one before it
+    from_end = np.cumsum(valid[::-1], axis=0)[::-1]
+    count = valid.sum(axis=0)
+    current = np.where(valid & (from_end == 1), values, 0.0).sum(axis=0)
+    prev = np.where(valid & (from_end == 2), values, 0.0).sum(axis=0)
+    has_prev = count > 1
+    change = np.where(has_prev, current - prev, 0.0)
+    pct_change = np.divide(change * 100, prev, out=np.zeros_like(change), where=has_prev & (prev != 0))
+    summary = pd.DataFrame({'current_price': current, 'change': change, 'pct_change': pct_change}, index=closes.columns)
+    return summary[count > 0]
+
+def yfinance_bars(symbols, start):
+    """Daily OHLCV bars since `start` for all symbols in one yf.download request -> {symbol: bars}."""
+    frame = yf.download(symbols, start=start.strftime('%Y-%m-%d'), interval="1d", auto_adjust=True,
+                        group_by="column", threads=True, progress=False)
+    bars = {}
+    for symbol in symbols:
+        if isinstance(frame.columns, pd.MultiIndex):
+            if symbol not in frame.columns.get_level_values(1):
+                continue
+            rows = frame.xs(symbol, axis=1, level=1)
+        else: # Single ticker without a ticker level
+            rows = frame
+        rows = rows.dropna(subset=["Close"])
+        bars[symbol] = price_store.make_bars(rows.index, rows["Open"], rows["High"], rows["Low"], rows["Close"], rows["Volume"])
+    return bars
+
 class StockCollector:
     def __init__(self):
         self.tickers = list(MY_HOLDINGS.keys())
 
+    def download_closes(self):
+        """
+        Daily closes for all holdings (dates x tickers). Only bars newer than what the local
+        price store holds are downloaded, in one multi-symbol request.
+        """
+        store = price_store.get_store(PRICE_SOURCE)
+        try:
+            store.update(self.tickers, yfinance_bars, DOWNLOAD_LOOKBACK_DAYS)
+        except Exception as e:
+            print(f"Error updating stock prices, using stored data: {e}")
+        return store.close_frame(self.tickers, start=datetime.now() - timedelta(days=DOWNLOAD_LOOKBACK_DAYS))
+
     def get_stock_data(self):
         data = {}
+        try:
+            closes = self.download_closes()
+        except Exception as e:
+            print(f"Error fetching stock data: {e}")
+            return data
+
+        summary = price_summary(closes)
         for ticker in self.tickers:
-            try:
-                # Fetch 7 days of history for the graph + today's live price
-                stock = yf.Ticker(ticker)
-                hist = stock.history(period="1mo") # Get 1 month to be safe for 7 days
-                if hist.empty:
-                    continue
-                
-                # Get last 7 days
-                last_7_days = hist.tail(7)
-                current_price = hist['Close'].iloc[-1]
-                
-                # Calculate change (from previous close)
-                if len(hist) > 1:
-                    prev_close = hist['Close'].iloc[-2]
-                    change = current_price - prev_close
-                    pct_change = (change / prev_close) * 100
-                else:
-                    change = 0
-                    pct_change = 0
-
-                data[ticker] = {
-                    'current_price': current_price,
-                    'change': change,
-                    'pct_change': pct_change,
-                    'history': last_7_days['Close']
-                }
-            except Exception as e:
-                print(f"Error fetching data for {ticker}: {e}")
+            if ticker not in summary.index:
+                print(f"Error fetching data for {ticker}: no price data")
+                continue
+            row = summary.loc[ticker]
+            data[ticker] = {
+                'current_price': float(row['current_price']),
+                'change': float(row['change']),
+                'pct_change': float(row['pct_change']),
+                'history': closes[ticker].dropna().tail(HISTORY_DAYS)
+            }
         return data
 
 class PortfolioManager:
@@ -69,7 +121,6 @@ class PortfolioManager:
         # Constants for holdings
         self.holdings = MY_HOLDINGS
         self.bucket_name = os.environ.get("BUCKET_NAME")
-        self.bucket_name = os.environ.get("BUCKET_NAME")
         self.history_file = "portfolio_history.json"
         self.ai_state_file = "portfolio_ai_state.json"
 
@@ -80,18 +131,17 @@ class PortfolioManager:
                 total += stock_data[ticker]['current_price'] * shares
         return total
 
+    def _store(self):
+        # Shared pooled client + per-report blob cache (see blob_store.py)
+        return blob_store.get_store(self.bucket_name)
+
     def get_real_history(self):
         """Fetches history for the User's Real Stock Portfolio"""
         if not self.bucket_name:
             return []
         try:
-            storage_client = storage.Client()
-            bucket = storage_client.bucket(self.bucket_name)
-            blob = bucket.blob(self.history_file)
-            if blob.exists():
-                content = blob.download_as_text()
-                return json.loads(content)
-            return []
+            content = self._store().read_text(self.history_file)
+            return json.loads(content) if content else []
         except Exception as e:
             print(f"Error loading real portfolio history: {e}")
             return []
@@ -101,11 +151,8 @@ class PortfolioManager:
         if not self.bucket_name:
             return []
         try:
-            storage_client = storage.Client()
-            bucket = storage_client.bucket(self.bucket_name)
-            blob = bucket.blob(self.ai_state_file)
-            if blob.exists():
-                content = blob.download_as_text()
+            content = self._store().read_text(self.ai_state_file)
+            if content:
                 state = json.loads(content)
                 return state.get("equity_history", [])
             return []
@@ -120,14 +167,9 @@ class PortfolioManager:
             return []
 
         try:
-            storage_client = storage.Client()
-            bucket = storage_client.bucket(self.bucket_name)
-            blob = bucket.blob(self.history_file)
-
-            history = []
-            if blob.exists():
-                content = blob.download_as_text()
-                history = json.loads(content)
+            store = self._store()
+            content = store.read_text(self.history_file)
+            history = json.loads(content) if content else []
 
             # Append today's data
             today = datetime.now().strftime('%Y-%m-%d')
@@ -142,32 +184,30 @@ class PortfolioManager:
             if not updated:
                 history.append({'date': today, 'total': total_capital})
 
-            # Save back to GCS
-            blob.upload_from_string(json.dumps(history))
+            # Save back to GCS (fails instead of overwriting a concurrent update)
+            store.write_text(self.history_file, json.dumps(history), if_generation_match=store.generation(self.history_file))
             return history
         except Exception as e:
             print(f"Error updating portfolio history: {e}")
             return []
 
 class GraphGenerator:
-    def __init__(self):
-        # Use Agg backend for non-interactive plotting
-        plt.switch_backend('Agg')
+    """Report charts, drawn from reusable figure templates (see charts.py)."""
+
+    def stock_chart_job(self, ticker, history_series):
+        index = history_series.index
+        if getattr(index, "tz", None) is not None:
+            index = index.tz_localize(None) # Plot exchange-local dates, as pyplot did with the pandas index
+        return (charts.STOCK, f"{ticker} - Last 7 Days", list(index.to_pydatetime()), [float(v) for v in history_series.values])
 
     def generate_stock_chart(self, ticker, history_series):
-        plt.figure(figsize=(6, 3))
-        plt.plot(history_series.index, history_series.values, marker='o', linestyle='-')
-        plt.title(f"{ticker} - Last 7 Days")
-        plt.grid(True, linestyle='--', alpha=0.7)
-        plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%m-%d'))
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        buf = BytesIO()
-        plt.savefig(buf, format='png')
-        buf.seek(0)
-        plt.close()
-        return buf
+        return BytesIO(charts.render(*self.stock_chart_job(ticker, history_series)))
+
+    def generate_stock_charts(self, histories):
+        """{ticker: history_series} -> {ticker: png buffer}, rendered as one batch."""
+        tickers = list(histories)
+        pngs = charts.render_batch([self.stock_chart_job(t, histories[t]) for t in tickers])
+        return {ticker: BytesIO(png) for ticker, png in zip(tickers, pngs)}
 
     def generate_portfolio_chart(self, history_data):
         if not history_data:
@@ -175,25 +215,7 @@ class GraphGenerator:
             
         dates = [datetime.strptime(d['date'], '%Y-%m-%d') for d in history_data]
         totals = [d['total'] for d in history_data]
-        
-        plt.figure(figsize=(8, 4))
-        plt.plot(dates, totals, color='green', marker='o', linestyle='-')
-        plt.title("Total Capital Growth")
-        plt.grid(True, linestyle='--', alpha=0.7)
-        
-        # Fix for single data point (Matplotlib default is too wide)
-        if len(dates) == 1:
-            plt.xlim(dates[0] - timedelta(days=2), dates[0] + timedelta(days=2))
-            
-        plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        buf = BytesIO()
-        plt.savefig(buf, format='png')
-        buf.seek(0)
-        plt.close()
-        return buf
+        return BytesIO(charts.render(charts.PORTFOLIO, "Total Capital Growth", dates, totals))
 
 class NBAScoreCollector:
     def get_scores_for_date(self, date_str):
@@ -251,20 +273,25 @@ class NBAScoreCollector:
         # so it can at least analyze the most recent performance.
         return self.get_last_nights_scores()
 
+def emit(text, stream=None):
+    """Returns a message that doesn't come from the LLM, passing it to `stream` too,
+    so a streaming caller always receives the full return value."""
+    if stream:
+        stream(text)
+    return text
+
 class LLMSummarizer:
     def __init__(self):
-        api_key = os.environ.get("GEMINI_API_KEY")
-        if not api_key:
+        # Shared with trading: GEMINI_MODELS in order, with retries, fallback and a circuit breaker
+        self.model = llm_client.get_client()
+        if not self.model:
             print("Warning: GEMINI_API_KEY not set.")
-            self.model = None
-        else:
-            genai.configure(api_key=api_key)
-            # Using gemini-2.5-flash as it is faster and currently supported
-            self.model = genai.GenerativeModel('gemini-2.5-flash')
 
-    def summarize_world_news(self, articles):
+    def summarize_world_news(self, articles, stream=None):
         if not self.model:
-            return "Gemini API Key missing. Cannot generate summary."
+            return emit("Gemini API Key missing. Cannot generate summary.", stream)
+        if not articles:
+            return emit("No new headlines since the last report.", stream)
         
         prompt = """
         Summarize the following world news headlines and snippets into a single, cohesive paragraph.
@@ -277,14 +304,13 @@ class LLMSummarizer:
             prompt += f"- {art['title']}: {art['summary']}\n"
             
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            return llm_cache.get_cache().generate(self.model, prompt, "world_summary", stream=stream)
         except Exception as e:
-            return f"Error generating summary: {e}"
+            return emit(f"Error generating summary: {e}", stream)
 
-    def analyze_nba_trends(self, scores):
+    def analyze_nba_trends(self, scores, stream=None):
         if not self.model:
-            return "Gemini API Key missing. Cannot analyze trends."
+            return emit("Gemini API Key missing. Cannot analyze trends.", stream)
             
         prompt = """
         Analyze the following NBA scores. Identify the top 3-4 teams that performed well.
@@ -297,20 +323,19 @@ class LLMSummarizer:
         Scores:
         """
         if not scores:
-            return "No recent scores available to analyze."
+            return emit("No recent scores available to analyze.", stream)
             
         for game in scores:
             prompt += f"{game['matchup']}: {game['score']} ({game['status']})\n"
             
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            return llm_cache.get_cache().generate(self.model, prompt, "nba_trends", stream=stream)
         except Exception as e:
-            return f"Error analyzing trends: {e}"
+            return emit(f"Error analyzing trends: {e}", stream)
 
-    def curate_croatian_news(self, articles):
+    def curate_croatian_news(self, articles, stream=None):
         if not self.model:
-            return "Gemini API Key missing. Cannot curate news."
+            return emit("Gemini API Key missing. Cannot curate news.", stream)
             
         prompt = """
         You are a news editor. From the following list of Croatian news articles, select the 20 most important and relevant ones.
@@ -323,17 +348,19 @@ class LLMSummarizer:
         
         Keep the language in Croatian.
         Do NOT use Markdown. Use HTML only.
+        A tag like [3 sources] means the same story was carried by that many portals.
         
         Articles:
         """
-        for art in articles:
-            prompt += f"- {art['title']} ({art['link']}): {art['summary'][:200]}\n"
+        # Syndicated copies of the same story are sent once, with a source count
+        for art in collapse_near_duplicates(articles):
+            sources = f" [{art['sources']} sources]" if art['sources'] > 1 else ""
+            prompt += f"- {art['title']} ({art['link']}){sources}: {art['summary'][:200]}\n"
             
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            return llm_cache.get_cache().generate(self.model, prompt, "croatian_news", stream=stream)
         except Exception as e:
-            return f"Error curating Croatian news: {e}"
+            return emit(f"Error curating Croatian news: {e}", stream)
 
     def get_next_hajduk_game(self):
         url = "https://hnl.hr/klubovi/hajduk/"
@@ -378,9 +405,9 @@ class LLMSummarizer:
             print(f"Error scraping Hajduk game: {e}")
             return f"<p><i>(Raspored nije dostupan. Greška: {str(e)[:100]}... Provjerite <a href='https://hajduk.hr/utakmice/raspored'>hajduk.hr</a>)</i></p>"
 
-    def curate_dalmatia_news(self, articles):
+    def curate_dalmatia_news(self, articles, stream=None):
         if not self.model:
-            return "Gemini API Key missing. Cannot curate news."
+            return emit("Gemini API Key missing. Cannot curate news.", stream)
             
         prompt = """
         You are a news editor. From the following list of news articles from Dalmatia portals, select the 15 most important and relevant ones.
@@ -393,21 +420,23 @@ class LLMSummarizer:
         
         Keep the language in Croatian.
         Do NOT use Markdown. Use HTML only.
+        A tag like [3 sources] means the same story was carried by that many portals.
         
         Articles:
         """
-        for art in articles:
-            prompt += f"- {art['title']} ({art['link']}): {art['summary'][:200]}\n"
+        # Syndicated copies of the same story are sent once, with a source count
+        for art in collapse_near_duplicates(articles):
+            sources = f" [{art['sources']} sources]" if art['sources'] > 1 else ""
+            prompt += f"- {art['title']} ({art['link']}){sources}: {art['summary'][:200]}\n"
             
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            return llm_cache.get_cache().generate(self.model, prompt, "dalmatia_news", stream=stream)
         except Exception as e:
-            return f"Error curating Dalmatia news: {e}"
+            return emit(f"Error curating Dalmatia news: {e}", stream)
 
-    def curate_tech_news(self, articles):
+    def curate_tech_news(self, articles, stream=None):
         if not self.model:
-            return "Gemini API Key missing. Cannot curate news."
+            return emit("Gemini API Key missing. Cannot curate news.", stream)
             
         prompt = f"""
         You are a tech portfolio manager. From the following list of articles, select the **Top 10** most important stories related to:
@@ -423,16 +452,19 @@ class LLMSummarizer:
         Keep the language in English.
         Do NOT use Markdown. Use HTML only.
         
+        Articles tagged [TICKER] mention that portfolio stock.
+        
         Articles:
         """
-        for art in articles:
-            prompt += f"- {art['title']} ({art['link']}): {art['summary'][:200]}\n"
+        # Ticker-tagged articles first; the untagged ones still carry the general trends
+        for art in sorted(articles, key=lambda a: not a.get('tickers')):
+            tags = f"[{', '.join(art['tickers'])}] " if art.get('tickers') else ""
+            prompt += f"- {tags}{art['title']} ({art['link']}): {art['summary'][:200]}\n"
             
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            return llm_cache.get_cache().generate(self.model, prompt, "tech_news", stream=stream)
         except Exception as e:
-            return f"Error curating Tech news: {e}"
+            return emit(f"Error curating Tech news: {e}", stream)
 
 
     def crawl_url(self, url):
@@ -453,13 +485,14 @@ class LLMSummarizer:
             print(f"Error crawling {url}: {e}")
             return ""
 
-    def analyze_stock_market(self, news_context):
+    def analyze_stock_market(self, news_context, stream=None):
         if not self.model:
-            return "<p><i>(Gemini API Key missing. Cannot analyze stocks.)</i></p>"
+            return emit("<p><i>(Gemini API Key missing. Cannot analyze stocks.)</i></p>", stream)
             
         try:
-            # Use Gemini 2.0 Flash (Experimental)
-            grounding_model = genai.GenerativeModel('gemini-2.0-flash-exp')
+            # World/tech summary plus each ticker's most relevant snippets, within ANALYST_TOKENS
+            news_context = as_context(news_context)
+            context_text, context_tokens = news_context.for_analyst() if news_context else ("", 0)
             
             prompt = f"""
             You are a Senior Financial Analyst. 
@@ -467,7 +500,7 @@ class LLMSummarizer:
             {', '.join(MARKET_UNIVERSE)}
             
             **NEWS CONTEXT:**
-            {news_context[:200000]}  # Limit context (Gemini 2.0 Flash has 1M token window, so this is safe)
+            {context_text}
             
             **OUTPUT FORMAT:**
             Provide a concise **HTML summary** (no Markdown).
@@ -477,14 +510,26 @@ class LLMSummarizer:
             -   End with a brief **Tech World Summary**.
             """
             
-            response = grounding_model.generate_content(prompt)
-            return response.text
+            print(f"Market analysis prompt: ~{estimate_tokens(prompt)} tokens "
+                  f"(context ~{context_tokens} of ~{news_context.source_tokens if news_context else 0} raw)")
+            return llm_cache.get_cache().generate(self.model, prompt, "market_analysis", stream=stream)
             
         except Exception as e:
             print(f"Error analyzing stock market: {e}")
-            return f"<p><i>(Stock analysis unavailable. Error: {str(e)[:100]})</i></p>"
+            return emit(f"<p><i>(Stock analysis unavailable. Error: {str(e)[:100]})</i></p>", stream)
+
+
 
+_feed_fetcher = None
+_feed_fetcher_lock = threading.Lock()
 
+def get_feed_fetcher():
+    """One FeedFetcher per process, created on first use: its conditional-GET cache and parsed feeds outlive one report."""
+    global _feed_fetcher
+    with _feed_fetcher_lock:
+        if _feed_fetcher is None:
+            _feed_fetcher = FeedFetcher(cache=FeedCache())
+        return _feed_fetcher
 
 class NewsCollector:
     def __init__(self):
@@ -493,25 +538,50 @@ class NewsCollector:
         self.croatian_feeds = CROATIAN_NEWS_FEEDS
         self.dalmatia_feeds = DALMATIA_NEWS_FEEDS
         self.tech_feeds = TECH_NEWS_FEEDS
+        self.fetcher = get_feed_fetcher()
+        # Loaded from disk per collector; only generate_and_send_report persists it
+        self.dedup = DedupIndex()
 
-    def collect_feeds(self, feeds):
+    def collect_feeds(self, feeds, limit=5): # Limit to 5 per feed to avoid overload
         print(f"Collecting news from {len(feeds)} feeds...")
+        return self.fetch_articles(feeds, limit)
+
+    def fetch_articles(self, feeds, limit):
+        # Feeds are fetched concurrently, but articles keep the order of `feeds`
+        parsed = self.fetcher.fetch_all(feeds)
         articles = []
         for feed_url in feeds:
+            if feed_url not in parsed:
+                continue
             try:
-                feed = feedparser.parse(feed_url)
-                for entry in feed.entries[:5]: # Limit to 5 per feed to avoid overload
+                for entry in parsed[feed_url].entries[:limit]:
+                    published = entry.get('published_parsed') or entry.get('updated_parsed')
                     articles.append({
                         'title': entry.title,
                         'link': entry.link,
-                        'summary': entry.summary if 'summary' in entry else ''
+                        'summary': entry.summary if 'summary' in entry else '',
+                        'published': calendar.timegm(published) if published else None
                     })
             except Exception as e:
                 print(f"Error collecting from {feed_url}: {e}")
         return articles
 
+    def index_articles(self, articles):
+        """
+        Tags each article with the MARKET_UNIVERSE tickers it mentions (art['tickers']).
+        The run's TickerIndex is built once, by NewsContext over the deduplicated snippets.
+        """
+        matcher = get_matcher()
+        for art in articles:
+            art['tickers'] = list(matcher.counts(f"{art.get('title', '')} {art.get('summary', '')}"))
+        return articles
+
+    def unseen(self, articles):
+        """Drops articles a previous report already carried. Report sections only: GET / and the CLI show the whole feed."""
+        return self.dedup.filter(articles)
+
     def collect_world_news(self):
-        return self.collect_feeds(self.world_feeds)
+        return self.index_articles(self.collect_feeds(self.world_feeds))
 
     def collect_nba_news(self):
         return self.collect_feeds(self.nba_feeds)
@@ -519,45 +589,21 @@ class NewsCollector:
     def collect_croatian_news(self):
         # Collect more articles per feed to give LLM a good pool
         print(f"Collecting Croatian news from {len(self.croatian_feeds)} feeds...")
-        articles = []
-        for feed_url in self.croatian_feeds:
-            try:
-                feed = feedparser.parse(feed_url)
-                for entry in feed.entries[:10]: # Limit to 10 per feed
-                    articles.append({
-                        'title': entry.title,
-                        'link': entry.link,
-                        'summary': entry.summary if 'summary' in entry else ''
-                    })
-            except Exception as e:
-                print(f"Error collecting from {feed_url}: {e}")
-        return articles
+        return self.fetch_articles(self.croatian_feeds, limit=10) # Limit to 10 per feed
 
     def collect_dalmatia_news(self):
         print(f"Collecting Dalmatia news from {len(self.dalmatia_feeds)} feeds...")
-        articles = []
-        for feed_url in self.dalmatia_feeds:
-            try:
-                feed = feedparser.parse(feed_url)
-                for entry in feed.entries[:10]:
-                    articles.append({
-                        'title': entry.title,
-                        'link': entry.link,
-                        'summary': entry.summary if 'summary' in entry else ''
-                    })
-            except Exception as e:
-                print(f"Error collecting from {feed_url}: {e}")
-        return articles
+        return self.fetch_articles(self.dalmatia_feeds, limit=10)
 
     def collect_tech_news(self):
         print(f"Collecting Tech Portfolio news from {len(self.tech_feeds)} feeds...")
-        return self.collect_feeds(self.tech_feeds)
+        return self.index_articles(self.collect_feeds(self.tech_feeds))
 
     def collect_specific_stock_news(self, tickers):
         print(f"Collecting targeted news for {len(tickers)} stocks...")
         stock_feeds = [f"https://finance.yahoo.com/rss/headline?s={ticker}" for ticker in tickers]
         # These are usually high signal, so we rely on collect_feeds default limit
-        return self.collect_feeds(stock_feeds)
+        return self.index_articles(self.collect_feeds(stock_feeds))
 
 class NewsSummarizer:
     def __init__(self):
@@ -584,28 +630,42 @@ class NewsSummarizer:
 # --- Email Service ---
 import smtplib
 import os
+import threading
+from mail_queue import MailQueue, SMTPConnection
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 import pytz
 
+def parse_recipients(value):
+    """'a@x.com, b@y.com' -> ['a@x.com', 'b@y.com']"""
+    return [addr.strip() for addr in value.split(",") if addr.strip()]
+
+def image_bytes(img_data):
+    """Chart images may be bytes or a BytesIO; reading must not consume the buffer."""
+    if isinstance(img_data, (bytes, bytearray)):
+        return bytes(img_data)
+    if hasattr(img_data, "getvalue"):
+        return img_data.getvalue()
+    img_data.seek(0)
+    return img_data.read()
+
 class EmailService:
     def __init__(self):
-        self.smtp_server = "smtp.gmail.com"
-        self.smtp_port = 587
+        self.smtp_server = os.environ.get("SMTP_SERVER", "smtp.gmail.com")
+        self.smtp_port = int(os.environ.get("SMTP_PORT", "587"))
+        self.smtp_starttls = os.environ.get("SMTP_STARTTLS", "1") != "0"
         self.email_user = os.environ.get("EMAIL_USER")
         self.email_password = os.environ.get("EMAIL_PASSWORD")
-        self.recipient = os.environ.get("RECIPIENT_EMAIL", "dario.caric@gmail.com")
-
-    def send_email(self, subject, body, images=None, attachments=None):
-        if not self.email_user or not self.email_password:
-            print("Email credentials not set. Skipping email.")
-            return
+        self.recipients = parse_recipients(os.environ.get("RECIPIENT_EMAIL", "dario.caric@gmail.com"))
 
+    def render(self, body, images=None, attachments=None):
+        """
+        Builds and serializes the MIME message once. Subject and To are added per
+        delivery, so one render can go out under several subjects and recipient lists.
+        """
         msg = MIMEMultipart('related') # Changed to related for embedded images
         msg['From'] = self.email_user
-        msg['To'] = self.recipient
-        msg['Subject'] = subject
 
         msg_alternative = MIMEMultipart('alternative')
         msg.attach(msg_alternative)
@@ -616,13 +676,12 @@ class EmailService:
         if images:
             from email.mime.image import MIMEImage
             for img_id, img_data in images.items():
-                image = MIMEImage(img_data.read())
+                image = MIMEImage(image_bytes(img_data))
                 image.add_header('Content-ID', f'<{img_id}>')
                 msg.attach(image)
         
         # Attach generic files
         if attachments:
-            from email.utils import make_msgid
             from email.mime.application import MIMEApplication
             for filename, content in attachments.items():
                 # content can be bytes or string
@@ -633,300 +692,442 @@ class EmailService:
                 part['Content-Disposition'] = f'attachment; filename="{filename}"'
                 msg.attach(part)
 
+        return msg.as_string()
+
+    def connection(self):
+        return SMTPConnection(self.smtp_server, self.smtp_port, starttls=self.smtp_starttls,
+                              user=self.email_user, password=self.email_password)
+
+    def with_headers(self, rendered, subject, recipients):
+        from email.header import Header
+        from email.utils import formatdate
+        return (
+            f"Subject: {Header(subject, 'utf-8').encode()}\n"
+            f"To: {', '.join(recipients)}\n"
+            f"Date: {formatdate(localtime=True)}\n"
+        ) + rendered
 
+    def deliver(self, rendered, deliveries):
+        """
+        Sends a rendered message for each (subject, recipients) pair right away, over one
+        SMTP connection. Returns the number of deliveries that went out.
+        """
+        sent = 0
+        connection = self.connection()
         try:
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.email_user, self.email_password)
-            text = msg.as_string()
-            server.sendmail(self.email_user, self.recipient, text)
-            server.quit()
-            print(f"Email sent to {self.recipient}")
-        except Exception as e:
-            print(f"Failed to send email: {e}")
+            for subject, recipients in deliveries:
+                try:
+                    connection.sendmail(self.email_user, recipients, self.with_headers(rendered, subject, recipients))
+                    sent += 1
+                    print(f"Email '{subject}' sent to {', '.join(recipients)}")
+                except Exception as e:
+                    print(f"Failed to send email '{subject}': {e}")
+        finally:
+            connection.close()
+        return sent
+
+    def enqueue(self, rendered, deliveries):
+        """Spools each (subject, recipients) pair for the background mail queue. Returns immediately."""
+        queue = get_mail_queue()
+        for subject, recipients in deliveries:
+            queue.enqueue(self.email_user, recipients, self.with_headers(rendered, subject, recipients), subject=subject)
+        print(f"📬 Queued {len(deliveries)} email(s) (queue depth {queue.metrics()['queue_depth']})")
+        return len(deliveries)
+
+    def send_email(self, subject, body, images=None, attachments=None, recipients=None, wait=False):
+        """Renders once and hands the message to the mail queue (or sends it right away with wait=True)."""
+        if not self.email_user or not self.email_password:
+            print("Email credentials not set. Skipping email.")
+            return 0
+
+        rendered = self.render(body, images=images, attachments=attachments)
+        deliveries = [(subject, recipients or self.recipients)]
+        if wait:
+            return self.deliver(rendered, deliveries)
+        return self.enqueue(rendered, deliveries)
+
+_mail_queue = None
+_mail_queue_lock = threading.Lock()
+
+def get_mail_queue():
+    """One mail queue (and SMTP session) per process, started on first use; resends anything left in the spool."""
+    global _mail_queue
+    with _mail_queue_lock:
+        if _mail_queue is None:
+            _mail_queue = MailQueue(EmailService().connection())
+        return _mail_queue
 
 # --- Scheduler ---
 import schedule
 import time
 import threading
+from report_pipeline import Section, run_sections, current_buffer
 
-def generate_and_send_report():
-    print("Generating scheduled report...")
-    collector = NewsCollector()
-    llm_summarizer = LLMSummarizer()
-    score_collector = NBAScoreCollector()
-    
-    # CHECK MARKET HOURS
-    market_open = False
-    try:
-        if trading.trading_client:
-             clock = trading.trading_client.get_clock()
-             market_open = clock.is_open
-             print(f"Market Status: {'OPEN' if market_open else 'CLOSED'}")
-    except Exception as e:
-        print(f"Error checking market hours: {e}")
+REPORT_WORKERS = 8  # Report sections running at once
 
+# --- Report Sections ---
+# Each section returns {"html": ..., "images": {...}, ...extra data for dependents}.
+# Sections write their HTML into current_buffer() as they go (LLM text streams straight in),
+# so a section that times out still shows what it had.
+# build_report wires them into a dependency graph (see report_pipeline.py).
 
-    html_content = ""
-    html_content += f"<p>Generated at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>"
+def unavailable_section(title, **extra):
+    """Placeholder used when a section fails or times out."""
+    return dict({"html": f"<h1>{title}</h1><p><i>({title} unavailable right now.)</i></p>", "images": {}}, **extra)
 
-    # 1. World News (ALWAYS RUN)
+def world_news_section(collector, llm_summarizer):
     print("Fetching World News...")
-    html_content += "<h1>World News</h1>"
-    world_articles = collector.collect_world_news()
-    world_summary = llm_summarizer.summarize_world_news(world_articles)
-    
-    html_content += "<div style='background-color: #f0f8ff; padding: 15px; border-radius: 5px; margin-bottom: 20px;'>"
-    html_content += "<h3>🌍 AI Summary</h3>"
-    html_content += f"<p>{world_summary}</p>"
+    world_articles = collector.unseen(collector.collect_world_news())
+
+    html = current_buffer()
+    html.write("<h1>World News</h1>")
+    html.write("<div style='background-color: #f0f8ff; padding: 15px; border-radius: 5px; margin-bottom: 20px;'>")
+    html.write("<h3>🌍 AI Summary</h3>")
+    html.write("<p>")
+    world_summary = llm_summarizer.summarize_world_news(world_articles, stream=html.write)
+    html.write("</p>")
     
     for article in world_articles:
-        html_content += f"<h4><a href='{article['link']}'>{article['title']}</a></h4>"
-    html_content += "</div>"
+        html.write(f"<h4><a href='{article['link']}'>{article['title']}</a></h4>")
+    html.write("</div>")
+    return {"html": html.getvalue(), "images": {}, "summary": world_summary}
 
+def tech_news_section(collector, llm_summarizer):
+    tech_articles = collector.unseen(collector.collect_tech_news())
+    
+    html = current_buffer()
+    html.write("<h1>Tech Portfolio News</h1>")
+    html.write("<div style='background-color: #f3e5f5; padding: 15px; border-radius: 5px; margin-bottom: 20px;'>")
+    html.write("<h3>📱 Portfolio Highlights</h3>")
+    tech_curated = llm_summarizer.curate_tech_news(tech_articles, stream=html.write)
+    html.write("</div>")
+    return {"html": html.getvalue(), "images": {}, "curated": tech_curated}
+
+def build_news_context(world_summary, tech_curated, specific_stock_articles):
+    """One deduped, ticker-indexed context; the analyst and each trading prompt take token-budgeted views of it."""
+    context = NewsContext(world_summary, tech_curated, specific_stock_articles)
+    print(f"News context: {len(context.snippets)} snippets after dedup (raw context ~{context.source_tokens} tokens)")
+    return context
+
+def sector_rows(sectors):
+    """One line per sector: average change and up/down counts."""
+    if not sectors:
+        return ""
+    rows = "".join(
+        f"<tr><td>{sec['sector']}</td>"
+        f"<td style='color: {'green' if sec['avg_change'] >= 0 else 'red'};'>{sec['avg_change']:+.2f}%</td>"
+        f"<td>🟢 {sec['up_count']} / 🔴 {sec['down_count']}</td></tr>"
+        for sec in sectors
+    )
+    return f"<table style='margin-top: 8px; font-size: 0.85em;' cellpadding='3'>{rows}</table>"
+
+def market_analysis_section(llm_summarizer, full_news_context, market_status):
+    print("Analyzing Market Sentiment...")
+    
+    html = current_buffer()
+    html.write("<hr style='border: 0; border-top: 1px solid #ccc; margin: 15px 0;'>")
+    html.write("<h3>🤖 AI Market Analysis</h3>")
+    
+    # Overall Market Status
+    if market_status:
+        html.write(f"""
+        <div style='background-color: #e8eaed; padding: 10px; border-radius: 5px; margin-bottom: 15px;'>
+            <p style='margin: 0; font-size: 1.1em;'>
+                <b>Overall Market Status:</b> {market_status['status']} 
+                <span style='font-size: 0.9em; color: #555;'>
+                    (Avg Change: {market_status['avg_change']:+.2f}%)
+                </span>
+            </p>
+            <p style='margin: 5px 0 0 0; font-size: 0.9em;'>
+                🟢 <b>{market_status['up_count']}</b> Up &nbsp;|&nbsp; 🔴 <b>{market_status['down_count']}</b> Down
+                &nbsp;|&nbsp; Breadth: <b>{market_status.get('breadth', 0):+.2f}</b>
+            </p>
+            {sector_rows(market_status.get('sectors', []))}
+        </div>
+        """)
+
+    llm_summarizer.analyze_stock_market(full_news_context, stream=html.write)
+    return {"html": html.getvalue(), "images": {}}
+
+def trading_simulation_section(full_news_context):
+    # 2.5 Trading Simulation (Run the Bot)
+    print("Running Trading Simulation...")
     images = {}
-
-    # --- MODE 1: MARKET OPEN (STOCKS & TECH) ---
-    if market_open:
-        print("Market is OPEN - Running Stock & Tech Tasks...")
-
-        # 2. Tech Portfolio News
-        html_content += "<h1>Tech Portfolio News</h1>"
-        tech_articles = collector.collect_tech_news()
-        tech_curated = llm_summarizer.curate_tech_news(tech_articles)
-        
-        html_content += "<div style='background-color: #f3e5f5; padding: 15px; border-radius: 5px; margin-bottom: 20px;'>"
-        html_content += "<h3>📱 Portfolio Highlights</h3>"
-        html_content += f"{tech_curated}"
-        html_content += "</div>"
-        
-        # 2.1 Market Analysis (NEW SECTION)
-        # Collect Targeted Stock News for Context
-        specific_stock_articles = collector.collect_specific_stock_news(MARKET_UNIVERSE)
+    html_content = "<h1>Trading Simulation</h1>"
+    try:
+        # Pass the Combined Context to the Trading AI
+        # Each trading prompt takes its own token-budgeted view of the context
+        simulation_logs, state = trading.run_simulation(return_logs=True, market_context=full_news_context)
+        # Format logs for HTML (replace newlines with <br>)
+        formatted_logs = simulation_logs.replace("\n", "<br>")
         
-        full_news_context = "WORLD NEWS SUMMARY:\n" + world_summary + "\n"
-        full_news_context += "TECH NEWS SUMMARY:\n" + tech_curated + "\n"
-        full_news_context += "\nTARGETED STOCK NEWS ARTICLES (Yahoo Finance):\n"
-        for art in specific_stock_articles:
-            full_news_context += f"-Title: {art['title']}\n Summary: {art['summary']}\n"
-
-        print("Analyzing Market Sentiment...")
-        stock_analysis = llm_summarizer.analyze_stock_market(full_news_context)
+        html_content += "<div style='background-color: #e3f2fd; padding: 15px; border-radius: 5px; margin-bottom: 20px; font-family: monospace; font-size: 0.9em;'>"
+        html_content += "<h3>🤖 AI Trader Activity</h3>"
+        html_content += f"{formatted_logs}"
         
-        html_content += "<hr style='border: 0; border-top: 1px solid #ccc; margin: 15px 0;'>"
-        html_content += "<h3>🤖 AI Market Analysis</h3>"
+        # --- MOVED: Portfolio Growth Graph ---
+        graph_generator = GraphGenerator() # Ensure initialized
         
-        # Overall Market Status
-        try:
-            market_status = trading.get_market_status()
-            if market_status:
-                html_content += f"""
-                <div style='background-color: #e8eaed; padding: 10px; border-radius: 5px; margin-bottom: 15px;'>
-                    <p style='margin: 0; font-size: 1.1em;'>
-                        <b>Overall Market Status:</b> {market_status['status']} 
-                        <span style='font-size: 0.9em; color: #555;'>
-                            (Avg Change: {market_status['avg_change']:+.2f}%)
-                        </span>
-                    </p>
-                    <p style='margin: 5px 0 0 0; font-size: 0.9em;'>
-                        🟢 <b>{market_status['up_count']}</b> Up &nbsp;|&nbsp; 🔴 <b>{market_status['down_count']}</b> Down
-                    </p>
-                </div>
-                """
-        except Exception as e:
-            print(f"Error fetching market status: {e}")
-
-        html_content += f"{stock_analysis}"
-
-        # 2.5 Trading Simulation (Run the Bot)
-        print("Running Trading Simulation...")
-        html_content += "<h1>Trading Simulation</h1>"
-        try:
-            # Pass the Combined Context to the Trading AI
-            # We reuse full_news_context which is now rich with data
-            simulation_logs, state = trading.run_simulation(return_logs=True, market_context=full_news_context)
-            # Format logs for HTML (replace newlines with <br>)
-            formatted_logs = simulation_logs.replace("\n", "<br>")
+        # We can use the 'state' returned from run_simulation which has the fresh history
+        if state and "equity_history" in state:
+            history = state["equity_history"]
+            portfolio_img_buf = graph_generator.generate_portfolio_chart(history)
             
-            html_content += "<div style='background-color: #e3f2fd; padding: 15px; border-radius: 5px; margin-bottom: 20px; font-family: monospace; font-size: 0.9em;'>"
-            html_content += "<h3>🤖 AI Trader Activity</h3>"
-            html_content += f"{formatted_logs}"
-            
-            # --- MOVED: Portfolio Growth Graph ---
-            graph_generator = GraphGenerator() # Ensure initialized
-            
-            # We can use the 'state' returned from run_simulation which has the fresh history
-            if state and "equity_history" in state:
-                history = state["equity_history"]
-                portfolio_img_buf = graph_generator.generate_portfolio_chart(history)
-                
-                if portfolio_img_buf:
-                    img_id = "chart_portfolio"
-                    images[img_id] = portfolio_img_buf
-                    html_content += "<br><hr style='border: 0; border-top: 1px solid #ccc; margin: 15px 0;'>"
-                    html_content += "<h3>💰 Total Equity Growth</h3>"
-                    html_content += f'<img src="cid:{img_id}" alt="Portfolio History" style="width: 100%; max-width: 600px; height: auto;">'
-            # -------------------------------------
-            
-            html_content += "</div>"
-        except Exception as e:
-            print(f"Error running simulation: {e}")
-            html_content += f"<p>Error running simulation: {e}</p>"
-
-        # 3. Stock Portfolio
-        html_content += "<h1>Stock Portfolio</h1>"
-        stock_collector = StockCollector()
-        stock_data = stock_collector.get_stock_data()
+            if portfolio_img_buf:
+                img_id = "chart_portfolio"
+                images[img_id] = portfolio_img_buf
+                html_content += "<br><hr style='border: 0; border-top: 1px solid #ccc; margin: 15px 0;'>"
+                html_content += "<h3>💰 Total Equity Growth</h3>"
+                html_content += f'<img src="cid:{img_id}" alt="Portfolio History" style="width: 100%; max-width: 600px; height: auto;">'
+        # -------------------------------------
         
-        portfolio_manager = PortfolioManager()
-        total_capital = portfolio_manager.calculate_total_capital(stock_data)
-        history = portfolio_manager.update_history(total_capital)
+        html_content += "</div>"
+    except Exception as e:
+        print(f"Error running simulation: {e}")
+        html_content += f"<p>Error running simulation: {e}</p>"
+    return {"html": html_content, "images": images}
+
+def stock_portfolio_section():
+    # 3. Stock Portfolio
+    images = {}
+    html_content = "<h1>Stock Portfolio</h1>"
+    stock_collector = StockCollector()
+    stock_data = stock_collector.get_stock_data()
+    
+    portfolio_manager = PortfolioManager()
+    total_capital = portfolio_manager.calculate_total_capital(stock_data)
+    history = portfolio_manager.update_history(total_capital)
+    
+    graph_generator = GraphGenerator()
+    
+    html_content += "<div style='background-color: #e8f5e9; padding: 15px; border-radius: 5px; margin-bottom: 20px;'>"
+    html_content += "<h3>💰 Portfolio Overview</h3>"
+    html_content += f"<h2>Total Capital: ${total_capital:,.2f}</h2>"
+    
+    html_content += "<table border='1' cellpadding='5' style='border-collapse: collapse; width: 100%;'>"
+    stock_charts = graph_generator.generate_stock_charts({ticker: data['history'] for ticker, data in stock_data.items()})
+    for ticker, data in stock_data.items():
+        price = data['current_price']
+        change = data['change']
+        pct = (change / (price - change)) * 100 if (price - change) != 0 else 0
         
-        graph_generator = GraphGenerator()
+        arrow = "🟢 ▲" if change >= 0 else "🔴 ▼"
+        color = "green" if change >= 0 else "red"
         
-        html_content += "<div style='background-color: #e8f5e9; padding: 15px; border-radius: 5px; margin-bottom: 20px;'>"
-        html_content += "<h3>💰 Portfolio Overview</h3>"
-        html_content += f"<h2>Total Capital: ${total_capital:,.2f}</h2>"
+        img_buf = stock_charts[ticker]
+        img_id = f"chart_{ticker}"
+        images[img_id] = img_buf
         
-        html_content += "<table border='1' cellpadding='5' style='border-collapse: collapse; width: 100%;'>"
-        for ticker, data in stock_data.items():
-            price = data['current_price']
-            change = data['change']
-            pct = (change / (price - change)) * 100 if (price - change) != 0 else 0
-            
-            arrow = "🟢 ▲" if change >= 0 else "🔴 ▼"
-            color = "green" if change >= 0 else "red"
-            
-            img_buf = graph_generator.generate_stock_chart(ticker, data['history'])
-            img_id = f"chart_{ticker}"
-            images[img_id] = img_buf
+        html_content += f"""
+        <tr>
+            <td style="padding: 10px; border-bottom: 1px solid #ddd;">
+                <h3>{ticker} {arrow}</h3>
+                <p style="font-size: 1.2em; font-weight: bold;">${price:.2f}</p>
+                <p style="color: {color};">{change:+.2f} ({pct:+.2f}%)</p>
+            </td>
+            <td style="padding: 10px; border-bottom: 1px solid #ddd;">
+                <img src="cid:{img_id}" alt="{ticker} Chart" style="width: 300px; height: auto;">
+            </td>
+        </tr>
+        """
+    html_content += "</table>"
+    
+    capital_arrow = ""
+    if len(history) > 1:
+        prev_total = history[-2]['total']
+        if total_capital >= prev_total:
+            capital_arrow = "🟢 ▲"
+        else:
+            capital_arrow = "🔴 ▼"
             
-            html_content += f"""
-            <tr>
-                <td style="padding: 10px; border-bottom: 1px solid #ddd;">
-                    <h3>{ticker} {arrow}</h3>
-                    <p style="font-size: 1.2em; font-weight: bold;">${price:.2f}</p>
-                    <p style="color: {color};">{change:+.2f} ({pct:+.2f}%)</p>
-                </td>
-                <td style="padding: 10px; border-bottom: 1px solid #ddd;">
-                    <img src="cid:{img_id}" alt="{ticker} Chart" style="width: 300px; height: auto;">
-                </td>
-            </tr>
-            """
-        html_content += "</table>"
-        
-        capital_arrow = ""
-        if len(history) > 1:
-            prev_total = history[-2]['total']
-            if total_capital >= prev_total:
-                capital_arrow = "🟢 ▲"
-            else:
-                capital_arrow = "🔴 ▼"
-                
-        html_content += f"<h2>Total Capital: ${total_capital:.2f} {capital_arrow}</h2>"
-        
-        # Real Portfolio History Graph
-        real_history = portfolio_manager.get_real_history()
-        # Since update_history returns the updated list, we could use the return value from above
-        # But to be safe and consistent with the new method logic:
-        
-        if real_history:
-            portfolio_img_buf = graph_generator.generate_portfolio_chart(real_history)
-            if portfolio_img_buf:
-                img_id = "chart_portfolio_real"
-                images[img_id] = portfolio_img_buf
-                html_content += f'<img src="cid:{img_id}" alt="Real Portfolio History" style="width: 100%; max-width: 600px; height: auto;">'
-        elif not portfolio_manager.bucket_name:
-            html_content += "<p><i>(Persistence not enabled. Set BUCKET_NAME to see history graph)</i></p>"
-        
-        html_content += "</div>"
+    html_content += f"<h2>Total Capital: ${total_capital:.2f} {capital_arrow}</h2>"
+    
+    # Real Portfolio History Graph
+    real_history = portfolio_manager.get_real_history()
+    # Since update_history returns the updated list, we could use the return value from above
+    # But to be safe and consistent with the new method logic:
+    
+    if real_history:
+        portfolio_img_buf = graph_generator.generate_portfolio_chart(real_history)
+        if portfolio_img_buf:
+            img_id = "chart_portfolio_real"
+            images[img_id] = portfolio_img_buf
+            html_content += f'<img src="cid:{img_id}" alt="Real Portfolio History" style="width: 100%; max-width: 600px; height: auto;">'
+    elif not portfolio_manager.bucket_name:
+        html_content += "<p><i>(Persistence not enabled. Set BUCKET_NAME to see history graph)</i></p>"
+    
+    html_content += "</div>"
+    return {"html": html_content, "images": images}
 
-    # --- MODE 2: MARKET CLOSED (LIFESTYLE & SPORTS) ---
-    else:
-        print("Market is CLOSED - Running Lifestyle & Sports Tasks...")
+def croatian_news_section(collector, llm_summarizer):
+    cro_articles = collector.collect_croatian_news()
+    
+    html = current_buffer()
+    html.write("<h1>Croatian News</h1>")
+    html.write("<div style='background-color: #fffaf0; padding: 15px; border-radius: 5px; margin-bottom: 20px;'>")
+    html.write("<h3>🇭🇷 Najvažnije Vijesti (Hrvatska)</h3>")
+    llm_summarizer.curate_croatian_news(cro_articles, stream=html.write)
+    html.write("</div>")
+    return {"html": html.getvalue(), "images": {}}
+
+def dalmatia_news_section(hajduk_game_info, collector, llm_summarizer):
+    dal_articles = collector.collect_dalmatia_news()
+    
+    html = current_buffer()
+    html.write("<h1>Dalmatia News</h1>")
+    html.write("<div style='background-color: #e0f7fa; padding: 15px; border-radius: 5px; margin-bottom: 20px;'>")
+    html.write("<h3>🌊 Najvažnije Vijesti (Dalmacija)</h3>")
+    html.write(f"{hajduk_game_info}")
+    html.write("<hr style='border: 0; border-top: 1px solid #ccc; margin: 15px 0;'>")
+    llm_summarizer.curate_dalmatia_news(dal_articles, stream=html.write)
+    html.write("</div>")
+    return {"html": html.getvalue(), "images": {}}
+
+def nba_section(collector, llm_summarizer, score_collector):
+    html = current_buffer()
+    html.write("<h1>NBA News</h1>")
+    html.write("<div style='background-color: #fff8e1; padding: 15px; border-radius: 5px; margin-bottom: 20px;'>")
+    
+    nba_articles = collector.collect_nba_news()
+    
+    html.write("<h3>🏀 NBA Updates</h3>")
+    html.write("<p>")
+    llm_summarizer.summarize_world_news(nba_articles, stream=html.write)
+    html.write("</p>")
+    html.write("<br>")
 
-        # 2. Croatian News
-        html_content += "<h1>Croatian News</h1>"
-        cro_articles = collector.collect_croatian_news()
-        cro_curated = llm_summarizer.curate_croatian_news(cro_articles)
+    scores = score_collector.get_last_nights_scores()
+    weekly_scores = score_collector.get_weekly_scores()
+    
+    html.write("<h3>🏀 AI Performance Analysis</h3>")
+    html.write("<p>")
+    llm_summarizer.analyze_nba_trends(weekly_scores, stream=html.write)
+    html.write("</p>")
+    html.write("<br>")
+    
+    if scores:
+        html.write("<h2>NBA Scores</h2>")
+        html.write("<table border='1' cellpadding='5' style='border-collapse: collapse; width: 100%; background-color: white;'>")
+        html.write("<tr style='background-color: #f2f2f2;'><th>Matchup</th><th>Score</th><th>Status</th></tr>")
+        for game in scores:
+            html.write(f"<tr><td>{game['matchup']}</td><td>{game['score']}</td><td>{game['status']}</td></tr>")
+        html.write("</table>")
         
-        html_content += "<div style='background-color: #fffaf0; padding: 15px; border-radius: 5px; margin-bottom: 20px;'>"
-        html_content += "<h3>🇭🇷 Najvažnije Vijesti (Hrvatska)</h3>"
-        html_content += f"{cro_curated}"
-        html_content += "</div>"
+    html.write("<br>")
+    html.write("<h3>Latest Headlines</h3>")
+    for article in nba_articles:
+         html.write(f"<h4><a href='{article['link']}'>{article['title']}</a></h4>")
+         
+    html.write("</div>")
+    return {"html": html.getvalue(), "images": {}}
+
+def build_report(market_open, collector, llm_summarizer, score_collector, max_workers=REPORT_WORKERS):
+    """
+    Builds all report sections, running independent ones concurrently.
+    Returns (html_content, images) with sections in the usual order.
+    """
+    # 1. World News (ALWAYS RUN)
+    sections = [
+        Section("world", lambda _: world_news_section(collector, llm_summarizer),
+                placeholder=unavailable_section("World News", summary="")),
+    ]
 
-        # 3. Dalmatia News
-        html_content += "<h1>Dalmatia News</h1>"
-        dal_articles = collector.collect_dalmatia_news()
-        dal_curated = llm_summarizer.curate_dalmatia_news(dal_articles)
-        hajduk_game_info = llm_summarizer.get_next_hajduk_game()
-        
-        html_content += "<div style='background-color: #e0f7fa; padding: 15px; border-radius: 5px; margin-bottom: 20px;'>"
-        html_content += "<h3>🌊 Najvažnije Vijesti (Dalmacija)</h3>"
-        html_content += f"{hajduk_game_info}"
-        html_content += "<hr style='border: 0; border-top: 1px solid #ccc; margin: 15px 0;'>"
-        html_content += f"{dal_curated}"
-        html_content += "</div>"
+    # --- MODE 1: MARKET OPEN (STOCKS & TECH) ---
+    if market_open:
+        print("Market is OPEN - Running Stock & Tech Tasks...")
+        sections += [
+            Section("tech", lambda _: tech_news_section(collector, llm_summarizer),
+                    placeholder=unavailable_section("Tech Portfolio News", curated="")),
+            # Collect Targeted Stock News for Context
+            Section("stock_news", lambda _: collector.unseen(collector.collect_specific_stock_news(MARKET_UNIVERSE)), placeholder=[]),
+            Section("market_status", lambda _: trading.get_market_status(), timeout=60, placeholder=None),
+            Section("context", lambda r: build_news_context(r["world"]["summary"], r["tech"]["curated"], r["stock_news"]),
+                    deps=("world", "tech", "stock_news"), placeholder=""),
+            # 2.1 Market Analysis (NEW SECTION)
+            Section("analysis", lambda r: market_analysis_section(llm_summarizer, r["context"], r["market_status"]),
+                    deps=("context", "market_status"),
+                    placeholder={"html": "<p><i>(Stock analysis unavailable.)</i></p>", "images": {}}),
+            # No timeout: a timed-out worker would keep placing orders after the email said it didn't run
+            Section("simulation", lambda r: trading_simulation_section(r["context"]), deps=("context",), timeout=None,
+                    placeholder=unavailable_section("Trading Simulation")),
+            Section("portfolio", lambda _: stock_portfolio_section(),
+                    placeholder=unavailable_section("Stock Portfolio")),
+        ]
+        order = ["world", "tech", "analysis", "simulation", "portfolio"]
 
-        # 4. NBA News
-        html_content += "<h1>NBA News</h1>"
-        html_content += "<div style='background-color: #fff8e1; padding: 15px; border-radius: 5px; margin-bottom: 20px;'>"
-        
-        nba_articles = collector.collect_nba_news()
-        nba_summary = llm_summarizer.summarize_world_news(nba_articles)
-        
-        html_content += "<h3>🏀 NBA Updates</h3>"
-        html_content += f"<p>{nba_summary}</p>"
-        html_content += "<br>"
+    # --- MODE 2: MARKET CLOSED (LIFESTYLE & SPORTS) ---
+    else:
+        print("Market is CLOSED - Running Lifestyle & Sports Tasks...")
+        sections += [
+            Section("croatian", lambda _: croatian_news_section(collector, llm_summarizer),
+                    placeholder=unavailable_section("Croatian News")),
+            Section("hajduk", lambda _: llm_summarizer.get_next_hajduk_game(), timeout=30,
+                    placeholder="<p><i>(Podaci o sljedećoj utakmici nisu pronađeni.)</i></p>"),
+            Section("dalmatia", lambda r: dalmatia_news_section(r["hajduk"], collector, llm_summarizer), deps=("hajduk",),
+                    placeholder=unavailable_section("Dalmatia News")),
+            Section("nba", lambda _: nba_section(collector, llm_summarizer, score_collector),
+                    placeholder=unavailable_section("NBA News")),
+        ]
+        order = ["world", "croatian", "dalmatia", "nba"]
+
+    results = run_sections(sections, max_workers=max_workers)
+
+    html_content = f"<p>Generated at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>"
+    images = {}
+    for name in order:
+        html_content += results[name]["html"]
+        images.update(results[name].get("images", {}))
+    return html_content, images
 
-        scores = score_collector.get_last_nights_scores()
-        weekly_scores = score_collector.get_weekly_scores()
-        nba_trends = llm_summarizer.analyze_nba_trends(weekly_scores)
-        
-        html_content += "<h3>🏀 AI Performance Analysis</h3>"
-        html_content += f"<p>{nba_trends}</p>"
-        html_content += "<br>"
-        
-        if scores:
-            html_content += "<h2>NBA Scores</h2>"
-            html_content += "<table border='1' cellpadding='5' style='border-collapse: collapse; width: 100%; background-color: white;'>"
-            html_content += "<tr style='background-color: #f2f2f2;'><th>Matchup</th><th>Score</th><th>Status</th></tr>"
-            for game in scores:
-                html_content += f"<tr><td>{game['matchup']}</td><td>{game['score']}</td><td>{game['status']}</td></tr>"
-            html_content += "</table>"
-            
-        html_content += "<br>"
-        html_content += "<h3>Latest Headlines</h3>"
-        for article in nba_articles:
-             html_content += f"<h4><a href='{article['link']}'>{article['title']}</a></h4>"
-             
-        html_content += "</div>"
+def generate_and_send_report():
+    print("Generating scheduled report...")
+    # Each report reads every GCS blob at most once, and fetches one market snapshot
+    blob_store.clear_caches()
+    trading.clear_market_snapshot()
+    collector = NewsCollector()
+    llm_summarizer = LLMSummarizer()
+    score_collector = NBAScoreCollector()
+    
+    # CHECK MARKET HOURS
+    market_open = False
+    try:
+        if trading.trading_client:
+             clock = trading.trading_client.get_clock()
+             market_open = clock.is_open
+             print(f"Market Status: {'OPEN' if market_open else 'CLOSED'}")
+    except Exception as e:
+        print(f"Error checking market hours: {e}")
 
+    html_content, images = build_report(market_open, collector, llm_summarizer, score_collector)
 
     # Prepare Attachments
     attachments = {}
     if market_open:
         try:
-            # Fetch Transaction History from Bot State
+            # Fetch Transaction History from Bot State (served from the report's blob cache)
             state = trading.init_state(log_func=lambda x: None) # Quiet init
-            history_list = state.get("history", [])
+            history_list = history_lines(state)  # Derived from the stored trades
             history_text = "\n".join(history_list)
             attachments['transaction_history.txt'] = history_text
             print(f"Attached transaction history ({len(history_list)} entries)")
         except Exception as e:
             print(f"Error preparing transaction history attachment: {e}")
 
-    # Send Email
+    # Send Email (rendered once, one SMTP connection)
+    html_content = f"<html><body>{html_content}</body></html>"
     subject = f"AI News Report - {datetime.now().strftime('%Y-%m-%d')} ({'MARKET OPEN' if market_open else 'EVENING EDITION'})"
     email_service = EmailService()
     email_service.send_email(subject, html_content, images=images, attachments=attachments)
 
+    # Remember what went out so the next edition only carries new stories
+    try:
+        collector.dedup.save()
+    except Exception as e:
+        print(f"Error saving dedup index: {e}")
 
-    html_content += "</body></html>"
-
-    email_service = EmailService()
-    subject = f"DARIO NEWS - {datetime.now().strftime('%Y-%m-%d')}"
-    email_service.send_email(subject, html_content, images, attachments)
+    print(llm_cache.get_cache().report())
+    if llm_client.get_client():
+        print(llm_client.get_client().report())
 
 def run_scheduler():
     # Schedule for 8am and 7pm CET
@@ -946,7 +1147,6 @@ def run_scheduler():
 
 # --- FastAPI App ---
 from fastapi import FastAPI
-import uvicorn
 from contextlib import asynccontextmanager
 
 @asynccontextmanager
@@ -954,8 +1154,12 @@ async def lifespan(app: FastAPI):
     # Startup
     scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
     scheduler_thread.start()
+    if os.environ.get("EMAIL_USER"):
+        get_mail_queue() # Resend mail spooled before a restart
     yield
-    # Shutdown (nothing specific needed for thread as it is daemon)
+    # Shutdown: give queued mail a chance to go out (the rest stays spooled)
+    if _mail_queue:
+        _mail_queue.close(timeout=30)
 
 app = FastAPI(lifespan=lifespan)
 
@@ -993,6 +1197,11 @@ def trigger_email(background_tasks: BackgroundTasks):
     background_tasks.add_task(generate_and_send_report)
     return {"status": "Report generation started in background"}
 
+@app.get("/metrics/mail")
+def mail_metrics():
+    """Mail queue depth, retries and SMTP send latency."""
+    return get_mail_queue().metrics()
+
 def main():
     # For local CLI testing
     collector = NewsCollector()
@@ -1044,6 +1253,9 @@ if __name__ == "__main__":
     # Check if running as script or API
     import sys
     if "serve" in sys.argv:
-        uvicorn.run(app, host="0.0.0.0", port=8080)
+        # Served as `python -m uvicorn news_agent:app`: spawned chart workers re-run the
+        # launching script, and uvicorn's __main__ (unlike this file) builds no app or clients
+        os.execv(sys.executable, [sys.executable, "-m", "uvicorn", "news_agent:app", "--host", "0.0.0.0", "--port", "8080",
+                                  "--app-dir", os.path.dirname(os.path.abspath(__file__))])
     else:
         main()
@@ -0,0 +1,159 @@
+"""
+Token-budgeted news context for the market analyst and the trading prompts.
+
+The report used to concatenate the world summary, the tech curation HTML and
+every Yahoo article into one blob, cut it at 200k characters for the analyst
+and send all of it with every trading call. NewsContext strips the HTML once,
+drops sentences already seen elsewhere, and indexes which snippets mention which
+MARKET_UNIVERSE ticker (ticker_index: symbols, company names and aliases).
+Each consumer then asks for its own view under a token budget:
+
+- for_analyst(): world + tech summary first, then each ticker's best snippets in turn.
+- world(): the shared part of a trading prompt.
+- for_ticker(symbol): only the snippets about one ticker from the last 24h, best first.
+
+Tokens are estimated at CHARS_PER_TOKEN characters each (no tokenizer call).
+"""
+import html
+import re
+import time
+from collections import namedtuple
+
+from config import MARKET_UNIVERSE
+from dedup import normalize_text
+from ticker_index import TickerIndex
+
+CHARS_PER_TOKEN = 4
+ANALYST_TOKENS = 8000    # Whole analyst prompt context
+WORLD_TOKENS = 600       # Shared world context per trading prompt
+TICKER_TOKENS = 300      # Company news per ticker in a trading prompt
+MIN_SENTENCE_WORDS = 3   # Shorter fragments ("Read more.") are dropped
+RELATED_NEWS_HOURS = 24  # Age limit for a ticker's articles in its trading prompt
+
+# Ticker mentions weigh more in targeted stock articles than in general summaries
+SOURCE_WEIGHT = {"stock": 3, "tech": 2, "world": 1}
+
+TAG_RE = re.compile(r"<[^>]+>")
+BLOCK_TAG_RE = re.compile(r"</?(p|li|ul|ol|br|div|h\d)[^>]*>", re.I)
+SPACE_RE = re.compile(r"\s+")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'“])")
+
+Snippet = namedtuple("Snippet", "source text tokens tickers")
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def strip_html(text):
+    """HTML -> plain text; block tags become sentence breaks."""
+    text = BLOCK_TAG_RE.sub(". ", text or "")
+    text = html.unescape(TAG_RE.sub(" ", text))
+    text = SPACE_RE.sub(" ", text).strip()
+    return re.sub(r"(\s*\.\s*){2,}", ". ", text).strip(". ")
+
+
+def split_sentences(text):
+    return [s.strip() for s in SENTENCE_RE.split(text) if s.strip()]
+
+
+class NewsContext:
+    def __init__(self, world_summary="", tech_curated="", stock_articles=(), symbols=MARKET_UNIVERSE):
+        self.symbols = list(symbols)
+        self.snippets = []
+        self.index = TickerIndex()  # Items are snippet positions
+        self.source_tokens = 0  # What the old concatenated blob would have cost
+        self._seen = set()
+
+        now = time.time()  # The summaries were written for this report
+        for source, text in (("world", world_summary), ("tech", tech_curated)):
+            self.source_tokens += estimate_tokens(text or "")
+            for sentence in split_sentences(strip_html(text)):
+                self._add(source, [sentence], published=now)
+        for art in stock_articles:
+            self.source_tokens += estimate_tokens(f"-Title: {art['title']}\n Summary: {art['summary']}\n")
+            title = strip_html(art['title'])
+            sentences = split_sentences(strip_html(art['summary']))
+            # Lead sentences often repeat the title; then the lead stands in for it
+            if not sentences or normalize_text(title) not in normalize_text(sentences[0]):
+                sentences.insert(0, title)
+            # Undated feed items are still in the feed, so they count as current
+            self._add("stock", sentences, keep_first=True, published=art.get('published') or now)
+
+    def _add(self, source, sentences, keep_first=False, published=None):
+        """
+        Adds one snippet made of the sentences not seen before. An article keeps its
+        title for context, but is dropped when neither title nor summary is new.
+        """
+        fresh = []
+        for j, sentence in enumerate(sentences):
+            key = normalize_text(sentence)
+            title = keep_first and j == 0
+            if key in self._seen or (len(key.split()) < MIN_SENTENCE_WORDS and not title):
+                if title:
+                    fresh.append(None)  # Placeholder: seen title, kept only if the summary is new
+                continue
+            self._seen.add(key)
+            fresh.append(sentence)
+        if keep_first and fresh and fresh[0] is None:
+            fresh[0] = sentences[0] if len(fresh) > 1 else None
+        fresh = [f if f[-1] in ".!?" else f + "." for f in fresh if f]
+        if fresh:
+            text = " ".join(fresh)
+            tickers = self.index.add(len(self.snippets), text, published)
+            self.snippets.append(Snippet(source, text, estimate_tokens(text) + 1, tickers))
+
+    def ranked(self, symbol, max_age_hours=None):
+        """Positions of the snippets mentioning `symbol`: most mentions (weighted by source) first."""
+        positions = self.index.positions(symbol, max_age_hours)
+        weight = lambda i: self.snippets[i].tickers[symbol] * SOURCE_WEIGHT[self.snippets[i].source]
+        return sorted(positions, key=lambda i: (-weight(i), i))
+
+    def __bool__(self):
+        return bool(self.snippets)
+
+    def __str__(self):
+        return "\n".join(s.text for s in self.snippets)
+
+    @staticmethod
+    def pack(snippets, budget):
+        """Greedily keeps snippets in the given order while they fit in `budget` tokens -> (text, tokens)."""
+        lines, used = [], 0
+        for snippet in snippets:
+            if used + snippet.tokens > budget:
+                continue
+            lines.append(snippet.text)
+            used += snippet.tokens
+        return "\n".join(lines), used
+
+    def world(self, budget=WORLD_TOKENS):
+        """World and tech summary sentences, in their original order."""
+        return self.pack([s for s in self.snippets if s.source != "stock"], budget)
+
+    def for_ticker(self, symbol, budget=TICKER_TOKENS, max_age_hours=RELATED_NEWS_HOURS):
+        """Snippets from the last max_age_hours mentioning `symbol`, most relevant first."""
+        return self.pack([self.snippets[i] for i in self.ranked(symbol, max_age_hours)], budget)
+
+    def for_analyst(self, budget=ANALYST_TOKENS):
+        """Half the budget for the world/tech summaries, the rest round-robin over each ticker's best snippets."""
+        world_text, used = self.world(budget // 2)
+        ranked = [self.ranked(symbol) for symbol in self.symbols]
+        chosen, order = set(), []
+        for depth in range(max(map(len, ranked), default=0)):
+            for positions in ranked:
+                i = positions[depth] if depth < len(positions) else None
+                if i is not None and i not in chosen and self.snippets[i].source == "stock":
+                    chosen.add(i)
+                    order.append(self.snippets[i])
+        # Untagged market news after the ticker-specific snippets
+        order += [s for i, s in enumerate(self.snippets) if s.source == "stock" and i not in chosen]
+        stock_text, stock_used = self.pack(order, budget - used)
+        text = f"WORLD & TECH SUMMARY:\n{world_text}\n\nSTOCK NEWS:\n{stock_text}"
+        return text, used + stock_used
+
+
+def as_context(market_context):
+    """Wraps a plain-text context (legacy callers, recorded scans) as a NewsContext."""
+    if isinstance(market_context, NewsContext) or not market_context:
+        return market_context
+    return NewsContext(world_summary=str(market_context))
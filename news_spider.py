@@ -1,6 +1,7 @@
 import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
+from ticker_index import keyword_pattern
 
 # 1. Configuration
 TARGETS = [
@@ -10,6 +11,8 @@ TARGETS = [
 
 # Keywords to look for in HEADLINES or URLs
 KEYWORDS = ["apple", "nvidia", "google", "tesla", "tsla", "musk", "ai"]
+# Whole words only: "ai" must not match "said" or "/again"
+KEYWORD_RE = keyword_pattern(KEYWORDS)
 
 def scan_site(site_name, start_url):
     print(f"\n📡 Scanning {site_name}...")
@@ -30,18 +33,14 @@ def scan_site(site_name, start_url):
             full_url = urljoin(start_url, url)
             
             # Check if keywords are in the TEXT or the URL
-            for key in KEYWORDS:
-                if key in text or key in url.lower():
-                    # Filter out junk (like "apple-touch-icon")
-                    if "icon" in url or len(text) < 10: 
-                        continue
-                        
-                    found_articles.append({
-                        "headline": text[:60] + "...", # First 60 chars
-                        "url": full_url,
-                        "match": key
-                    })
-                    break # Found a match, move to next link
+            match = KEYWORD_RE.search(text) or KEYWORD_RE.search(url)
+            # Filter out junk (like "apple-touch-icon")
+            if match and "icon" not in url and len(text) >= 10:
+                found_articles.append({
+                    "headline": text[:60] + "...", # First 60 chars
+                    "url": full_url,
+                    "match": match.group(0).lower()
+                })
 
         # Remove duplicates
         unique_articles = {v['url']: v for v in found_articles}.values()
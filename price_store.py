@@ -0,0 +1,312 @@
+"""
+Local daily OHLCV store.
+
+One directory per symbol under CACHE_DIR/prices/<source>. base.npy holds the
+compacted bars (a NumPy structured array, sorted by timestamp) and is
+memory-mapped for reads; one process is expected to own the directory. Each
+update adds a small delta_<seq>.npy segment; a delta overrides bars with the
+same timestamp, so today's still-moving bar can be rewritten. compact() folds
+the deltas back into base.npy. Reads, appends and compaction of one symbol hold
+that symbol's lock (report sections write the same symbols concurrently); files
+are written to a unique temp name and renamed into place.
+
+update() gap-fills: it asks the fetcher only for bars from each symbol's last
+complete stored day onward, batching symbols that share a start date into one
+request. Stored bars are only comparable if they come from one source with one
+price adjustment, so each source gets its own store (get_store(source)). An
+adjusted source re-bases its whole history after a split or dividend: when the
+refetched overlap day no longer matches the stored close, the symbol's history
+is refetched and replaced instead of appended to.
+"""
+import os
+import tempfile
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from config import CACHE_DIR
+
+BAR_DTYPE = np.dtype([
+    ("ts", "<i8"),  # Day of the bar, as UTC midnight epoch seconds
+    ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"), ("volume", "<f8"),
+])
+EXCHANGE_TZ = "America/New_York"
+EPOCH = date(1970, 1, 1)
+MAX_DELTAS = 8  # Segments per symbol before update() compacts it
+REBASE_TOLERANCE = 0.0005  # Relative close difference on the overlap day that means the source re-based its history
+SPLIT_SUSPECT = 0.35  # Day-over-day move (either way) too large to append blindly; see split_suspect()
+
+
+def day_ts(dates):
+    """Dates / timestamps (naive = exchange-local day, or tz-aware) -> int64 day timestamps."""
+    index = pd.DatetimeIndex(dates)
+    if index.tz is not None:
+        index = index.tz_convert(EXCHANGE_TZ).tz_localize(None)
+    # Not .asi8: its unit depends on the index resolution (ns/us/s) in pandas 2+
+    return np.asarray((index.normalize() - pd.Timestamp(0)) // pd.Timedelta(seconds=1), dtype=np.int64)
+
+
+def ts_date(ts):
+    return datetime.fromtimestamp(int(ts), tz=timezone.utc).date()
+
+
+def make_bars(dates, opens, highs, lows, closes, volumes):
+    bars = np.empty(len(dates), dtype=BAR_DTYPE)
+    bars["ts"] = day_ts(dates)
+    bars["open"], bars["high"], bars["low"], bars["close"], bars["volume"] = opens, highs, lows, closes, volumes
+    return bars
+
+
+def merge(parts):
+    """Concatenates segments; for duplicate timestamps the later segment wins. Result is sorted."""
+    bars = np.concatenate(parts)
+    bars = bars[np.argsort(bars["ts"], kind="stable")]
+    keep = np.append(bars["ts"][1:] != bars["ts"][:-1], True)
+    return bars[keep]
+
+
+def split_suspect(prev_close, close):
+    """True for a daily move so large it is more likely an unadjusted split than a trade."""
+    if not prev_close or not close:
+        return False
+    ratio = close / prev_close
+    return ratio < 1 - SPLIT_SUSPECT or ratio > 1 / (1 - SPLIT_SUSPECT)
+
+
+def rebased(check, bars):
+    """check = (day ts, stored close); True if `bars` has that day at a different close."""
+    ts, close = check
+    i = np.searchsorted(bars["ts"], ts)
+    if i == len(bars) or bars["ts"][i] != ts or not close:
+        return False
+    return abs(bars["close"][i] / close - 1) > REBASE_TOLERANCE
+
+
+class PriceStore:
+    def __init__(self, directory=None):
+        self.directory = directory or os.path.join(CACHE_DIR, "prices")
+        self._lock = threading.Lock()
+        self._views = {}  # symbol -> merged bars
+        self._symbol_locks = {}
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _symbol_lock(self, symbol):
+        """Serializes segment listing, writes and compaction for one symbol."""
+        with self._lock:
+            return self._symbol_locks.setdefault(symbol, threading.RLock())
+
+    # --- Files ---
+    def _symbol_dir(self, symbol):
+        return os.path.join(self.directory, symbol.replace("/", "_"))
+
+    def _segments(self, symbol):
+        """(base path or None, delta paths in write order)."""
+        folder = self._symbol_dir(symbol)
+        try:
+            names = os.listdir(folder)
+        except FileNotFoundError:
+            return None, []
+        base = os.path.join(folder, "base.npy") if "base.npy" in names else None
+        deltas = sorted(n for n in names if n.startswith("delta_") and n.endswith(".npy"))
+        return base, [os.path.join(folder, n) for n in deltas]
+
+    def _write(self, path, bars):
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=os.path.basename(path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, bars)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    # --- Reads ---
+    def bars(self, symbol):
+        """
+        All stored bars for `symbol` (memory-mapped when compacted). The merged view is
+        kept in memory until this store writes the symbol again.
+        """
+        with self._lock:
+            if symbol in self._views:
+                return self._views[symbol]
+        with self._symbol_lock(symbol):  # No delta can be added or compacted away mid-read
+            with self._lock:
+                if symbol in self._views:
+                    return self._views[symbol]
+            base, deltas = self._segments(symbol)
+            parts = [np.load(base, mmap_mode="r")] if base else []
+            parts += [np.load(path) for path in deltas]
+            if not parts:
+                bars = np.empty(0, dtype=BAR_DTYPE)
+            elif len(parts) == 1:
+                bars = parts[0]
+            else:
+                bars = merge(parts)
+            with self._lock:
+                self._views[symbol] = bars
+        return bars
+
+    def read(self, symbol, start=None, end=None):
+        """Bars with start <= day <= end (dates, datetimes or day timestamps)."""
+        bars = self.bars(symbol)
+        ts = bars["ts"]
+        lo = 0 if start is None else np.searchsorted(ts, self._ts(start), side="left")
+        hi = len(bars) if end is None else np.searchsorted(ts, self._ts(end), side="right")
+        return bars[lo:hi]
+
+    def _ts(self, value):
+        if isinstance(value, (int, np.integer)):
+            return int(value)
+        if isinstance(value, datetime) and value.tzinfo is None:
+            value = value.date()
+        if type(value) is date:
+            return (value - EPOCH).days * 86400  # Fast path; pandas is slow for one value
+        return int(day_ts([value])[0])
+
+    def last_timestamp(self, symbol):
+        bars = self.bars(symbol)
+        return int(bars["ts"][-1]) if len(bars) else None
+
+    def close_matrix(self, symbols, start=None, end=None, field="close"):
+        """(day timestamps, values[days x symbols]) aligned on the union of days, NaN where a symbol has no bar."""
+        start = None if start is None else self._ts(start)
+        end = None if end is None else self._ts(end)
+        ranges = [self.read(symbol, start, end) for symbol in symbols]
+        days = np.unique(np.concatenate([bars["ts"] for bars in ranges])) if ranges else np.empty(0, dtype=np.int64)
+        values = np.full((len(days), len(symbols)), np.nan)
+        for col, bars in enumerate(ranges):
+            values[np.searchsorted(days, bars["ts"]), col] = bars[field]
+        return days, values
+
+    def close_frame(self, symbols, start=None, end=None):
+        """Daily closes as a DataFrame (dates x symbols), NaN where a symbol has no bar."""
+        days, values = self.close_matrix(symbols, start, end)
+        index = pd.DatetimeIndex(pd.to_datetime(days, unit="s"), name="Date")
+        return pd.DataFrame(values, index=index, columns=list(symbols))
+
+    # --- Writes ---
+    def append(self, symbol, bars):
+        """Adds bars as a new delta segment (they replace stored bars with the same day)."""
+        if len(bars) == 0:
+            return
+        bars = merge([np.asarray(bars, dtype=BAR_DTYPE)])
+        with self._symbol_lock(symbol):
+            _, deltas = self._segments(symbol)
+            seq = int(os.path.basename(deltas[-1])[6:-4]) + 1 if deltas else 0
+            self._write(os.path.join(self._symbol_dir(symbol), f"delta_{seq:06d}.npy"), bars)
+            with self._lock:
+                self._views.pop(symbol, None)
+
+    def compact(self, symbols=None):
+        """Folds delta segments into base.npy. Returns the number of symbols rewritten."""
+        if symbols is None:
+            symbols = sorted(os.listdir(self.directory))
+        compacted = 0
+        for symbol in symbols:
+            with self._symbol_lock(symbol):
+                base, deltas = self._segments(symbol)
+                if not deltas:
+                    continue
+                bars = np.array(self.bars(symbol))  # Copy out of the memmap before replacing its file
+                self._write(os.path.join(self._symbol_dir(symbol), "base.npy"), bars)
+                for path in deltas:
+                    os.remove(path)
+                with self._lock:
+                    self._views.pop(symbol, None)
+                compacted += 1
+        return compacted
+
+    def replace(self, symbol, bars):
+        """Replaces everything stored for `symbol` with `bars` (e.g. a re-based history)."""
+        bars = merge([np.asarray(bars, dtype=BAR_DTYPE)])
+        with self._symbol_lock(symbol):
+            _, deltas = self._segments(symbol)
+            self._write(os.path.join(self._symbol_dir(symbol), "base.npy"), bars)
+            for path in deltas:
+                os.remove(path)
+            with self._lock:
+                self._views.pop(symbol, None)
+
+    def update(self, symbols, fetch, lookback_days, today=None):
+        """
+        Gap-fills `symbols` up to today. fetch(symbols, start_date) -> {symbol: bars}.
+        Symbols already stored are refetched from the day before their last stored day
+        (the last one may have been partial); if the source's close for that day changed,
+        the source has re-based the history and the symbol is refetched in full (refetch()).
+        New symbols get `lookback_days` of history.
+        Returns the number of fetch calls made.
+        """
+        today = today or datetime.now(timezone.utc).date()
+        groups, checks = {}, {}
+        for symbol in symbols:
+            stored = self.bars(symbol)
+            if len(stored):
+                check = stored[-2] if len(stored) > 1 else stored[-1]
+                checks[symbol] = (int(check["ts"]), float(check["close"]))
+                start = ts_date(check["ts"])
+            else:
+                start = today - timedelta(days=lookback_days)
+            groups.setdefault(start, []).append(symbol)
+
+        stale = []
+        for start, group in sorted(groups.items()):
+            fetched = fetch(group, start)
+            for symbol in group:
+                bars = fetched.get(symbol)
+                if bars is None or not len(bars):
+                    continue
+                if symbol in checks and rebased(checks[symbol], bars):
+                    stale.append(symbol)
+                    continue
+                self.append(symbol, bars)
+            self.compact_if_needed(group)
+        calls = len(groups)
+        if stale:
+            print(f"Price store: history re-based at the source (split/dividend) for {', '.join(stale)}, refetching")
+            calls += self.refetch(stale, fetch, lookback_days, today)
+        return calls
+
+    def refetch(self, symbols, fetch, lookback_days, today=None):
+        """
+        Replaces the stored history of `symbols` with a fresh fetch covering at least
+        `lookback_days` (and everything already stored). Returns the number of fetch calls.
+        """
+        today = today or datetime.now(timezone.utc).date()
+        groups = {}
+        for symbol in symbols:
+            start = today - timedelta(days=lookback_days)
+            stored = self.bars(symbol)
+            if len(stored):
+                start = min(start, ts_date(stored["ts"][0]))
+            groups.setdefault(start, []).append(symbol)
+        for start, group in sorted(groups.items()):
+            fetched = fetch(group, start)
+            for symbol in group:
+                bars = fetched.get(symbol)
+                if bars is not None and len(bars):
+                    self.replace(symbol, bars)
+        return len(groups)
+
+    def compact_if_needed(self, symbols):
+        """Compacts symbols that have gathered more than MAX_DELTAS segments."""
+        return self.compact([s for s in symbols if len(self._segments(s)[1]) > MAX_DELTAS])
+
+
+_stores = {}
+_store_lock = threading.Lock()
+
+
+def get_store(source):
+    """
+    Process-wide price store for one source and price adjustment (e.g. "alpaca-split"),
+    under CACHE_DIR/prices/<source>: a stored series never mixes bases.
+    """
+    with _store_lock:
+        if source not in _stores:
+            _stores[source] = PriceStore(os.path.join(CACHE_DIR, "prices", source))
+        return _stores[source]
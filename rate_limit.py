@@ -0,0 +1,98 @@
+"""
+Token-bucket rate limiting and 429-aware retries for Gemini and Alpaca calls.
+
+A TokenBucket is shared by every thread that talks to one API, so a concurrent
+scan never exceeds the configured requests/second. call_with_retry backs off
+exponentially (with jitter) when the API answers 429 / quota exceeded (or, with
+retry_on=is_transient, any 5xx / timeout as well).
+"""
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        """`rate` tokens are added per second, up to `capacity` (burst size)."""
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Blocks until `tokens` are available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+TRANSIENT_STATUS = (500, 502, 503, 504)
+TRANSIENT_TEXT = ("internal error", "service unavailable", "temporarily unavailable", "deadline exceeded", "timed out")
+
+
+def status_of(exc):
+    """HTTP status of an API error (google-api-core, alpaca-py or requests), or None."""
+    for value in (getattr(exc, "code", None), getattr(exc, "status_code", None),
+                  getattr(getattr(exc, "response", None), "status_code", None)):
+        value = getattr(value, "value", value)  # HTTPStatus / grpc enums
+        if isinstance(value, int) and 100 <= value < 600:  # alpaca-py's `code` is its own 8-digit error code
+            return value
+    return None
+
+
+def is_rate_limited(exc):
+    """
+    True for 429 / quota errors: google-api-core's ResourceExhausted and TooManyRequests,
+    alpaca-py APIError and requests HTTPError all carry the status. The message text isn't
+    searched: "429" or "quota" can turn up in any error (an order for 429 shares).
+    """
+    return status_of(exc) == 429
+
+
+def is_transient(exc):
+    """True for errors worth retrying: rate limits, 5xx, timeouts and dropped connections."""
+    if is_rate_limited(exc) or isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    if status_of(exc) in TRANSIENT_STATUS:
+        return True
+    text = str(exc).lower()
+    return any(t in text for t in TRANSIENT_TEXT)
+
+
+def call_with_retry(func, *args, limiter=None, retries=4, base_delay=1.0, max_delay=30.0, retry_on=is_rate_limited, **kwargs):
+    """Calls func under the limiter, retrying errors that match `retry_on` with exponential backoff."""
+    for attempt in range(retries + 1):
+        if limiter:
+            limiter.acquire()
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries or not retry_on(e):
+                raise
+            delay = min(max_delay, base_delay * (2 ** attempt)) * random.uniform(0.5, 1.5)
+            reason = "Rate limited" if is_rate_limited(e) else "Transient error"
+            print(f"   ⏳ {reason} ({e.__class__.__name__}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+
+class RateLimitedModel:
+    """Wraps a Gemini model so every generate_content goes through the limiter and retry logic."""
+    def __init__(self, model, limiter, retries=4):
+        self.model = model
+        self.limiter = limiter
+        self.retries = retries
+
+    def generate_content(self, *args, **kwargs):
+        return call_with_retry(self.model.generate_content, *args, limiter=self.limiter, retries=self.retries, **kwargs)
+
+    def __getattr__(self, name):
+        # model_name etc. come from the wrapped model, so cache keys are unchanged
+        return getattr(self.model, name)
@@ -4,18 +4,14 @@ import os
 from playwright.sync_api import sync_playwright
 from bs4 import BeautifulSoup
 import google.generativeai as genai
+from llm_client import get_client
 
 # --- 1. CONFIGURATION ---
-# Load API Key from Environment Variable (Best Practice) or hardcode if testing
-GEMINI_KEY = os.environ.get("GEMINI_API_KEY", "YOUR_GEMINI_KEY_HERE")
-
-# Configure Gemini
-try:
-    genai.configure(api_key=GEMINI_KEY)
-    # Use the flexible model logic (try 2.0, fallback to 1.5)
-    ai_model = genai.GenerativeModel('gemini-2.0-flash-exp')
-except Exception as e:
-    print(f"⚠️ Warning: Gemini not configured correctly. {e}")
+# Gemini client shared with the news agent and trading (GEMINI_API_KEY, GEMINI_MODELS):
+# model fallback, retries on 429/5xx and a circuit breaker
+ai_model = get_client()
+if not ai_model:
+    print("⚠️ Warning: GEMINI_API_KEY not set. AI analysis will fail.")
 
 # --- 2. ARGUMENT PARSING (The Change) ---
 if len(sys.argv) < 2:
@@ -0,0 +1,170 @@
+"""
+Runs report sections as a dependency graph.
+
+Each Section is a function that receives the results of the sections it depends
+on. Sections whose inputs are ready run concurrently; each has its own timeout,
+and a section that fails or times out is replaced by its placeholder so the
+email still goes out. Wall time per section is logged.
+
+A running section writes its HTML into its SectionBuffer (current_buffer()),
+LLM output chunk by chunk as it streams in. If the section times out, the
+HTML it produced so far replaces the placeholder's, with a note that it was
+cut off, so a slow LLM tail costs the end of one section, not all of it. The
+cut-off HTML gets its open tags closed first (close_tags), so the sections that
+follow don't render inside a half-finished <div>.
+"""
+import re
+import threading
+import time
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+DEFAULT_TIMEOUT = 180  # Seconds per section
+MAX_WORKERS = 8
+TRUNCATED_NOTE = "<p><i>(Cut off: this section ran past its time limit.)</i></p>"
+
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+
+class _OpenTags(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.stack = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in VOID_TAGS:
+            self.stack.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self.stack:
+            del self.stack[len(self.stack) - 1 - self.stack[::-1].index(tag):]
+
+
+def close_tags(html):
+    """Cut-off HTML made well-formed: a trailing partial tag or entity is dropped and open tags are closed."""
+    html = re.sub(r"<[^>]*$", "", html)
+    html = re.sub(r"&#?\w*$", "", html)
+    parser = _OpenTags()
+    parser.feed(html)
+    parser.close()
+    return html + "".join(f"</{tag}>" for tag in reversed(parser.stack))
+
+
+class SectionBuffer:
+    """Thread-safe HTML accumulator for one section."""
+    def __init__(self):
+        self._parts = []
+        self._lock = threading.Lock()
+
+    def write(self, text):
+        if text:
+            with self._lock:
+                self._parts.append(text)
+
+    def getvalue(self):
+        with self._lock:
+            return "".join(self._parts)
+
+    def __len__(self):
+        with self._lock:
+            return sum(map(len, self._parts))
+
+
+_running = threading.local()
+
+
+def current_buffer():
+    """The buffer of the section running on this thread; a standalone one when called outside run_sections."""
+    buffer = getattr(_running, "buffer", None)
+    return buffer if buffer is not None else SectionBuffer()
+
+
+class Section:
+    def __init__(self, name, func, deps=(), timeout=DEFAULT_TIMEOUT, placeholder=None):
+        """
+        func(inputs) -> result, where inputs is {dep_name: dep_result}.
+        placeholder is used as the result if func raises or runs past timeout,
+        so it should have the same shape dependents expect.
+        timeout=None waits for the section however long it takes: the worker thread
+        can't be stopped, so use it for sections with side effects (placing orders).
+        """
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.placeholder = placeholder
+
+
+def run_sections(sections, max_workers=MAX_WORKERS):
+    """Runs all sections and returns {name: result}. Never raises for a section failure."""
+    pending = {s.name: s for s in sections}
+    results = {}
+    timings = {}
+    running = {}  # future -> section
+    started = {}  # name -> when a worker picked the section up (queue time doesn't count)
+    buffers = {}  # name -> SectionBuffer the section writes into
+    started_all = time.monotonic()
+
+    def run(section, inputs):
+        buffers[section.name] = _running.buffer = SectionBuffer()
+        started[section.name] = time.monotonic()
+        try:
+            return section.func(inputs)
+        finally:
+            _running.buffer = None
+
+    def finish(section, result, status):
+        results[section.name] = result
+        timings[section.name] = time.monotonic() - started[section.name] if section.name in started else 0.0
+        print(f"   ⏱️ Section '{section.name}': {timings[section.name]:.2f}s{'' if status == 'ok' else f' ({status})'}")
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        while pending or running:
+            for name, section in list(pending.items()):
+                if all(dep in results for dep in section.deps):
+                    inputs = {dep: results[dep] for dep in section.deps}
+                    running[executor.submit(run, section, inputs)] = section
+                    del pending[name]
+
+            if not running:
+                # Unknown dependency or a cycle: nothing can make progress
+                for section in pending.values():
+                    finish(section, section.placeholder, "unresolved dependencies")
+                break
+
+            now = time.monotonic()
+            deadlines = [started[s.name] + s.timeout for s in running.values() if s.name in started and s.timeout is not None]
+            # Queued sections haven't started their clock yet; poll again shortly
+            timeout = max(0.0, min(deadlines) - now) if deadlines else None
+            if any(s.name not in started for s in running.values()):
+                timeout = min(timeout, 0.5) if timeout is not None else 0.5
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                section = running.pop(future)
+                try:
+                    finish(section, future.result(), "ok")
+                except Exception as e:
+                    print(f"Error in report section '{section.name}': {e}")
+                    finish(section, section.placeholder, "failed")
+
+            now = time.monotonic()
+            for future, section in list(running.items()):
+                if section.timeout is not None and section.name in started and now - started[section.name] >= section.timeout:
+                    # The worker thread can't be killed; its late result is simply ignored
+                    future.cancel()
+                    running.pop(future)
+                    partial = buffers[section.name].getvalue()
+                    if partial and isinstance(section.placeholder, dict) and "html" in section.placeholder:
+                        finish(section, dict(section.placeholder, html=close_tags(partial) + TRUNCATED_NOTE),
+                               f"timed out after {section.timeout}s, kept {len(partial)} chars")
+                    else:
+                        finish(section, section.placeholder, f"timed out after {section.timeout}s")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    total = time.monotonic() - started_all
+    print(f"   ⏱️ Report sections: {total:.2f}s wall time ({sum(timings.values()):.2f}s if run one after another)")
+    return results
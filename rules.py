@@ -0,0 +1,82 @@
+"""
+Deterministic pre-filter for the strategy in config.TRADING_RULES.
+
+The price rules (take profit, stop loss, dip buy, momentum) are thresholds, so
+they are evaluated for every candidate at once with NumPy. Clear-cut cases are
+decided locally; only tickers where the news can change the outcome, or where a
+move sits within BORDERLINE_PCT of a threshold, are sent to the LLM.
+
+What the news can change (rule 1 covers company headlines and the world context):
+- We own it and no price rule fires: negative news means SELL.
+- We don't own it and a buy rule fires: negative news vetoes the BUY.
+With no headlines and no world context the news is "not negative", so those
+cases are decided here too. Take profit / stop loss and "no signal, not held"
+never depend on the news.
+"""
+import numpy as np
+
+TAKE_PROFIT_PCT = 5.0    # Rule 2: gain over avg entry
+STOP_LOSS_PCT = -5.0     # Rule 3: loss under avg entry
+DIP_PCT = -2.0           # Rule 4: 24h change
+MOMENTUM_PCT = 3.0       # Rule 5: 24h change
+BORDERLINE_PCT = 0.25    # Percentage points around a threshold that the LLM weighs instead
+
+RULE = "rule"
+LLM = "llm"
+
+
+def evaluate(candidates, world_news=False, margin=BORDERLINE_PCT):
+    """
+    candidates: dicts with symbol, price, change_pct, portfolio and headlines.
+    world_news: whether a world/market context goes to the LLM (it can sway every ticker).
+    Returns (decisions, ambiguous): {symbol: {"decision", "reason", "path": "rule"}} for the
+    clear-cut tickers, and the candidates that still need the LLM (c['rule_note'] says why).
+    """
+    if not candidates:
+        return {}, []
+    price = np.array([c['price'] for c in candidates], dtype=float)
+    change = np.array([c['change_pct'] for c in candidates], dtype=float)
+    qty = np.array([(c.get('portfolio') or {}).get('qty', 0) for c in candidates], dtype=float)
+    avg = np.array([(c.get('portfolio') or {}).get('avg_price', 0) for c in candidates], dtype=float)
+    has_news = np.array([bool(c.get('headlines')) for c in candidates]) | bool(world_news)
+
+    owned = qty > 0
+    gain = np.zeros_like(price)
+    np.divide(price - avg, avg, out=gain, where=avg > 0)
+    gain *= 100
+
+    take_profit = owned & (gain > TAKE_PROFIT_PCT + margin)
+    stop_loss = owned & (gain < STOP_LOSS_PCT - margin)
+    near_exit = owned & ((np.abs(gain - TAKE_PROFIT_PCT) <= margin) | (np.abs(gain - STOP_LOSS_PCT) <= margin))
+    dip = ~owned & (change < DIP_PCT - margin)
+    momentum = ~owned & (change > MOMENTUM_PCT + margin)
+    near_entry = ~owned & ((np.abs(change - DIP_PCT) <= margin) | (np.abs(change - MOMENTUM_PCT) <= margin))
+
+    sell = take_profit | stop_loss
+    buy_signal = dip | momentum
+    # Ambiguous: borderline moves, news that could force a sell, news that could veto a buy
+    ask = near_exit | near_entry | (owned & ~sell & has_news) | (buy_signal & has_news)
+    buy = buy_signal & ~ask
+
+    decisions = {}
+    ambiguous = []
+    for i, c in enumerate(candidates):
+        if ask[i]:
+            if near_exit[i] or near_entry[i]:
+                c['rule_note'] = "borderline"
+            elif owned[i]:
+                c['rule_note'] = "held, news may force a sell"
+            else:
+                c['rule_note'] = "buy signal, news may veto"
+            ambiguous.append(c)
+        elif take_profit[i]:
+            decisions[c['symbol']] = {"decision": "SELL", "reason": f"Take profit: {gain[i]:+.2f}% over entry", "path": RULE}
+        elif stop_loss[i]:
+            decisions[c['symbol']] = {"decision": "SELL", "reason": f"Stop loss: {gain[i]:+.2f}% under entry", "path": RULE}
+        elif buy[i]:
+            kind = "Dip buy" if dip[i] else "Momentum"
+            decisions[c['symbol']] = {"decision": "BUY", "reason": f"{kind}: {change[i]:+.2f}% (24h), no negative news", "path": RULE}
+        else:
+            reason = "Within ±5% of entry, no news" if owned[i] else f"No entry signal ({change[i]:+.2f}% 24h)"
+            decisions[c['symbol']] = {"decision": "HOLD", "reason": reason, "path": RULE}
+    return decisions, ambiguous
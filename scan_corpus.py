@@ -0,0 +1,61 @@
+"""
+Recorded trading scans, for replay in the backtester.
+
+Every live scan appends one JSON line to CACHE_DIR/scans.jsonl: the date, the
+world context and, per ticker, the price, change, headlines and the decision
+that was made (with its path, rule or llm). The backtester reads the headlines
+back as its news feed and the recorded decisions as a zero-cost LLM.
+"""
+import json
+import os
+import threading
+
+from config import CACHE_DIR
+
+TICKER_FIELDS = ("symbol", "price", "change_pct", "headlines")
+
+
+class ScanCorpus:
+    def __init__(self, path=None):
+        self.path = path or os.path.join(CACHE_DIR, "scans.jsonl")
+        self._lock = threading.Lock()
+
+    def record(self, day, candidates, decisions, market_context=None):
+        tickers = []
+        for c in candidates:
+            entry = {field: c.get(field) for field in TICKER_FIELDS}
+            entry.update(decisions.get(c['symbol'], {}))
+            tickers.append(entry)
+        context = str(market_context) if market_context else None  # A NewsContext is stored as its deduped text
+        line = json.dumps({"date": str(day), "market_context": context, "tickers": tickers})
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def load(self):
+        """{date: {"market_context", "tickers": {symbol: entry}}}; the last scan of a day wins."""
+        days = {}
+        if not os.path.exists(self.path):
+            return days
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    scan = json.loads(line)
+                except ValueError:
+                    continue  # Torn last line after a crash
+                days[scan["date"]] = {
+                    "market_context": scan.get("market_context"),
+                    "tickers": {t["symbol"]: t for t in scan.get("tickers", [])},
+                }
+        return days
+
+
+_corpus = None
+
+
+def get_corpus():
+    global _corpus
+    if _corpus is None:
+        _corpus = ScanCorpus()
+    return _corpus
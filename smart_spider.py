@@ -10,11 +10,14 @@ import time
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 from playwright.sync_api import sync_playwright
+from ticker_index import keyword_pattern
 
 # --- CONFIGURATION ---
 # Keywords remain hardcoded here for simplicity, but you could also 
 # make them arguments if you wanted.
 KEYWORDS = ["apple", "nvidia", "google", "tesla", "tsla", "musk", "ai", "meta"]
+# Whole words only: "ai" must not match "said", "meta" must not match "metadata"
+KEYWORD_RE = keyword_pattern(KEYWORDS)
 
 # --- 1. THE FETCHER (Playwright) ---
 def get_dynamic_content(url):
@@ -75,17 +78,13 @@ def scan_site(url):
         full_url = urljoin(url, href)
         
         # Check Keywords
-        for key in KEYWORDS:
-            if key in full_text or key in href.lower():
-                if "icon" in href or len(text) < 5: 
-                    continue
-                
-                found_articles.append({
-                    "headline": text[:80].title(),
-                    "url": full_url,
-                    "match": key.upper()
-                })
-                break 
+        match = KEYWORD_RE.search(full_text) or KEYWORD_RE.search(href)
+        if match and "icon" not in href and len(text) >= 5:
+            found_articles.append({
+                "headline": text[:80].title(),
+                "url": full_url,
+                "match": match.group(0).upper()
+            })
 
     # Remove duplicates
     unique_articles = {v['url']: v for v in found_articles}.values()
@@ -0,0 +1,90 @@
+"""
+Append-only persistence for the trading bot state.
+
+Instead of re-uploading the whole state JSON after every trade, each trade is
+written as a tiny log record (<name>.log/<seq>.json). The full state is only
+written as a compacted snapshot (the familiar portfolio_ai_state.json) at the
+end of a scan or every COMPACT_EVERY records. Loading = latest snapshot + replay
+of the records written after it.
+"""
+import json
+
+from ledger import Trade, ensure_trades
+
+COMPACT_EVERY = 50
+
+
+def apply_op(state, op):
+    """Applies one log record to the state. Used both live and on replay, so they can't drift."""
+    kind = op["op"]
+    if kind not in ("buy", "sell"):
+        raise ValueError(f"Unknown state op: {kind}")
+    ensure_trades(state).append(Trade(op["date"], kind, op["symbol"], op["qty"], op["price"])._asdict())
+    if kind == "buy":
+        state["cash"] -= op["qty"] * op["price"]
+        state["portfolio"][op["symbol"]] = {"qty": op["qty"], "avg_price": op["price"]}
+    elif kind == "sell":
+        state["cash"] += op["qty"] * op["price"]
+        state["portfolio"].pop(op["symbol"], None)
+    return state
+
+
+class StateStore:
+    def __init__(self, blobs, name, compact_every=COMPACT_EVERY):
+        self.blobs = blobs
+        self.name = name
+        self.log_prefix = f"{name}.log/"
+        self.compact_every = compact_every
+        self.seq = 0          # Last sequence number written or replayed
+        self.pending = 0      # Log records since the last snapshot
+
+    def describe(self):
+        return self.blobs.describe(self.name)
+
+    def _log_name(self, seq):
+        return f"{self.log_prefix}{seq:010d}.json"
+
+    def load(self):
+        """Returns the current state, or None if nothing was ever saved."""
+        text = self.blobs.read_text(self.name)
+        state = json.loads(text) if text else None
+        self.seq = state.pop("log_seq", 0) if state else 0
+
+        records = [n for n in self.blobs.list(self.log_prefix) if int(n[len(self.log_prefix):].split(".")[0]) > self.seq]
+        if records and state is None:
+            raise ValueError(f"Found {len(records)} log records but no snapshot at {self.describe()}")
+        for record in records:
+            op = json.loads(self.blobs.read_text(record))
+            apply_op(state, op)
+            self.seq = op["seq"]
+        self.pending = len(records)
+        return state
+
+    def append(self, state, op):
+        """
+        Persists just this record, then applies `op` to `state`.
+        If the write fails the state is left untouched and the error propagates.
+        """
+        seq = self.seq + 1
+        op = dict(op, seq=seq)
+        # Create-only: two writers can never claim the same sequence number
+        self.blobs.write_text(self._log_name(seq), json.dumps(op), if_generation_match=0)
+        self.seq = seq
+        apply_op(state, op)
+        self.pending += 1
+        if self.pending >= self.compact_every:
+            try:
+                self.compact(state)
+            except Exception as e:
+                # The log is still complete; compaction will be retried
+                print(f"   ⚠️ State compaction failed: {e}")
+
+    def compact(self, state):
+        """Writes a full snapshot and drops the log records it covers."""
+        snapshot = dict(state, log_seq=self.seq)
+        # Only overwrite the snapshot we loaded (None = not read yet, write unconditionally)
+        self.blobs.write_text(self.name, json.dumps(snapshot, indent=4), if_generation_match=self.blobs.generation(self.name))
+        for record in self.blobs.list(self.log_prefix):
+            if int(record[len(self.log_prefix):].split(".")[0]) <= self.seq:
+                self.blobs.delete(record)
+        self.pending = 0
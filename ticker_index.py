@@ -0,0 +1,120 @@
+"""
+Inverted index from MARKET_UNIVERSE tickers to news items.
+
+Matching is by whole word, never substring: "NVDA" and "$NVDA", the company
+name ("Nvidia", "NVIDIA") and its aliases from config.TICKER_ALIASES, so
+"said" doesn't match "ai" and "CVX" doesn't match "V". Names are matched as
+written (capitalized or all caps), so "apple pie" and "visa rules" stay untagged.
+Tickers of one or two letters (V, MA, HD, PG, KO) only count as cashtags;
+as bare words they collide with ordinary text ("PG-13").
+
+All terms are compiled into two alternations, so each text is scanned once no
+matter how many tickers there are. The index keeps, per ticker, its items
+sorted newest first: finding a ticker is a dict lookup and "the last 24h" is a
+bisect into that list.
+"""
+import bisect
+import re
+import threading
+import time
+from collections import defaultdict
+
+from config import MARKET_UNIVERSE, COMPANY_NAMES, TICKER_ALIASES
+
+SHORT_TICKER = 2  # Tickers this short are matched only as $CASHTAGS
+
+
+def alternation(terms):
+    # Longest first, so "Bank of America" wins over a shorter overlapping term
+    return "|".join(re.escape(t) for t in sorted(set(terms), key=len, reverse=True))
+
+
+def keyword_pattern(keywords):
+    """Case-insensitive whole-word matcher for plain keyword lists (spiders); '-', '/' and '_' separate words."""
+    return re.compile(r"(?<![a-z0-9])(?:" + alternation(keywords) + r")(?![a-z0-9])", re.I)
+
+
+class TickerMatcher:
+    def __init__(self, symbols=MARKET_UNIVERSE, names=COMPANY_NAMES, aliases=TICKER_ALIASES):
+        self.symbols = list(symbols)
+        self.symbol_of = {}  # matched term -> symbol
+        for symbol in self.symbols:
+            self.symbol_of[symbol] = symbol
+            for name in [names.get(symbol)] + list(aliases.get(symbol, [])):
+                if name:
+                    self.symbol_of[name] = symbol
+                    self.symbol_of[name.upper()] = symbol
+
+        words = [t for t in self.symbol_of if t not in self.symbols or len(t) > SHORT_TICKER]
+        self.word_re = re.compile(r"(?<![\w$])(" + alternation(words) + r")(?!\w)")
+        self.cashtag_re = re.compile(r"(?<!\w)\$(" + alternation(self.symbols) + r")(?!\w)")
+
+    def counts(self, text):
+        """{symbol: mentions} for one text, in order of first mention."""
+        found = {}
+        if not text:
+            return found
+        for regex in (self.word_re, self.cashtag_re):
+            for match in regex.finditer(text):
+                symbol = self.symbol_of[match.group(1)]
+                found[symbol] = found.get(symbol, 0) + 1
+        return found
+
+
+class TickerIndex:
+    def __init__(self, matcher=None):
+        self.matcher = matcher or get_matcher()
+        self.items = []
+        self.tags = []  # Per item: {symbol: mentions}
+        self._postings = defaultdict(list)  # symbol -> [(-published, position)], newest first
+        self._lock = threading.Lock()
+
+    def add(self, item, text=None, published=None):
+        """
+        Indexes one item (an article dict by default: title + summary, 'published' epoch).
+        Items without a publish time sort last and drop out of max_age lookups.
+        Returns {symbol: mentions}.
+        """
+        if text is None:
+            text = f"{item.get('title', '')} {item.get('summary', '')}"
+        if published is None and isinstance(item, dict):
+            published = item.get('published')
+        tags = self.matcher.counts(text)
+        key = -published if published else float("inf")
+        with self._lock:
+            position = len(self.items)
+            self.items.append(item)
+            self.tags.append(tags)
+            for symbol in tags:
+                bisect.insort(self._postings[symbol], (key, position))
+        return tags
+
+    def positions(self, symbol, max_age_hours=None, now=None):
+        """Positions of the items mentioning `symbol`, newest first."""
+        postings = self._postings.get(symbol, [])
+        if max_age_hours is None:
+            return [position for _, position in postings]
+        cutoff = (now or time.time()) - max_age_hours * 3600
+        end = bisect.bisect_right(postings, (-cutoff, float("inf")))
+        return [position for _, position in postings[:end]]
+
+    def find(self, symbol, max_age_hours=None, now=None):
+        """Items about `symbol` (e.g. find("NVDA", 24)), newest first."""
+        return [self.items[p] for p in self.positions(symbol, max_age_hours, now)]
+
+    def counts(self):
+        return {symbol: len(postings) for symbol, postings in self._postings.items()}
+
+    def __len__(self):
+        return len(self.items)
+
+
+_matcher = None
+
+
+def get_matcher():
+    """Shared matcher for MARKET_UNIVERSE (the regexes are compiled once per process)."""
+    global _matcher
+    if _matcher is None:
+        _matcher = TickerMatcher()
+    return _matcher
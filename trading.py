@@ -1,15 +1,29 @@
 import os
 import json
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date, timedelta
-from google.cloud import storage
 import google.generativeai as genai
+import llm_cache
+import blob_store
+from state_store import StateStore, apply_op
+from ledger import Trade, TradeLedger
+from rate_limit import TokenBucket, RateLimitedModel, call_with_retry
+from llm_client import LLMClient, get_client, gemini_limiter
+import rules
+import price_store
+import scan_corpus
+from news_context import as_context, estimate_tokens
+from market_snapshot import MarketSnapshot
 
 # Alpaca & Gemini Imports
 from alpaca.trading.client import TradingClient
 from alpaca.data.historical import StockHistoricalDataClient
 from alpaca.data.historical.news import NewsClient
-from alpaca.data.requests import StockSnapshotRequest, NewsRequest
+from alpaca.data.requests import StockSnapshotRequest, StockBarsRequest, NewsRequest
+from alpaca.data.timeframe import TimeFrame
+from alpaca.data.enums import Adjustment
 from alpaca.trading.requests import LimitOrderRequest, MarketOrderRequest
 from alpaca.trading.enums import OrderSide, TimeInForce
 
@@ -18,9 +32,28 @@ from alpaca.trading.enums import OrderSide, TimeInForce
 # A. Connect to Google Cloud Storage
 BUCKET_NAME = os.environ.get("BUCKET_NAME")
 STATE_FILE_NAME = 'portfolio_ai_state.json'
+# Without a bucket, STATE_DIR keeps the same snapshot + trade log on local disk (tests/offline runs)
+STATE_DIR = os.environ.get("STATE_DIR")
 
 # B. Simulation Settings
 STARTING_CASH = 1000.0
+DECISION_BATCH_SIZE = 10  # Tickers per Gemini call; the world context is sent once per batch
+VALID_DECISIONS = ("BUY", "SELL", "HOLD")
+
+# Request budgets shared by all scan threads (requests/second); Gemini's (GEMINI_RPS) lives in llm_client
+ALPACA_RPS = float(os.environ.get("ALPACA_RPS", "3"))  # Free data plan: 200 req/min
+NEWS_WORKERS = 8
+AI_WORKERS = 3
+NEWS_PER_SYMBOL = 3      # Headlines per ticker in the decision prompt
+BULK_NEWS_LIMIT = 500    # Max articles in one bulk prefetch (the SDK pages 50 at a time)
+NEWS_PAGE_SIZE = 50
+SNAPSHOT_MAX_AGE = 120  # Seconds one universe snapshot is shared (report header + simulation)
+PRICE_LOOKBACK_DAYS = 400  # History pulled the first time a symbol enters the local price store
+# Stored bars are split-adjusted: since the last split they equal the raw snapshot bars appended
+# each scan (dividend adjustment would shift every stored close on each ex-date)
+PRICE_ADJUSTMENT = Adjustment.SPLIT
+PRICE_SOURCE = "alpaca-split"  # price_store.get_store() key: one source and adjustment per series
+alpaca_limiter = TokenBucket(ALPACA_RPS)
 # MARKET_UNIVERSE imported from config
 from config import MARKET_UNIVERSE, TRADING_RULES 
 
@@ -36,8 +69,9 @@ if not all([ALPACA_KEY, ALPACA_SECRET, GEMINI_KEY]):
 # Only initialize if keys are present to avoid immediate crash on import/run if just testing
 if ALPACA_KEY and ALPACA_SECRET:
     trading_client = TradingClient(ALPACA_KEY, ALPACA_SECRET, paper=True)
-    data_client = StockHistoricalDataClient(ALPACA_KEY, ALPACA_SECRET)
-    news_client = NewsClient(ALPACA_KEY, ALPACA_SECRET)
+    # ALPACA_DATA_URL points the data/news clients at a local fake endpoint for testing
+    data_client = StockHistoricalDataClient(ALPACA_KEY, ALPACA_SECRET, url_override=os.environ.get("ALPACA_DATA_URL"))
+    news_client = NewsClient(ALPACA_KEY, ALPACA_SECRET, url_override=os.environ.get("ALPACA_DATA_URL"))
 else:
     trading_client = None
     data_client = None
@@ -46,24 +80,14 @@ else:
 # --- 3. AI BRAIN SETUP ---
 
 def configure_ai(log_func=print):
-    if not GEMINI_KEY:
-        return None
-    
-    genai.configure(api_key=GEMINI_KEY)
-    # Prioritize 1.5 Flash for stability/limits, then 2.0
-   # possible_models = ['gemini-2.5-flash', 'gemini-1.5-flash', 'gemini-2.0-flash-exp', 'gemini-2.0-flash']
-    possible_models = ['gemini-2.5-flash']
-
-    log_func("🔌 Connecting to AI Brain...")
-    for model_name in possible_models:
-        try:
-            model = genai.GenerativeModel(model_name)
-            model.generate_content("Ping")
-            log_func(f"   ✅ AI Connected: Using '{model_name}'")
-            return model
-        except:
-            continue
-    raise Exception("❌ No Gemini models available.")
+    """
+    The shared Gemini client (llm_client.py): GEMINI_MODELS in order, probed on the first
+    request, with backoff, fallback and a circuit breaker. None without GEMINI_API_KEY.
+    """
+    client = get_client()
+    if client:
+        log_func(f"🔌 AI Brain: {', '.join(client.names)} (in order of preference)")
+    return client
 
 # We defer initialization of ai_model to inside run_simulation or global scope with a default print
 ai_model = None 
@@ -73,64 +97,179 @@ ai_model = None
 def get_bucket():
     if not BUCKET_NAME:
         raise ValueError("BUCKET_NAME environment variable not set.")
-    storage_client = storage.Client()
-    return storage_client.bucket(BUCKET_NAME)
+    return blob_store.get_client().bucket(BUCKET_NAME)
+
+_state_store = None
+
+def get_state_store():
+    global _state_store
+    if _state_store is None:
+        # Shared store: same pooled client and per-report blob cache as PortfolioManager
+        blobs = blob_store.get_store(BUCKET_NAME, local_dir=STATE_DIR)
+        _state_store = StateStore(blobs, STATE_FILE_NAME)
+    return _state_store
 
 def init_state(log_func=print):
     try:
-        bucket = get_bucket()
-        blob = bucket.blob(STATE_FILE_NAME)
+        store = get_state_store()
+        state = store.load()
         
-        if blob.exists():
-            log_func(f"   📂 Loading state from GCS: gs://{BUCKET_NAME}/{STATE_FILE_NAME}")
-            content = blob.download_as_text()
-            return json.loads(content)
+        if state is not None:
+            log_func(f"   📂 Loading state from {store.describe()} (+{store.pending} logged trades)")
+            return state
         else:
-            log_func(f"   ✨ Creating new state in GCS: gs://{BUCKET_NAME}/{STATE_FILE_NAME}")
-            new_state = {"start_date": str(date.today()), "cash": STARTING_CASH, "portfolio": {}, "history": []}
+            log_func(f"   ✨ Creating new state in {store.describe()}")
+            new_state = {"start_date": str(date.today()), "cash": STARTING_CASH, "portfolio": {}, "trades": []}
             save_state(new_state)
             return new_state
     except Exception as e:
         log_func(f"   ❌ Error initializing state: {e}")
         # Fallback to ephemeral state if GCS fails
-        return {"start_date": str(date.today()), "cash": STARTING_CASH, "portfolio": {}, "history": []}
+        return {"start_date": str(date.today()), "cash": STARTING_CASH, "portfolio": {}, "trades": []}
 
 def save_state(state):
+    """Writes a full compacted snapshot. Trades in between go through record_trade."""
     try:
-        bucket = get_bucket()
-        blob = bucket.blob(STATE_FILE_NAME)
-        blob.upload_from_string(json.dumps(state, indent=4))
+        get_state_store().compact(state)
         # print("   💾 State saved to GCS.")
     except Exception as e:
         print(f"   ❌ Error saving state to GCS: {e}")
 
+def record_trade(state, side, symbol, qty, price):
+    """Applies a BUY/SELL to the state, appends a single small record to the trade log and returns the Trade."""
+    op = {"op": side, "date": str(date.today()), "symbol": symbol, "qty": qty, "price": price}
+    try:
+        get_state_store().append(state, op)
+    except Exception as e:
+        # Keep the in-memory state right even if persistence is down; the end-of-scan snapshot retries
+        print(f"   ❌ Error logging trade: {e}")
+        apply_op(state, op)
+    return Trade(op["date"], side, symbol, qty, price)
+
+def plan_trade(decision, symbol, price, state, ledger, day):
+    """
+    Position sizing and trade guards, shared by the live scan and the backtester.
+    Returns (side, qty, note): side is "buy"/"sell" or None when nothing should be
+    traded; note explains a skipped trade.
+    """
+    qty_owned = state["portfolio"].get(symbol, {}).get("qty", 0)
+    if decision == "BUY":
+        # Wash trade prevention (cooldown rule)
+        if ledger.sold_on(day, symbol):
+            return None, 0, f"SKIPPED BUY: Sold {symbol} today (Wash Trade Prevention)"
+        if qty_owned > 0:
+            return None, 0, f"SKIPPED BUY: Already own {qty_owned} shares (Wait for sell signal)"
+        # Max 25% of cash; fractional shares, but at least $10 per trade
+        invest_amount = state["cash"] * 0.25
+        if invest_amount < 10.0:
+            return None, 0, f"SKIPPED BUY: Insufficient funds (${invest_amount:.2f}) for minimum trade"
+        return "buy", round(invest_amount / price, 4), None
+    if decision == "SELL":
+        if qty_owned > 0:
+            return "sell", qty_owned, None
+        return None, 0, "SKIPPED SELL: No position to sell"
+    return None, 0, None
+
+def portfolio_equity(state, prices):
+    """Cash + holdings at `prices` ({symbol: price}); symbols without a price count at their avg_price."""
+    holdings_value = 0.0
+    for symbol, position in state["portfolio"].items():
+        holdings_value += position.get("qty", 0) * prices.get(symbol, position.get("avg_price", 0))
+    return state["cash"] + holdings_value
+
+def set_equity(state, day, total):
+    """One state["equity_history"] entry per day; a later scan on the same day overwrites it."""
+    day_str = str(day)
+    for entry in state["equity_history"]:
+        if entry["date"] == day_str:
+            entry["total"] = total
+            return
+    state["equity_history"].append({"date": day_str, "total": total})
+
+def fetch_market_news(symbol):
+    req = NewsRequest(symbols=symbol, start=datetime.now() - timedelta(hours=24), limit=3)
+    return [n.headline for n in news_client.get_news(req)["news"]]
+
 def get_market_news(symbol):
     if not news_client: return []
     try:
-        req = NewsRequest(symbols=symbol, start=datetime.now() - timedelta(hours=24), limit=3)
-        return [n.headline for n in news_client.get_news(req).news]
+        return call_with_retry(fetch_market_news, symbol, limiter=alpaca_limiter)
     except: return []
 
-def ask_ai_for_decision(symbol, price, pct_change, news_headlines, market_context=None, portfolio_context=None, model=None):
-    if not model:
-        return {"decision": "HOLD", "reason": "AI not connected"}
+def prefetch_market_news(symbols, log_func=print):
+    """
+    Fetches the last 24h of news for all symbols in one paginated request and
+    returns {symbol: [headline, ...]} with up to NEWS_PER_SYMBOL newest headlines each.
+    """
+    index = {symbol: [] for symbol in symbols}
+    if not news_client or not symbols:
+        return index
+
+    try:
+        req = NewsRequest(symbols=",".join(symbols), start=datetime.now() - timedelta(hours=24), limit=BULK_NEWS_LIMIT)
+        items = call_with_retry(news_client.get_news, req, limiter=alpaca_limiter)["news"]
+    except Exception as e:
+        log_func(f"   ⚠️ Bulk news failed ({e}), fetching per symbol...")
+        items = None
 
+    if items is None:
+        requests_made, starved = 0, list(symbols)
+    else:
+        # Newest first; an article tagged with several tickers counts for each of them
+        for item in items:
+            for symbol in item.symbols or []:
+                if symbol in index and len(index[symbol]) < NEWS_PER_SYMBOL:
+                    index[symbol].append(item.headline)
+        requests_made = max(1, -(-len(items) // NEWS_PAGE_SIZE))
+        # If the cap was hit, quiet tickers may have been crowded out by busy ones
+        starved = [s for s in symbols if not index[s]] if len(items) >= BULK_NEWS_LIMIT else []
+
+    if starved:
+        with ThreadPoolExecutor(max_workers=NEWS_WORKERS) as pool:
+            for symbol, headlines in zip(starved, pool.map(get_market_news, starved)):
+                index[symbol] = headlines
+        requests_made += len(starved)
+
+    saved = len(symbols) - requests_made
+    log_func(f"   📰 News for {len(symbols)} symbols in {requests_made} request(s) ({saved:+d} round-trips saved)")
+    return index
+
+def format_news(news_headlines):
     # FALLBACK: If no news, explicit instruction to use Technicals
     if news_headlines:
-        news_text = "\n".join([f"- {h}" for h in news_headlines])
-    else:
-        news_text = "NO SPECIFIC COMPANY NEWS FOUND."
-    
-    # Format World Context
-    world_context_text = f"Global Market Context:\n{market_context}" if market_context else "No global context provided."
+        return "\n".join([f"- {h}" for h in news_headlines])
+    return "NO SPECIFIC COMPANY NEWS FOUND."
 
-    # Format Portfolio Context
+def format_world_context(market_context):
+    if not market_context:
+        return "No global context provided."
+    text, _ = market_context.world()
+    return f"Global Market Context:\n{text}"
+
+def format_related_news(market_context, symbol):
+    """Report articles and summary sentences that mention this ticker (token-budgeted)."""
+    text, _ = market_context.for_ticker(symbol) if market_context else ("", 0)
+    return f"RELATED NEWS:\n    {text}" if text else ""
+
+def format_position(price, portfolio_context):
     if portfolio_context and portfolio_context.get('qty', 0) > 0:
         avg_price = portfolio_context.get('avg_price', 0)
         gain_pct = ((price - avg_price) / avg_price) * 100 if avg_price > 0 else 0
-        portfolio_text = f"    WE OWN THIS STOCK: {portfolio_context['qty']} shares @ ${avg_price:.2f} (Current Gain: {gain_pct:+.2f}%)"
-    else:
-        portfolio_text = "    WE DO NOT OWN THIS STOCK."
+        return f"WE OWN THIS STOCK: {portfolio_context['qty']} shares @ ${avg_price:.2f} (Current Gain: {gain_pct:+.2f}%)"
+    return "WE DO NOT OWN THIS STOCK."
+
+def ask_ai_for_decision(symbol, price, pct_change, news_headlines, market_context=None, portfolio_context=None, model=None):
+    if not model:
+        return {"decision": "HOLD", "reason": "AI not connected"}
+
+    news_text = format_news(news_headlines)
+    
+    # Format World Context: token-budgeted world part + the snippets about this ticker
+    market_context = as_context(market_context)
+    world_context_text = format_world_context(market_context)
+
+    # Format Portfolio Context
+    portfolio_text = "    " + format_position(price, portfolio_context)
 
     prompt = f"""
     Act as an Aggressive Day Trader. Manage a $1000 portfolio.
@@ -143,6 +282,7 @@ def ask_ai_for_decision(symbol, price, pct_change, news_headlines, market_contex
     
     COMPANY NEWS:
     {news_text}
+    {format_related_news(market_context, symbol)}
 
     WORLD CONTEXT (Politics, Macroeconomics, Wars, Supply Chain):
     {world_context_text}
@@ -156,65 +296,223 @@ def ask_ai_for_decision(symbol, price, pct_change, news_headlines, market_contex
     
     try:
         config = genai.types.GenerationConfig(temperature=0.2, response_mime_type="application/json")
-        response = model.generate_content(prompt, generation_config=config)
-        return json.loads(response.text)
+        # Identical price + news + context within the TTL reuses the previous decision
+        text = llm_cache.get_cache().generate(model, prompt, "trading_decision", generation_config=config, validate=json.loads)
+        return json.loads(text)
     except Exception as e:
         return {"decision": "HOLD", "reason": f"Error: {str(e)}"}
 
-# --- 5. MAIN SIMULATION LOOP ---
+def validate_decision(entry):
+    """Returns a clean {"decision", "reason"} dict, or None if the entry is unusable."""
+    if not isinstance(entry, dict):
+        return None
+    decision = str(entry.get("decision", "")).strip().upper()
+    reason = entry.get("reason")
+    if decision not in VALID_DECISIONS or not isinstance(reason, str) or not reason.strip():
+        return None
+    return {"decision": decision, "reason": reason.strip()}
+
+def ask_ai_for_batch_decisions(candidates, market_context=None, model=None, log_func=print):
+    """
+    Asks for decisions on several tickers in one call, sending the shared world context once.
+    `candidates` is a list of dicts with symbol, price, change_pct, headlines, portfolio.
+    Returns {symbol: {"decision", "reason"}} for entries that passed validation only;
+    the caller falls back to ask_ai_for_decision for the rest.
+    """
+    if not model or not candidates:
+        return {}
+
+    market_context = as_context(market_context)
+    world_context_text = format_world_context(market_context)
+
+    stock_blocks = ""
+    for c in candidates:
+        stock_blocks += f"""
+    STOCK: {c['symbol']}
+    PRICE: ${c['price']:.2f}
+    CHANGE (24H): {c['change_pct']:.2f}%
+    POSITION: {format_position(c['price'], c['portfolio'])}
+    COMPANY NEWS:
+    {format_news(c['headlines'])}
+    {format_related_news(market_context, c['symbol'])}
+"""
+
+    prompt = f"""
+    Act as an Aggressive Day Trader. Manage a $1000 portfolio.
+    Decide independently for EACH of the {len(candidates)} stocks below.
+
+    WORLD CONTEXT (Politics, Macroeconomics, Wars, Supply Chain):
+    {world_context_text}
+
+    STRATEGY RULES:
+    {chr(10).join(TRADING_RULES)}
+
+    STOCKS:
+    {stock_blocks}
+
+    Output strictly valid JSON: an array with exactly one object per stock, in the same order (Example):
+    [{{ "symbol": "{candidates[0]['symbol']}", "decision": "HOLD", "reason": "Price is flat, no significant news." }}]
+    """
+
+    log_func(f"   🧮 Batch {','.join(c['symbol'] for c in candidates)}: ~{estimate_tokens(prompt)} prompt tokens"
+             + (f" (full news context ~{market_context.source_tokens})" if market_context else ""))
+    try:
+        config = genai.types.GenerationConfig(temperature=0.2, response_mime_type="application/json")
+        text = llm_cache.get_cache().generate(model, prompt, "trading_decision", generation_config=config, validate=json.loads)
+        entries = json.loads(text)
+    except Exception as e:
+        log_func(f"   ⚠️ Batch decision failed: {e}")
+        return {}
+
+    if isinstance(entries, dict):
+        entries = entries.get("decisions", [entries])
+    if not isinstance(entries, list):
+        return {}
+
+    requested = {c['symbol'] for c in candidates}
+    decisions = {}
+    for entry in entries:
+        symbol = str(entry.get("symbol", "")).strip().upper() if isinstance(entry, dict) else ""
+        result = validate_decision(entry)
+        if symbol in requested and symbol not in decisions and result:
+            decisions[symbol] = result
+    return decisions
+
+def decide_batch(batch, market_context=None, model=None, log_func=print):
+    decisions = ask_ai_for_batch_decisions(batch, market_context=market_context, model=model, log_func=log_func)
+    for c in batch:
+        if c['symbol'] in decisions:
+            continue
+        log_func(f"   ↩️ {c['symbol']}: no valid batch decision, asking individually")
+        result = ask_ai_for_decision(c['symbol'], c['price'], c['change_pct'], c['headlines'],
+                                     market_context=market_context, portfolio_context=c['portfolio'], model=model)
+        decisions[c['symbol']] = validate_decision(result) or {"decision": "HOLD", "reason": result.get("reason", "N/A")}
+    return decisions
+
+def decide_all(candidates, market_context=None, model=None, log_func=print, news_index=None):
+    """
+    Fetches news (unless a {symbol: [headline]} news_index is given, e.g. by the
+    backtester) and gets a decision for every candidate. Clear-cut tickers are decided by
+    the rule engine (rules.py); only ambiguous ones go to Gemini, in concurrent batches.
+    Alpaca and Gemini calls go through shared token buckets with 429 backoff.
+    Fills c['headlines'] and returns {symbol: {"decision", "reason", "path"}}; no trades happen here.
+    """
+    # One index over the report's news; every batch takes its world part and per-ticker snippets from it
+    market_context = as_context(market_context)
+    if news_index is None:
+        news_index = prefetch_market_news([c['symbol'] for c in candidates], log_func=log_func)
+    for c in candidates:
+        c['headlines'] = news_index.get(c['symbol'], [])
+
+    decisions, ambiguous = rules.evaluate(candidates, world_news=bool(market_context))
+    log_func(f"   📏 Rules decided {len(decisions)}/{len(candidates)} tickers; {len(ambiguous)} need the AI"
+             + (f" ({', '.join(c['symbol'] + ': ' + c['rule_note'] for c in ambiguous)})" if ambiguous else ""))
+    if not ambiguous:
+        return decisions
+
+    if not model:
+        decisions.update({c['symbol']: {"decision": "HOLD", "reason": "AI not connected", "path": rules.LLM} for c in ambiguous})
+        return decisions
+    if not isinstance(model, (RateLimitedModel, LLMClient)):  # The shared client has the limiter built in
+        model = RateLimitedModel(model, gemini_limiter)
+
+    with ThreadPoolExecutor(max_workers=AI_WORKERS) as ai_pool:
+        batch_futures = [
+            ai_pool.submit(decide_batch, ambiguous[i:i + DECISION_BATCH_SIZE], market_context, model, log_func)
+            for i in range(0, len(ambiguous), DECISION_BATCH_SIZE)
+        ]
+        for future in batch_futures:
+            for symbol, result in future.result().items():
+                decisions[symbol] = dict(result, path=rules.LLM)
+    return decisions
+
+# --- 5. PRICE HISTORY ---
+
+def bars_to_array(bars):
+    """Alpaca Bar objects -> price_store bars."""
+    return price_store.make_bars(
+        [b.timestamp for b in bars], [b.open for b in bars], [b.high for b in bars],
+        [b.low for b in bars], [b.close for b in bars], [b.volume for b in bars])
+
+def alpaca_bars(symbols, start, adjustment=PRICE_ADJUSTMENT):
+    """Daily bars since `start` for all symbols in one request -> {symbol: bars}."""
+    req = StockBarsRequest(symbol_or_symbols=symbols, timeframe=TimeFrame.Day,
+                           start=datetime.combine(start, datetime.min.time()), adjustment=adjustment)
+    barset = call_with_retry(data_client.get_stock_bars, req, limiter=alpaca_limiter)
+    return {symbol: bars_to_array(bars) for symbol, bars in barset.data.items()}
+
+def store_snapshot_bars(snap, log_func=print):
+    """
+    Keeps the local price store current from the snapshot we already fetched:
+    its previous and current daily bars are appended for free. Only symbols with
+    a hole before the previous bar (new, or not seen for days) cost a bars request.
+    Snapshot bars are raw: a symbol that moved like a split since yesterday gets its
+    split-adjusted history refetched instead.
+    """
+    store = price_store.get_store(PRICE_SOURCE)
+    stale, splits = [], []
+    for symbol, data in snap.items():
+        if not data.previous_daily_bar:
+            continue
+        if data.daily_bar and price_store.split_suspect(data.previous_daily_bar.close, data.daily_bar.close):
+            splits.append(symbol)
+            continue
+        last = store.last_timestamp(symbol)
+        prev_day = price_store.day_ts([data.previous_daily_bar.timestamp])[0]
+        if last is None or last < prev_day:
+            stale.append(symbol)
+    try:
+        if stale:
+            store.update(stale, alpaca_bars, PRICE_LOOKBACK_DAYS)
+            log_func(f"   🗄️ Price store: gap-filled {len(stale)} symbols")
+        if splits:
+            store.refetch(splits, alpaca_bars, PRICE_LOOKBACK_DAYS)
+            log_func(f"   🗄️ Price store: {', '.join(splits)} moved like a split, history refetched")
+        for symbol, data in snap.items():
+            if symbol in splits:
+                continue
+            bars = [b for b in (data.previous_daily_bar, data.daily_bar) if b]
+            if bars:
+                store.append(symbol, bars_to_array(bars))
+        store.compact_if_needed(list(snap.keys()))
+    except Exception as e:
+        log_func(f"   ⚠️ Price store update failed: {e}")
+
+# --- 6. MAIN SIMULATION LOOP ---
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+def get_market_snapshot(max_age=SNAPSHOT_MAX_AGE):
+    """
+    Snapshot of the whole MARKET_UNIVERSE as a MarketSnapshot. Fetched once and
+    shared by everyone asking within max_age seconds (concurrent callers wait for
+    the same request).
+    """
+    global _snapshot
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot.age() > max_age:
+            snap = call_with_retry(data_client.get_stock_snapshot,
+                                   StockSnapshotRequest(symbol_or_symbols=MARKET_UNIVERSE), limiter=alpaca_limiter)
+            _snapshot = MarketSnapshot(snap, MARKET_UNIVERSE)
+        return _snapshot
+
+def clear_market_snapshot():
+    """Called at the start of each report so it fetches fresh prices once."""
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
 
 def get_market_status():
     """
     Calculates the overall market status based on the MARKET_UNIVERSE.
-    Returns a dict with status, up_count, down_count, avg_change.
+    Returns a dict with status, up_count, down_count, avg_change, breadth and sectors.
     """
     if not data_client:
         return None
     
     try:
-        snap = data_client.get_stock_snapshot(StockSnapshotRequest(symbol_or_symbols=MARKET_UNIVERSE))
-        
-        up = 0
-        down = 0
-        total_change = 0.0
-        count = 0
-        
-        for symbol, data in snap.items():
-            if not data.latest_trade or not data.previous_daily_bar:
-                continue
-            
-            price = data.latest_trade.price
-            prev = data.previous_daily_bar.close
-            
-            if prev == 0: continue
-            
-            change_pct = ((price - prev) / prev) * 100
-            total_change += change_pct
-            count += 1
-            
-            if change_pct >= 0:
-                up += 1
-            else:
-                down += 1
-        
-        if count == 0:
-            return None
-            
-        avg_change = total_change / count
-        
-        if avg_change >= 0.5:
-            status = "Bullish 🟢"
-        elif avg_change <= -0.5:
-            status = "Bearish 🔴"
-        else:
-            status = "Mixed 🟡"
-            
-        return {
-            "status": status,
-            "up_count": up,
-            "down_count": down,
-            "avg_change": avg_change
-        }
+        return get_market_snapshot().market_status()
     except Exception as e:
         print(f"Error getting market status: {e}")
         return None
@@ -244,6 +542,8 @@ def run_simulation(return_logs=False, market_context=None):
     state = init_state(log_func=log)
     if "equity_history" not in state:
         state["equity_history"] = []
+    # Typed trade records (migrated from the string history on first use) for O(1) cooldown checks
+    ledger = TradeLedger.from_state(state)
 
     # CHECK MARKET HOURS
     market_open = True
@@ -259,36 +559,40 @@ def run_simulation(return_logs=False, market_context=None):
     
     log("   📡 Fetching Real-Time Data...")
     try:
-        snap = data_client.get_stock_snapshot(StockSnapshotRequest(symbol_or_symbols=MARKET_UNIVERSE))
+        # Same snapshot as the report's market status header
+        snapshot = get_market_snapshot()
     except Exception as e:
         log(f"   ❌ Market Data Error: {e}")
         if return_logs: return "\n".join(logs), []
         return
+    store_snapshot_bars(snapshot.raw, log_func=log)
+
+    current_prices = snapshot.latest_prices() # For equity calc
+    candidates = []
+
+    for symbol, price, change_pct in snapshot.quotes():
+        candidates.append({
+            "symbol": symbol,
+            "price": price,
+            "change_pct": change_pct,
+            # Get portfolio context for this symbol
+            "portfolio": state["portfolio"].get(symbol, {}),
+        })
+
+    # One bulk news request, then concurrent AI batches; trades below are applied in universe order
+    decisions = decide_all(candidates, market_context=market_context, model=ai_model, log_func=log)
+    try:
+        scan_corpus.get_corpus().record(date.today(), candidates, decisions, market_context)
+    except Exception as e:
+        log(f"   ⚠️ Could not record scan for backtests: {e}")
 
-    current_prices = {}
-
-    for symbol in MARKET_UNIVERSE:
-        if symbol not in snap: continue
-        
-        data = snap[symbol]
-        if not data.latest_trade or not data.previous_daily_bar: continue
-        
-        price = data.latest_trade.price
-        current_prices[symbol] = price # Store for equity calc
-        
-        prev = data.previous_daily_bar.close
-        if prev == 0: continue
-        change_pct = ((price - prev) / prev) * 100
-        
-        qty_owned = state["portfolio"].get(symbol, {}).get("qty", 0)
+    for c in candidates:
+        symbol, price, change_pct, headlines = c["symbol"], c["price"], c["change_pct"], c["headlines"]
 
         log(f"\n   🔍 {symbol}: ${price:.2f} ({change_pct:+.2f}%)")
-        
-        headlines = get_market_news(symbol)
         if headlines: log(f"      📰 News: {headlines[0][:60]}...")
         
-        # Get portfolio context for this symbol
-        portfolio_ctx = state["portfolio"].get(symbol, {})
+        portfolio_ctx = c["portfolio"]
         
         # Debug Log for Gain %
         if portfolio_ctx.get("qty", 0) > 0:
@@ -297,103 +601,40 @@ def run_simulation(return_logs=False, market_context=None):
                 gain = ((price - avg) / avg) * 100
                 log(f"      💰 Position Gain/Loss: {gain:+.2f}% (Entry: ${avg:.2f})")
 
-        ai_result = ask_ai_for_decision(symbol, price, change_pct, headlines, market_context=market_context, portfolio_context=portfolio_ctx, model=ai_model)
+        ai_result = decisions.get(symbol, {"decision": "HOLD", "reason": "No decision"})
         decision = ai_result.get("decision", "HOLD").upper()
         reason = ai_result.get("reason", "N/A")
         
-        log(f"      🤖 {decision}: {reason}")
+        path = "📏 RULE" if ai_result.get("path") == rules.RULE else "🤖 AI"
+        log(f"      {path} {decision}: {reason}")
         
         # --- EXECUTE TRADE ---
-        
-        # 1. BUY LOGIC
-        if decision == "BUY":
-            # CHECK FOR WASH TRADE (Cooldown Rule)
-            today_str = str(date.today())
-            was_sold_today = any(f"{today_str}: SOLD" in entry and f"{symbol}" in entry for entry in state["history"])
-            
-            if was_sold_today:
-                log(f"      ⚠️ SKIPPED BUY: Sold {symbol} today (Wash Trade Prevention)")
-            elif qty_owned == 0:
-                # Calculate Quantity (Max 25% of cash)
-                invest_amount = state["cash"] * 0.25
-                
-                # FRACTIONAL SHARES: Allow buying if we have at least $10 to invest
-                if invest_amount >= 10.0:
-                    qty_to_buy = round(invest_amount / price, 4)
-                    
-                    try:
-                        # Use MARKET order for fractional shares
-                        order_data = MarketOrderRequest(
-                            symbol=symbol,
-                            qty=qty_to_buy,
-                            side=OrderSide.BUY,
-                            time_in_force=TimeInForce.DAY
-                        )
-                        trading_client.submit_order(order_data)
-                        
-                        # Update State (Estimate cost at current price since it's market order)
-                        cost = qty_to_buy * price
-                        state["cash"] -= cost
-                        state["portfolio"][symbol] = {"qty": qty_to_buy, "avg_price": price}
-                        state["history"].append(f"{date.today()}: BOUGHT {qty_to_buy} {symbol}")
-                        save_state(state)
-                        log(f"      ✅ BOUGHT {qty_to_buy} {symbol} (Market Order)")
-                    except Exception as e:
-                        log(f"      ❌ Buy Failed: {e}")
-                else:
-                    log(f"      ⚠️ SKIPPED BUY: Insufficient funds (${invest_amount:.2f}) for minimum trade")
-            else:
-                    log(f"      ⚠️ SKIPPED BUY: Already own {qty_owned} shares (Wait for sell signal)")
-
-        # 2. SELL LOGIC
-        elif decision == "SELL":
-            if qty_owned > 0:
-                try:
-                    # Use MARKET order to clear position (supports fractional)
-                    order_data = MarketOrderRequest(
-                        symbol=symbol,
-                        qty=qty_owned,
-                        side=OrderSide.SELL,
-                        time_in_force=TimeInForce.DAY
-                    )
-                    trading_client.submit_order(order_data)
-                    
-                    # Update State
-                    revenue = qty_owned * price
-                    state["cash"] += revenue
-                    del state["portfolio"][symbol]
-                    state["history"].append(f"{date.today()}: SOLD {qty_owned} {symbol}")
-                    save_state(state)
-                    log(f"      🚨 SOLD {qty_owned} {symbol} (Market Order)")
-                except Exception as e:
-                    log(f"      ❌ Sell Failed: {e}")
+        side, qty, note = plan_trade(decision, symbol, price, state, ledger, date.today())
+        if note:
+            log(f"      ⚠️ {note}")
+        if not side:
+            continue
+        try:
+            # Use MARKET order (supports fractional shares); state is updated at the current price as an estimate
+            order_data = MarketOrderRequest(
+                symbol=symbol,
+                qty=qty,
+                side=OrderSide.BUY if side == "buy" else OrderSide.SELL,
+                time_in_force=TimeInForce.DAY
+            )
+            trading_client.submit_order(order_data)
+            ledger.add(record_trade(state, side, symbol, qty, price))
+            if side == "buy":
+                log(f"      ✅ BOUGHT {qty} {symbol} (Market Order)")
             else:
-                log(f"      ⚠️ SKIPPED SELL: No position to sell")
-
-        # Rate Limiting Sleep
-        # Reduced to 1s for Paid Tier (Gemini 2.5 Flash has high limits)
-        time.sleep(1)
+                log(f"      🚨 SOLD {qty} {symbol} (Market Order)")
+        except Exception as e:
+            log(f"      ❌ {'Buy' if side == 'buy' else 'Sell'} Failed: {e}")
 
     # --- CALCULATE TOTAL EQUITY ---
-    holdings_value = 0.0
-    for symbol, position in state["portfolio"].items():
-        # Use current price if available, else fallback to avg_price (last known)
-        price = current_prices.get(symbol, position.get("avg_price", 0))
-        holdings_value += position.get("qty", 0) * price
-    
-    total_equity = state["cash"] + holdings_value
-    
-    # Update Equity History
-    today_str = str(date.today())
-    # Check if entry for today exists
-    updated_history = False
-    for entry in state["equity_history"]:
-        if entry["date"] == today_str:
-            entry["total"] = total_equity
-            updated_history = True
-            break
-    if not updated_history:
-        state["equity_history"].append({"date": today_str, "total": total_equity})
+    # Current price if available, else avg_price (last known)
+    total_equity = portfolio_equity(state, current_prices)
+    set_equity(state, date.today(), total_equity)
     
     save_state(state)
 